@@ -0,0 +1,46 @@
+# benchmark/bench_listing_model.py
+#
+# Memory and construction time of the Listing representations for a decoded listings payload:
+# dacite Listing dataclasses versus the ListingBatch columns with ListingView rows.
+#   python -m benchmark.bench_listing_model [listing_count]
+import sys
+import time
+import tracemalloc
+
+from dacite import from_dict, Config
+
+from benchmark.synthetic import make_listings_payload
+from model.listing_batch import ListingBatch
+from model.listings import Listing
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    payload = make_listings_payload(count)
+    records = payload["result"]
+
+    _, dataclass_time, dataclass_size = measure(
+        lambda: [from_dict(data_class=Listing, data=record, config=Config(strict=False)) for record in records]
+    )
+    _, batch_time, batch_size = measure(lambda: ListingBatch.from_dict(payload))
+    batch = ListingBatch.from_dict(payload)
+    _, view_time, view_size = measure(lambda: batch.listings())
+
+    print(f"listings: {count} (raw records are shared and not counted)")
+    print(f"Listing dataclasses:   {dataclass_time * 1000:10.2f} ms {dataclass_size / 1024:10.1f} KiB")
+    print(f"ListingBatch columns:  {batch_time * 1000:10.2f} ms {batch_size / 1024:10.1f} KiB")
+    print(f"ListingView rows:      {view_time * 1000:10.2f} ms {view_size / 1024:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# benchmark/bench_listings_decoder.py
+#
+# Compares the dacite decode of a listings payload with the columnar ListingBatch decoder.
+#   python -m benchmark.bench_listings_decoder [listing_count]
+import sys
+import time
+
+from dacite import from_dict, Config
+
+from benchmark.synthetic import make_listings_payload
+from model.listing_batch import ListingBatch
+from model.listings import Listings
+
+
+def time_call(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    payload = make_listings_payload(count)
+    dacite_time = time_call(lambda: from_dict(data_class=Listings, data=payload, config=Config(strict=False)))
+    batch_time = time_call(lambda: ListingBatch.from_dict(payload))
+    print(f"listings: {count}")
+    print(f"dacite from_dict:       {dacite_time * 1000:10.2f} ms")
+    print(f"ListingBatch.from_dict: {batch_time * 1000:10.2f} ms ({dacite_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmark/bench_ranking.py
+#
+# Top-k selection of matched listings: scoring the candidates, then the ListingRanker heap against a full
+# sort of the same keys, and the end-to-end top_k against the API-order slice it replaces.
+#   python -m benchmark.bench_ranking [candidate_count] [k] [score_expression]
+import heapq
+import sys
+import time
+
+import numpy as np
+
+from benchmark.synthetic import make_filter_sets, make_listings_payload
+from model.listing_batch import ListingBatch
+from model.listing_ranker import ListingRanker
+
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    expression = sys.argv[3] if len(sys.argv) > 3 else "lender_yield * historical_return + 0.001 * priority"
+    filter_set_list = make_filter_sets(4)
+    listings = ListingBatch.from_dict(make_listings_payload(count)).listings()
+    filter_sets = np.random.default_rng(0).integers(0, len(filter_set_list), size=count)
+    ranker = ListingRanker(expression, filter_set_list)
+
+    keys, score_time = timed(lambda: ranker.keys(listings, filter_sets))
+    heap, heap_time = timed(lambda: heapq.nlargest(k, range(count), key=keys.__getitem__))
+    full, sort_time = timed(lambda: sorted(range(count), key=keys.__getitem__, reverse=True)[:k])
+    if heap != full:
+        raise Exception("Heap selection differs from the full sort")
+    _, top_k_time = timed(lambda: ranker.top_k(listings, filter_sets, k))
+    _, slice_time = timed(lambda: listings[:k])
+
+    print(f"candidates: {count} k: {k} score: {expression}")
+    print(f"scoring:          {score_time * 1000:10.2f} ms")
+    print(f"heap selection:   {heap_time * 1000:10.2f} ms")
+    print(f"sort selection:   {sort_time * 1000:10.2f} ms")
+    print(f"top_k end to end: {top_k_time * 1000:10.2f} ms")
+    print(f"API slice:        {slice_time * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
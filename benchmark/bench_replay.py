@@ -0,0 +1,58 @@
+# benchmark/bench_replay.py
+#
+# Listing archive replay over millions of synthetic listings: archive size on disk, then the time to evaluate
+# the candidate filter sets over the memory-mapped columns.
+#   python -m benchmark.bench_replay [listing_count] [filter_set_count]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark.synthetic import FIRST_LISTING_NUMBER, make_filter_sets
+from model.listing_batch import PROSPER_RATINGS
+from service.listing_archive import COLUMNS, ListingArchive
+from service.listing_replay import replay
+
+
+def make_columns(count, start, rng):
+    payment = rng.uniform(50, 900, count)
+    return {
+        "listing_number": np.arange(FIRST_LISTING_NUMBER + start, FIRST_LISTING_NUMBER + start + count),
+        "recorded_at": np.full(count, int(time.time()) - 86400 + start // 1000),
+        "rating_code": rng.integers(0, len(PROSPER_RATINGS), count),
+        "has_credit_bureau": rng.random(count) > 0.02,
+        "months_employed": rng.integers(0, 240, count),
+        "stated_monthly_income": rng.uniform(1500, 20000, count),
+        "listing_monthly_payment": payment,
+        "inquiries": rng.integers(0, 6, count),
+        "delinquencies": rng.integers(0, 4, count),
+        "lender_yield": rng.uniform(0.05, 0.3, count),
+        "borrower_rate": rng.uniform(0.06, 0.32, count),
+        "historical_return": rng.uniform(0.02, 0.12, count),
+        "prosper_score": rng.integers(1, 11, count),
+        "listing_amount": payment * 36,
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    filter_set_count = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as path:
+        archive = ListingArchive(path)
+        start = time.perf_counter()
+        for offset in range(0, count, 500_000):
+            archive.append_columns(make_columns(min(500_000, count - offset), offset, rng))
+        append_time = time.perf_counter() - start
+        size = sum(os.path.getsize(archive.column_path(name)) for name in COLUMNS)
+
+        report = replay(ListingArchive(path).open(), make_filter_sets(filter_set_count))
+        print(f"listings: {count} filter sets: {filter_set_count}")
+        print(f"archive:  {size / 2 ** 20:10.1f} MiB ({size / count:.0f} bytes per listing), appended in {append_time:.2f} s")
+        print(f"replay:   {report['seconds']:10.2f} s, {report['matched_listings']} listings matched")
+
+
+if __name__ == "__main__":
+    main()
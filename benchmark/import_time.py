@@ -0,0 +1,50 @@
+# benchmark/import_time.py
+#
+# Reports the import cost of the Cloud Function entry point from `python -X importtime`, optionally failing
+# when it exceeds a budget.
+#   python -m benchmark.import_time [--module main] [--budget-ms 400] [--top 15]
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_imports(module):
+    env = dict(os.environ, LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    imports = list()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append({"module": name.strip(), "depth": depth, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time budget for the entry point")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, help="exit with status 1 when the import takes longer")
+    parser.add_argument("--top", type=int, default=15, help="number of direct dependencies to report")
+    args = parser.parse_args()
+
+    imports = measure_imports(args.module)
+    total = next(i for i in reversed(imports) if i["module"] == args.module)
+    direct = sorted((i for i in imports if i["depth"] == 1), key=lambda i: i["cumulative_ms"], reverse=True)
+    report = {"module": args.module, "total_ms": total["cumulative_ms"], "budget_ms": args.budget_ms, "top": direct[:args.top]}
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if args.budget_ms is not None and total["cumulative_ms"] > args.budget_ms:
+        print(f"Import of {args.module} took {total['cumulative_ms']:.1f} ms, over the {args.budget_ms:.1f} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# benchmark/run.py
+#
+# Offline benchmark suite: listings decoding, filter_listings, trim_filtered_listing, get_listings with and
+# without filter pushdown, multi-account buy_notes by account count, and end-to-end receive_message_function latency
+# against the local Prosper stand-in. Results are written as JSON.
+#   python -m benchmark.run --listings 1000,5000,50000 --filter-sets 4,32 --output bench_output.json
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from dacite import from_dict, Config
+
+from benchmark.stub_server import ProsperStandIn
+from benchmark.synthetic import make_filter_sets, make_listings_payload, make_orders
+from model.filterset import FilterSetProperties
+from model.listing_batch import ListingBatch
+from model.listings import Listings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_sizes(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def timed(fn, repeat):
+    samples = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        "max": samples[-1],
+        "repeat": repeat,
+    }
+
+
+def git_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(args, base_url, state_dir):
+    os.environ["PROSPER_BASE_URL"] = base_url
+    os.environ["PROSPER_STATE_DIR"] = state_dir
+    os.environ.setdefault("RUN_MODE", "test")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("PROSPER_TOKEN_STORE", "memory")
+    os.environ.setdefault("PROSPER_BID_LEDGER", "memory")
+    os.environ["PROSPER_BID_LEDGER_MAX_AGE_SECONDS"] = "0"
+    # The stand-in is local, so the client-side token buckets are lifted to time the requests rather than the
+    # rate limiter sleeps. Set PROSPER_HTTP_RATE_LIMITS to benchmark with throttling.
+    from service.http_transport import ENDPOINT_POLICIES
+
+    os.environ.setdefault("PROSPER_HTTP_RATE_LIMITS", ",".join(f"{endpoint}=1000000" for endpoint in ENDPOINT_POLICIES))
+
+
+def create_notes_service(filter_sets):
+    from config.prosper_config import ProsperConfig
+    from service.prosper_notes_service import ProsperNotesService
+
+    prosper_config = ProsperConfig()
+    prosper_config.filter_set_properties = FilterSetProperties(filter_set_list=filter_sets)
+    return ProsperNotesService(prosper_config)
+
+
+def create_multi_account_service(account_count, filter_sets):
+    from config.prosper_config import ProsperConfig
+    from service.multi_account_notes_service import MultiAccountNotesService
+
+    account_configs = list()
+    for i in range(account_count):
+        account_config = ProsperConfig(f"account{i}")
+        account_config.filter_set_properties = FilterSetProperties(filter_set_list=filter_sets)
+        account_configs.append(account_config)
+    return MultiAccountNotesService(ProsperConfig(), account_configs)
+
+
+def make_event(event_type):
+    from cloudevents.http import CloudEvent
+
+    data = {"message": {"data": base64.b64encode(event_type.encode("utf-8")).decode("ascii")}}
+    return CloudEvent({"type": "google.cloud.pubsub.topic.v1.messagePublished", "source": "benchmark"}, data)
+
+
+def run(args):
+    results = list()
+
+    def record(name, stats, **params):
+        results.append({"benchmark": name, **params, "seconds": stats})
+        print(f"{name:28} {json.dumps(params):48} median {stats['median'] * 1000:10.2f} ms", file=sys.stderr)
+
+    orders = make_orders(args.orders, args.in_progress_orders, max(args.listings))
+    latency = {endpoint: args.latency_ms / 1000.0 for endpoint in ("token", "accounts", "listings", "orders")}
+    with tempfile.TemporaryDirectory() as state_dir, ProsperStandIn(make_listings_payload(0), orders, latency=latency) as stand_in:
+        configure_environment(args, stand_in.base_url, state_dir)
+        os.chdir(REPO_DIR)
+        for listing_count in args.listings:
+            payload = make_listings_payload(listing_count, seed=args.seed)
+            stand_in.set_listings(payload)
+
+            if not args.skip_dacite:
+                record("decode.dacite", timed(
+                    lambda: from_dict(data_class=Listings, data=payload, config=Config(strict=False)), min(args.repeat, 3)
+                ), listings=listing_count)
+            record("decode.listing_batch", timed(lambda: ListingBatch.from_dict(payload), args.repeat), listings=listing_count)
+
+            batch = ListingBatch.from_dict(payload)
+            for filter_set_count in args.filter_sets:
+                notes_service = create_notes_service(make_filter_sets(filter_set_count, seed=args.seed))
+                record("filter_listings", timed(lambda: notes_service.filter_listings(batch, args.max_loan_count), args.repeat),
+                       listings=listing_count, filter_sets=filter_set_count)
+
+                filtered_listings = batch.listings(notes_service.filter_listings(batch, args.max_loan_count).rows)
+                record("trim_filtered_listing", timed(
+                    lambda: notes_service.trim_filtered_listing(filtered_listings, args.max_loan_count), args.repeat
+                ), listings=listing_count, filter_sets=filter_set_count, orders=args.orders, matches=len(filtered_listings))
+
+                for pushdown in (False, True):
+                    notes_service.prosper_config.listing_pushdown = pushdown
+                    bytes_before = stand_in.bytes_sent
+                    stats = timed(lambda: notes_service.prosper_rest_service.get_listings(None, notes_service.filter_matcher),
+                                  args.repeat)
+                    record("get_listings", stats, listings=listing_count, filter_sets=filter_set_count, pushdown=pushdown,
+                           bytes_per_run=(stand_in.bytes_sent - bytes_before) // args.repeat)
+
+            # The listings are fetched once per invocation however many accounts there are
+            for account_count in args.accounts:
+                multi_account_service = create_multi_account_service(account_count, make_filter_sets(args.filter_sets[0], seed=args.seed))
+                bytes_before = stand_in.bytes_sent
+                stats = timed(multi_account_service.buy_notes, args.repeat)
+                record("buy_notes.accounts", stats, listings=listing_count, accounts=account_count,
+                       bytes_per_run=(stand_in.bytes_sent - bytes_before) // args.repeat)
+
+        import main
+
+        for listing_count in args.listings:
+            stand_in.set_listings(make_listings_payload(listing_count, seed=args.seed))
+            bytes_before = stand_in.bytes_sent
+            # A new message ID per call, a repeated one is skipped as a redelivery
+            stats = timed(lambda: main.receive_message_function(make_event("buy_notes")), args.repeat)
+            record("receive_message_function", stats, listings=listing_count, orders=args.orders, latency_ms=args.latency_ms,
+                   bytes_per_run=(stand_in.bytes_sent - bytes_before) // args.repeat)
+
+    return {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline investpeer-prosper-py benchmarks")
+    parser.add_argument("--listings", type=parse_sizes, default=[1000, 5000], help="comma separated listing counts")
+    parser.add_argument("--filter-sets", type=parse_sizes, default=[4, 32], help="comma separated filter set counts")
+    parser.add_argument("--accounts", type=parse_sizes, default=[1, 4], help="comma separated account counts")
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--in-progress-orders", type=int, default=20)
+    parser.add_argument("--max-loan-count", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency added by the stand-in to every response")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-dacite", action="store_true", help="skip the slow dacite decode baseline")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
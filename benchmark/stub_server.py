@@ -0,0 +1,207 @@
+# benchmark/stub_server.py
+#
+# Local stand-in for the Prosper token, accounts, listings, orders and notes endpoints, with injectable latency and
+# 401 responses. Accounts and orders carry ETags and answer a matching If-None-Match with 304. The listings endpoint
+# honours limit and the pushed down prosper_rating and months_employed_min filters. Point PROSPER_BASE_URL (or a
+# ProsperRestService transport) at ProsperStandIn.base_url.
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmark.synthetic import make_account, make_orders_page
+
+
+class ProsperStandIn:
+    def __init__(self, listings_payload, orders=None, account=None, latency=None, host="127.0.0.1", port=0, notes=None):
+        self.orders = orders if orders is not None else []
+        self.notes = notes if notes is not None else []
+        self.account = account if account is not None else make_account()
+        self.latency = dict(latency or {})  # endpoint name -> seconds added to each response
+        self.unauthorized_responses = 0  # the next N authenticated requests are answered with 401
+        self.token_count = 0
+        self.submitted_orders = list()
+        self.requests = list()
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.set_listings(listings_payload)
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def set_listings(self, listings_payload):
+        listings_body = json.dumps(listings_payload).encode("utf-8")
+        listings_body_gzip = gzip.compress(listings_body, compresslevel=5)
+        with self.lock:
+            self.listings_payload = listings_payload
+            self.listings_body = listings_body
+            self.listings_body_gzip = listings_body_gzip
+            self.listings_query_bodies = dict()
+
+    def listings_bodies(self, query):
+        # The full payload for the default query, otherwise filtered and cached per query
+        limit = int(query.get("limit", ["5000"])[0])
+        ratings = query.get("prosper_rating", [None])[0]
+        months_employed_min = query.get("months_employed_min", [None])[0]
+        with self.lock:
+            if ratings is None and months_employed_min is None and limit >= len(self.listings_payload["result"]):
+                return self.listings_body, self.listings_body_gzip
+            key = (limit, ratings, months_employed_min)
+            bodies = self.listings_query_bodies.get(key)
+            payload = self.listings_payload
+        if bodies is None:
+            result = payload["result"]
+            if ratings is not None:
+                accepted = set(ratings.split(","))
+                result = [listing for listing in result if listing.get("prosper_rating") in accepted]
+            if months_employed_min is not None:
+                result = [listing for listing in result if (listing.get("months_employed") or 0) >= float(months_employed_min)]
+            body = json.dumps({"result": result[:limit], "result_count": len(result[:limit]), "total_count": len(result)}).encode("utf-8")
+            bodies = (body, gzip.compress(body, compresslevel=5))
+            with self.lock:
+                self.listings_query_bodies[key] = bodies
+        return bodies
+
+    def inject_unauthorized(self, count=1):
+        with self.lock:
+            self.unauthorized_responses += count
+
+    def take_unauthorized(self):
+        with self.lock:
+            if self.unauthorized_responses > 0:
+                self.unauthorized_responses -= 1
+                return True
+            return False
+
+    def delay(self, endpoint):
+        seconds = self.latency.get(endpoint)
+        if seconds:
+            time.sleep(seconds)
+
+    def handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_body(self, status, body, gzip_body=None):
+                if gzip_body is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip_body
+                    self.send_response(status)
+                    self.send_header("Content-Encoding", "gzip")
+                else:
+                    self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with stand_in.lock:
+                    stand_in.bytes_sent += len(body)
+
+            def send_json(self, status, payload):
+                self.send_body(status, json.dumps(payload).encode("utf-8"))
+
+            def send_cacheable_json(self, payload):
+                # ETag over the body, answering a matching If-None-Match with an empty 304
+                body = json.dumps(payload).encode("utf-8")
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                with stand_in.lock:
+                    stand_in.bytes_sent += len(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                with stand_in.lock:
+                    stand_in.requests.append(("GET", self.path))
+                if stand_in.take_unauthorized():
+                    return self.send_json(401, {"error": "invalid_token"})
+                if url.path.startswith("/v1/accounts"):
+                    stand_in.delay("accounts")
+                    return self.send_cacheable_json(stand_in.account)
+                if url.path.startswith("/listingsvc/v2/listings"):
+                    stand_in.delay("listings")
+                    return self.send_body(200, *stand_in.listings_bodies(query))
+                if url.path.startswith("/v1/orders"):
+                    stand_in.delay("orders")
+                    limit = int(query.get("limit", ["25"])[0])
+                    offset = int(query.get("offset", ["0"])[0])
+                    return self.send_cacheable_json(make_orders_page(stand_in.orders, limit, offset))
+                if url.path.startswith("/v1/notes"):
+                    stand_in.delay("notes")
+                    limit = min(int(query.get("limit", ["25"])[0]), 25)
+                    offset = int(query.get("offset", ["0"])[0])
+                    return self.send_json(200, make_orders_page(stand_in.notes, limit, offset))
+                return self.send_json(404, {"error": "not_found"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stand_in.lock:
+                    stand_in.requests.append(("POST", self.path))
+                if url.path.startswith("/v1/security/oauth/token"):
+                    stand_in.delay("token")
+                    with stand_in.lock:
+                        stand_in.token_count += 1
+                        token_count = stand_in.token_count
+                    return self.send_json(200, {
+                        "access_token": f"access-{token_count}",
+                        "token_type": "bearer",
+                        "refresh_token": f"refresh-{token_count}",
+                        "expires_in": 3599,
+                    })
+                if stand_in.take_unauthorized():
+                    return self.send_json(401, {"error": "invalid_token"})
+                if url.path.startswith("/v1/orders"):
+                    stand_in.delay("orders")
+                    orders_request = json.loads(body)
+                    with stand_in.lock:
+                        order_id = f"submitted-{len(stand_in.submitted_orders):06d}"
+                        stand_in.submitted_orders.append(orders_request)
+                    return self.send_json(200, {
+                        "order_id": order_id,
+                        "order_date": time.strftime("%Y-%m-%d %H:%M:%S +0000", time.gmtime()),
+                        "order_status": "IN_PROGRESS",
+                        "source": "API",
+                        "bid_requests": [dict(bid, bid_status="PENDING") for bid in orders_request.get("bid_requests", [])],
+                    })
+                return self.send_json(404, {"error": "not_found"})
+
+        return Handler
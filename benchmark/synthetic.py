@@ -0,0 +1,161 @@
+# benchmark/synthetic.py
+#
+# Realistic synthetic Prosper payloads for the benchmarks and the local API stand-in
+import random
+from datetime import datetime, timedelta, timezone
+
+from model.filterset import FilterSet
+from model.listing_batch import PROSPER_RATINGS
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S +0000"
+BASE_DATE = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+FIRST_LISTING_NUMBER = 1000000
+
+
+def make_listing(listing_number, rng):
+    income = rng.choice([0.0, rng.uniform(2000, 15000)])
+    created = BASE_DATE - timedelta(minutes=rng.randint(0, 60 * 24 * 14))
+    updated = created + timedelta(minutes=rng.randint(0, 600))
+    return {
+        "listing_number": listing_number,
+        "prosper_rating": rng.choice(PROSPER_RATINGS),
+        "listing_status": 2,
+        "listing_amount": rng.choice([5000.0, 10000.0, 15000.0, 25000.0]),
+        "amount_funded": rng.uniform(0, 5000),
+        "amount_remaining": rng.uniform(0, 10000),
+        "percent_funded": rng.uniform(0, 1),
+        "lender_yield": rng.uniform(0.05, 0.3),
+        "borrower_rate": rng.uniform(0.06, 0.32),
+        "borrower_apr": rng.uniform(0.07, 0.35),
+        "listing_term": rng.choice([36, 60]),
+        "listing_monthly_payment": rng.uniform(100, 900),
+        "prosper_score": rng.randint(1, 11),
+        "listing_category_id": 1,
+        "listing_title": "Debt Consolidation",
+        "income_range": rng.randint(4, 6),
+        "income_range_description": "$50,000-74,999",
+        "stated_monthly_income": income,
+        "income_verifiable": True,
+        "dti_wprosper_loan": rng.uniform(0.05, 0.5),
+        "employment_status_description": "Employed",
+        "occupation": "Professional",
+        "borrower_state": rng.choice(["CA", "TX", "NY", "WA", "IL"]),
+        "prior_prosper_loans_active": rng.randint(0, 2),
+        "prior_prosper_loans": rng.randint(0, 4),
+        "months_employed": rng.choice([None, rng.uniform(0, 240)]),
+        "historical_return": rng.uniform(0.02, 0.12),
+        "historical_return_10th_pctl": rng.uniform(0.0, 0.05),
+        "historical_return_90th_pctl": rng.uniform(0.08, 0.15),
+        "has_mortgage": True,
+        "biddable": True,
+        "invested": False,
+        "listing_start_date": created.strftime(DATE_FORMAT),
+        "listing_creation_date": created.strftime(DATE_FORMAT),
+        "last_updated_date": updated.strftime(DATE_FORMAT),
+        "member_key": f"M{listing_number:09d}",
+        "credit_bureau_values_transunion_indexed": {
+            "credit_report_date": created.strftime(DATE_FORMAT),
+            "g980s_inquiries_in_the_last_6_months": float(rng.randint(0, 5)),
+            "g218b_number_of_delinquent_accounts": float(rng.randint(0, 3)),
+            "at02s_open_accounts": float(rng.randint(1, 20)),
+            "re33s_balance_owed_on_all_revolving_accounts": rng.uniform(0, 40000),
+            "bc34s_bankcard_utilization": rng.uniform(0, 1),
+            "fico_score": rng.choice(["640-659", "660-679", "680-699", "700-719", "720-739"]),
+        },
+    }
+
+
+def make_listings_payload(count, seed=0):
+    rng = random.Random(seed)
+    result = [make_listing(FIRST_LISTING_NUMBER + i, rng) for i in range(count)]
+    return {"result": result, "result_count": count, "total_count": count}
+
+
+def make_orders(count, in_progress_count, listing_count, seed=0, bids_per_order=5):
+    # Newest first, the first in_progress_count orders are still IN_PROGRESS
+    rng = random.Random(seed)
+    orders = list()
+    for i in range(count):
+        order_date = BASE_DATE - timedelta(hours=i * 6)
+        orders.append({
+            "order_id": f"order-{i:06d}",
+            "order_date": order_date.strftime(DATE_FORMAT),
+            "order_status": "IN_PROGRESS" if i < in_progress_count else "COMPLETED",
+            "source": "API",
+            "bid_requests": [
+                {
+                    "listing_id": FIRST_LISTING_NUMBER + rng.randrange(max(listing_count, 1)),
+                    "bid_amount": 25.0,
+                    "bid_status": "PENDING" if i < in_progress_count else "INVESTED",
+                }
+                for _ in range(bids_per_order)
+            ],
+        })
+    return orders
+
+
+def make_orders_page(orders, limit, offset):
+    result = orders[offset:offset + limit]
+    return {"result": result, "result_count": len(result), "total_count": len(orders)}
+
+
+def make_notes(count, seed=0):
+    rng = random.Random(seed)
+    notes = list()
+    for i in range(count):
+        term = rng.choice([36, 36, 60, 12])
+        age = rng.randint(0, term)
+        amount = 25.0
+        paid = round(amount * age / term, 2)
+        status = rng.choices(["CURRENT", "COMPLETED", "CHARGEOFF", "DEFAULTED"], [80, 12, 6, 2])[0]
+        days_past_due = rng.choice([0] * 20 + [5, 20, 45, 75, 100, 150]) if status == "CURRENT" else 0
+        notes.append({
+            "loan_note_id": f"{FIRST_LISTING_NUMBER + i}-{i % 7}",
+            "listing_number": FIRST_LISTING_NUMBER + i,
+            "prosper_rating": rng.choice(PROSPER_RATINGS),
+            "term": term,
+            "age_in_months": age,
+            "note_ownership_amount": amount,
+            "principal_balance_pro_rata_share": 0.0 if status == "COMPLETED" else round(amount - paid, 2),
+            "principal_paid_pro_rata_share": amount if status == "COMPLETED" else paid,
+            "interest_paid_pro_rata_share": round(paid * rng.uniform(0.1, 0.3), 2),
+            "days_past_due": days_past_due,
+            "lender_yield": round(rng.uniform(0.05, 0.3), 4),
+            "note_status_description": status,
+            "is_sold": False,
+            "origination_date": (BASE_DATE - timedelta(days=30 * age)).strftime("%Y-%m-%d"),
+        })
+    return notes
+
+
+def make_account(available_cash_balance=1000.0):
+    return {
+        "available_cash_balance": available_cash_balance,
+        "pending_investments_primary_market": 0.0,
+        "pending_investments_secondary_market": 0.0,
+        "pending_quick_invest_orders": 0.0,
+        "total_principal_received_on_active_notes": 1500.0,
+        "total_amount_invested_on_active_notes": 10000.0,
+        "outstanding_principal_on_active_notes": 8500.0,
+        "total_account_value": 9500.0,
+        "pending_deposit": 0.0,
+        "invested_notes": {"AA": 500.0, "A": 1500.0, "B": 2500.0, "C": 2500.0, "D": 1000.0, "E": 500.0},
+        "pending_bids": {},
+    }
+
+
+def make_filter_sets(count, seed=0):
+    rng = random.Random(seed)
+    filter_sets = list()
+    for i in range(count):
+        low = rng.randrange(len(PROSPER_RATINGS))
+        high = rng.randrange(low, len(PROSPER_RATINGS))
+        filter_sets.append(FilterSet(
+            grades=",".join(PROSPER_RATINGS[low:high + 1]),
+            employment_length_over=rng.randint(0, 5),
+            inquiries_under=rng.randint(0, 3),
+            delinquencies_under=rng.randint(0, 2),
+            payment_income_ratio_under=round(rng.uniform(0.05, 0.2), 2),
+            loan_count_over=rng.choice([0, 4, 8, 12]),
+        ))
+    return filter_sets
@@ -0,0 +1,60 @@
+# config/filterset_loader.py
+#
+# Loads the filter sets from the precompiled JSON artifact when it matches config/filterset.yml, so PyYAML is
+# only imported when the artifact is missing or stale. deploy.sh builds the artifact:
+#   python -m config.filterset_loader config/filterset.yml
+import hashlib
+import json
+import logging
+import os
+import sys
+
+from model.filterset import FilterSet, FilterSetProperties
+
+logger = logging.getLogger(__name__)
+
+
+def compiled_path(yaml_path):
+    return os.path.splitext(yaml_path)[0] + ".compiled.json"
+
+
+def source_hash(yaml_path):
+    with open(yaml_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def parse_filterset_yaml(yaml_path):
+    import yaml
+
+    with open(yaml_path, "r") as f:
+        data = yaml.safe_load(f)
+    return data.get("filter-set-list", {})
+
+
+def compile_filterset(yaml_path):
+    artifact = {"source_sha256": source_hash(yaml_path), "filter-set-list": parse_filterset_yaml(yaml_path)}
+    path = compiled_path(yaml_path)
+    with open(path, "w") as f:
+        json.dump(artifact, f, indent=2)
+    return path
+
+
+def load_filterset_properties(yaml_path: str) -> FilterSetProperties:
+    filtersets = None
+    try:
+        with open(compiled_path(yaml_path), "r") as f:
+            artifact = json.load(f)
+        if artifact.get("source_sha256") == source_hash(yaml_path):
+            filtersets = artifact.get("filter-set-list", {})
+        else:
+            logger.info("Compiled filter sets are stale, parsing %s", yaml_path)
+    except FileNotFoundError:
+        pass
+    if filtersets is None:
+        filtersets = parse_filterset_yaml(yaml_path)
+    filter_set_list = [FilterSet(**fs) for fs in filtersets]
+    return FilterSetProperties(filter_set_list=filter_set_list)
+
+
+if __name__ == "__main__":
+    print(compile_filterset(sys.argv[1] if len(sys.argv) > 1 else "config/filterset.yml"))
@@ -2,20 +2,95 @@ import os
 
 
 class ProsperConfig:
-    def __init__(self):
+    # With an account, the credentials, filter sets, minimum investment, email recipient and state dir are read from
+    # PROSPER_<ACCOUNT>_* first, e.g. PROSPER_ALICE_CLIENT_ID, and the state dir defaults to a subdirectory per account
+    def __init__(self, account=None):
+        self.account = account
+        self.accounts = [a.strip() for a in os.environ.get("PROSPER_ACCOUNTS", "").split(",") if a.strip()]
         self.run_mode = os.environ.get("RUN_MODE", "test")
-        self.client_id = os.environ.get("PROSPER_CLIENT_ID")
-        self.client_secret = os.environ.get("PROSPER_CLIENT_SECRET")
-        self.username = os.environ.get("PROSPER_USERNAME")
-        self.password = os.environ.get("PROSPER_PASSWORD")
+        self.client_id = self.account_env("CLIENT_ID")
+        self.client_secret = self.account_env("CLIENT_SECRET")
+        self.username = self.account_env("USERNAME")
+        self.password = self.account_env("PASSWORD")
+        self.filterset_file = self.account_env("FILTERSET_FILE", "config/filterset.yml")
         self.base_url = os.environ.get("PROSPER_BASE_URL", "https://api.prosper.com")
-        self.minimum_investment_amount = float(os.environ.get("PROSPER_MINIMUM_INVESTMENT_AMOUNT", 25.0))
-        self.order_list_limit = int(os.environ.get("PROSPER_ORDER_LIST_LIMIT", 25))
+        self.minimum_investment_amount = float(self.account_env("MINIMUM_INVESTMENT_AMOUNT", 25.0))
+        self.state_dir = os.environ.get("PROSPER_STATE_DIR", "/tmp/investpeer-prosper")
+        if account:
+            self.state_dir = os.environ.get(f"{self.account_prefix()}STATE_DIR", os.path.join(self.state_dir, "accounts", account))
+        self.token_store = os.environ.get("PROSPER_TOKEN_STORE", "file")
+        self.token_refresh_margin = int(os.environ.get("PROSPER_TOKEN_REFRESH_MARGIN", 60))
+        self.bid_ledger = os.environ.get("PROSPER_BID_LEDGER", "sqlite")
+        # 0 reconciles with the orders list every run; a longer window is only safe with one instance or a shared state dir
+        self.bid_ledger_max_age = int(os.environ.get("PROSPER_BID_LEDGER_MAX_AGE_SECONDS", 0))
+        self.incremental_listings = os.environ.get("PROSPER_INCREMENTAL_LISTINGS", "false").lower() == "true"
+        self.seen_listing_cache = os.environ.get("PROSPER_SEEN_LISTING_CACHE", "sqlite")
+        self.seen_listing_ttl = int(os.environ.get("PROSPER_SEEN_LISTING_TTL_SECONDS", 3600))
+        self.listing_archive = os.environ.get("PROSPER_LISTING_ARCHIVE", "false").lower() == "true"
+        self.listing_archive_dir = os.environ.get("PROSPER_LISTING_ARCHIVE_DIR", os.path.join(self.state_dir, "listing_archive"))
+        self.listing_pushdown = os.environ.get("PROSPER_LISTING_PUSHDOWN", "false").lower() == "true"
+        self.listing_pushdown_max_queries = int(os.environ.get("PROSPER_LISTING_PUSHDOWN_MAX_QUERIES", 4))
+        self.listing_pushdown_report = os.environ.get("PROSPER_LISTING_PUSHDOWN_REPORT", "true").lower() == "true"
+        self.stream_listings = os.environ.get("PROSPER_STREAM_LISTINGS", "false").lower() == "true"
+        self.stream_batch_size = int(os.environ.get("PROSPER_STREAM_BATCH_SIZE", 500))
+        self.single_flight = os.environ.get("PROSPER_SINGLE_FLIGHT", "true").lower() == "true"
+        self.lock_store = os.environ.get("PROSPER_LOCK_STORE", "sqlite")
+        # Longer than a buy_notes run, so the lease only expires when its holder died
+        self.lease_seconds = float(os.environ.get("PROSPER_LEASE_SECONDS", 300))
+        self.message_dedup_seconds = float(os.environ.get("PROSPER_MESSAGE_DEDUP_SECONDS", 3600))
+        self.daemon_min_interval = float(os.environ.get("PROSPER_DAEMON_MIN_INTERVAL_SECONDS", 2))
+        self.daemon_max_interval = float(os.environ.get("PROSPER_DAEMON_MAX_INTERVAL_SECONDS", 300))
+        self.daemon_release_times = os.environ.get("PROSPER_DAEMON_RELEASE_TIMES", "09:00,17:00")
+        self.daemon_release_window_minutes = float(os.environ.get("PROSPER_DAEMON_RELEASE_WINDOW_MINUTES", 5))
+        self.daemon_time_zone = os.environ.get("PROSPER_DAEMON_TIME_ZONE", "America/Los_Angeles")
+        self.http_pool_size = int(os.environ.get("PROSPER_HTTP_POOL_SIZE", 10))
+        self.http_rate_limits = os.environ.get("PROSPER_HTTP_RATE_LIMITS")  # e.g. "listings=2:4,orders=5"
+        self.http_max_retries = int(os.environ.get("PROSPER_HTTP_MAX_RETRIES", 3))
+        self.http_backoff_base = float(os.environ.get("PROSPER_HTTP_BACKOFF_BASE_SECONDS", 0.25))
+        self.http_backoff_max = float(os.environ.get("PROSPER_HTTP_BACKOFF_MAX_SECONDS", 10))
+        self.circuit_failure_threshold = int(os.environ.get("PROSPER_CIRCUIT_FAILURE_THRESHOLD", 5))
+        self.circuit_reset_timeout = float(os.environ.get("PROSPER_CIRCUIT_RESET_SECONDS", 30))
+        self.response_cache = os.environ.get("PROSPER_RESPONSE_CACHE", "true").lower() == "true"
+        # Seconds an entity is served without asking the API; accounts is always revalidated by default
+        self.response_cache_ttls = os.environ.get("PROSPER_RESPONSE_CACHE_TTLS", "accounts=0,orders=0")
+        self.response_cache_size = int(os.environ.get("PROSPER_RESPONSE_CACHE_SIZE", 256))
+        self.order_list_limit = int(os.environ.get("PROSPER_ORDER_LIST_LIMIT", 100))
+        self.ranking_score = os.environ.get("PROSPER_RANKING_SCORE")
+        self.portfolio_analytics = os.environ.get("PROSPER_PORTFOLIO_ANALYTICS", "true").lower() == "true"
+        self.notes_page_limit = int(os.environ.get("PROSPER_NOTES_PAGE_LIMIT", 25))
+        self.notes_workers = int(os.environ.get("PROSPER_NOTES_WORKERS", 4))
+        self.note_cache = os.environ.get("PROSPER_NOTE_CACHE", "sqlite")
+        self.note_cache_max_age = int(os.environ.get("PROSPER_NOTE_CACHE_MAX_AGE_SECONDS", 300))
+        self.order_chunk_size = int(os.environ.get("PROSPER_ORDER_CHUNK_SIZE", 100))
+        self.order_submit_workers = int(os.environ.get("PROSPER_ORDER_SUBMIT_WORKERS", 4))
+        self.order_list_workers = int(os.environ.get("PROSPER_ORDER_LIST_WORKERS", 4))
+        in_progress_max_age_hours = os.environ.get("PROSPER_ORDER_IN_PROGRESS_MAX_AGE_HOURS")
+        self.order_in_progress_max_age_hours = float(in_progress_max_age_hours) if in_progress_max_age_hours else None
         self.email_from = os.environ.get("PROSPER_EMAIL_FROM")
-        self.email_to = os.environ.get("PROSPER_EMAIL_TO")
+        self.email_to = self.account_env("EMAIL_TO")
         self.sendgrid_api_key = os.environ.get("PROSPER_SENDGRID_API_KEY")
+        self.notification_sink = os.environ.get("PROSPER_NOTIFICATION_SINK")
+        self.notification_file = os.environ.get(
+            "PROSPER_NOTIFICATION_FILE", os.path.join(self.state_dir, "notifications.jsonl")
+        )
+        self.notification_async = os.environ.get("PROSPER_NOTIFICATION_ASYNC", "true").lower() == "true"
+        self.notification_queue_size = int(os.environ.get("PROSPER_NOTIFICATION_QUEUE_SIZE", 100))
+        self.notification_digest_seconds = float(os.environ.get("PROSPER_NOTIFICATION_DIGEST_SECONDS", 0))
+        self.notification_flush_timeout = float(os.environ.get("PROSPER_NOTIFICATION_FLUSH_TIMEOUT_SECONDS", 10))
+        self.metrics_exporter = os.environ.get("PROSPER_METRICS_EXPORTER", "log")
+        self.diagnostics_snapshot_dir = os.environ.get("PROSPER_DIAGNOSTICS_SNAPSHOT_DIR")
         self.global_filters = {
             "listing_category_id": os.environ.get("PROSPER_GLOBAL_FILTERS_LISTING_CATEGORY_ID", "1"),
             "has_mortgage": os.environ.get("PROSPER_GLOBAL_FILTERS_HAS_MORTGAGE", "true"),
             "income_range": os.environ.get("PROSPER_GLOBAL_FILTERS_INCOME_RANGE", "4,5,6"),
         }
+
+    def account_prefix(self):
+        return f"PROSPER_{self.account.upper().replace('-', '_')}_"
+
+    def account_env(self, name, default=None):
+        if self.account:
+            value = os.environ.get(f"{self.account_prefix()}{name}")
+            if value is not None:
+                return value
+        return os.environ.get(f"PROSPER_{name}", default)
@@ -0,0 +1,7 @@
+# Long-running polling mode; shares the configuration and services of the Pub/Sub entry point in main.py
+#   python daemon.py
+from main import invocation_guard, prosper_config, prosper_notes_service
+from service.polling_daemon import PollingDaemon
+
+if __name__ == "__main__":
+    PollingDaemon(prosper_config, prosper_notes_service, invocation_guard).run()
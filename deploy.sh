@@ -1,4 +1,7 @@
 #!/bin/bash
+for filterset in config/filterset*.yml; do
+  python -m config.filterset_loader "$filterset" || exit 1
+done
 gcloud functions deploy function-investpeer-prosper-py \
 --gen2 \
 --source . \
@@ -4,24 +4,44 @@ import logging
 import os
 import traceback
 
-import yaml
-
 import functions_framework
 
 from config.prosper_config import ProsperConfig
-from model.filterset import FilterSetProperties, FilterSet
-from service.notification_service import NotificationService
-from service.prosper_notes_service import ProsperNotesService
+from service.diagnostics import Diagnostics
+from service.invocation_guard import InvocationGuard
+from service.lock_store import create_lock_store
+from service.multi_account_notes_service import create_notes_service
 
 
 # Register a CloudEvent function with the Functions Framework
 @functions_framework.cloud_event
 def receive_message_function(cloud_event):
+    setup_cloud_logging()
     logger.info(f"Cloud Event Received: {cloud_event}")
     event_type = get_and_decode_data_data(cloud_event)
-    logger.info(f"Event Type: {event_type}")
+    message_id = get_message_id(cloud_event)
+    logger.info(f"Event Type: {event_type}, message ID: {message_id}")
     logger.info("Run mode: " + prosper_config.run_mode)
+    # Pub/Sub delivers at least once, a redelivery of a message already processed is acknowledged as is
+    if not invocation_guard.claim_message(message_id):
+        logger.info(f"Message {message_id} was already processed, skipping")
+        return
     try:
+        invocation_guard.run(invocation_guard.key(event_type), lambda: process_event(event_type))
+        invocation_guard.confirm_message(message_id)
+    except Exception as e:
+        invocation_guard.release_message(message_id)
+        logger.error(f"Error processing {event_type} event: {e}")
+        # prosper_notes_service.notification_service.send_error_notification(traceback.format_exc())
+        raise e
+    finally:
+        # Cloud Functions throttles the CPU once the function returns, so queued notifications are sent first
+        prosper_notes_service.flush_notifications()
+    return
+
+
+def process_event(event_type):
+    with prosper_notes_service.metrics.invocation(event_type):
         if event_type == "buy_notes":
             prosper_notes_service.buy_notes()
         elif event_type == "account_summary":
@@ -29,30 +49,35 @@ def receive_message_function(cloud_event):
         else:
             logger.error(f"Unknown event type: {event_type}")
             raise ValueError(f"Unknown event type: {event_type}")
-    except Exception as e:
-        logger.error(f"Error processing {event_type} event: {e}")
-        # notification_service.send_error_notification(traceback.format_exc())
-        raise e
-    return
 
 
-def load_filterset_properties(yaml_path: str) -> FilterSetProperties:
-    with open(yaml_path, "r") as f:
-        data = yaml.safe_load(f)
-    filtersets = data.get("filter-set-list", {})
-    filter_set_list = [FilterSet(**fs) for fs in filtersets]
-    return FilterSetProperties(filter_set_list=filter_set_list)
+def setup_cloud_logging():
+    # Deferred to the first event so the Cloud Logging client is not imported and created on the cold start path
+    global cloud_logging_client
+    if cloud_logging_client is None and os.environ.get("K_SERVICE"):
+        from google.cloud import logging as cloud_logging
+
+        cloud_logging_client = cloud_logging.Client()
+        cloud_logging_client.setup_logging()
+
+
+def get_message_id(event):
+    # The CloudEvent id of a Pub/Sub event is the message ID, which is kept across redeliveries
+    try:
+        return event["id"]
+    except (KeyError, TypeError):
+        return None
 
 
 def get_and_decode_data_data(event):
     try:
-        logger.debug(f"Event is of type: {type(event)}")
-        logger.debug(f"Event data: {event.get_data()}")
+        logger.debug("Event is of type: %s", type(event))
+        diagnostics.dump("Event data", event.get_data)
         data_field = event.get_data()["message"]["data"]
 
-        logger.debug(f"Data field found in message: {data_field}")
+        logger.debug("Data field found in message: %s", data_field)
         decoded = base64.b64decode(data_field, validate=True)
-        logger.debug(f"Decoded data: {decoded}")
+        logger.debug("Decoded data: %s", decoded)
         return decoded.decode("utf-8")
     except (KeyError, TypeError, binascii.Error) as e:
         logger.error(f"Failed to decode data from message: {e}")
@@ -66,18 +91,18 @@ print(f"Setting log level to: {log_level}")
 logging.basicConfig(level=getattr(logging, log_level, logging.INFO))
 print(f"Logging configured with level: {log_level}")
 
-if os.environ.get("K_SERVICE"):
-    from google.cloud import logging as cloud_logging
-
-    cloud_logging_client = cloud_logging.Client()
-    cloud_logging_client.setup_logging()
+cloud_logging_client = None
 
 logger = logging.getLogger(__name__)
 logger.info("Logging initialized")
 
 # Initialize Prosper configuration and service
 prosper_config = ProsperConfig()
-prosper_config.filter_set_properties = load_filterset_properties("config/filterset.yml")
-logger.debug(f"Filter set properties loaded: {prosper_config.filter_set_properties}")
-prosper_notes_service = ProsperNotesService(prosper_config)
-notification_service = NotificationService(prosper_config)
+diagnostics = Diagnostics(logger, prosper_config.diagnostics_snapshot_dir)
+# A ProsperNotesService, or with PROSPER_ACCOUNTS a fan-out over one per account sharing the listings fetch
+prosper_notes_service = create_notes_service(prosper_config)
+invocation_guard = InvocationGuard(prosper_config, create_lock_store(prosper_config))
+if prosper_config.accounts:
+    logger.info(f"Multi-account mode: {', '.join(prosper_config.accounts)}")
+else:
+    diagnostics.dump("Filter set properties loaded", lambda: prosper_config.filter_set_properties)
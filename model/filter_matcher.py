@@ -0,0 +1,88 @@
+# model/filter_matcher.py
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from model.filterset import FilterSet
+from model.listing_batch import ListingBatch, RATING_CODES, UNKNOWN_RATING
+
+
+@dataclass
+class FilterMatch:
+    # Matched batch rows, deduplicated, with the first filter set (by configured order) that matched each row
+    rows: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    filter_sets: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    # Whether some filter set matches each batch row at any loan count, from the same match matrix
+    candidates: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class FilterMatcher:
+    # The filter sets compiled once into arrays: grades as bitmasks over the rating codes and one threshold
+    # array per check. A threshold that is not configured never matches, like the check_* functions.
+    def __init__(self, filter_set_list: List[FilterSet]):
+        self.filter_set_list = list(filter_set_list)
+        self.grade_masks = np.array([_grade_mask(fs.grades) for fs in self.filter_set_list], dtype=np.int64)
+        self.min_months_employed = _thresholds(
+            [None if fs.employment_length_over is None else fs.employment_length_over * 12 for fs in self.filter_set_list],
+            np.inf,
+        )
+        self.max_inquiries = _thresholds([fs.inquiries_under for fs in self.filter_set_list], -np.inf)
+        self.max_delinquencies = _thresholds([fs.delinquencies_under for fs in self.filter_set_list], -np.inf)
+        self.max_payment_income_ratio = _thresholds([fs.payment_income_ratio_under for fs in self.filter_set_list], -np.inf)
+        self.loan_count_over = _thresholds([fs.loan_count_over for fs in self.filter_set_list], 0)
+
+    def __len__(self):
+        return len(self.filter_set_list)
+
+    def active(self, max_loan_count: int) -> np.ndarray:
+        return self.loan_count_over <= max_loan_count
+
+    def match(self, batch: ListingBatch, max_loan_count: int) -> FilterMatch:
+        if len(batch) == 0 or len(self) == 0:
+            return FilterMatch(candidates=np.zeros(len(batch), dtype=bool))
+
+        candidate_matches = self.match_matrix(batch, float("inf"))
+        matches = candidate_matches & self.active(max_loan_count)[:, None]
+        matched = matches.any(axis=0)
+        rows = np.flatnonzero(matched)
+        filter_sets = matches.argmax(axis=0)[rows]
+        # Keep the order the per-filter-set loop produced: by first matching filter set, then by listing order
+        order = np.lexsort((rows, filter_sets))
+        return FilterMatch(rows=rows[order], filter_sets=filter_sets[order], candidates=candidate_matches.any(axis=0))
+
+    def match_matrix(self, batch: ListingBatch, max_loan_count: int) -> np.ndarray:
+        # Whether each filter set (rows) matches each listing (columns), on its own
+        income = batch.stated_monthly_income
+        eligible = batch.has_credit_bureau & (income > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            payment_income_ratio = np.where(eligible, batch.listing_monthly_payment / income, np.nan)
+        codes = batch.rating_code.astype(np.int64)
+        grade_bits = np.where(codes != UNKNOWN_RATING, np.left_shift(1, np.maximum(codes, 0)), 0)
+
+        return (
+                ((self.grade_masks[:, None] & grade_bits[None, :]) != 0)
+                & (batch.months_employed[None, :] >= self.min_months_employed[:, None])
+                & (batch.inquiries[None, :] <= self.max_inquiries[:, None])
+                & (batch.delinquencies[None, :] <= self.max_delinquencies[:, None])
+                & (payment_income_ratio[None, :] <= self.max_payment_income_ratio[:, None])
+                & eligible[None, :]
+                & self.active(max_loan_count)[:, None]
+        )
+
+
+def _grade_mask(grades) -> int:
+    mask = 0
+    if grades is not None:
+        for grade in grades.split(","):
+            code = RATING_CODES.get(grade.strip())
+            if code is not None:
+                mask |= 1 << code
+    return mask
+
+
+def _thresholds(values, missing) -> np.ndarray:
+    return np.array([missing if v is None else v for v in values], dtype=np.float64)
@@ -11,6 +11,7 @@ class FilterSet:
     delinquencies_under: Optional[int] = None
     payment_income_ratio_under: Optional[float] = None
     loan_count_over: Optional[int] = None
+    priority: Optional[int] = None
 
 
 @dataclass
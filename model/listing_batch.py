@@ -0,0 +1,65 @@
+# model/listing_batch.py
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from model.listings import ListingView
+
+# Prosper ratings in ascending order of risk; the index is the categorical code
+PROSPER_RATINGS = ("AA", "A", "B", "C", "D", "E", "HR")
+RATING_CODES = {rating: code for code, rating in enumerate(PROSPER_RATINGS)}
+UNKNOWN_RATING = -1
+
+CREDIT_BUREAU_KEY = "credit_bureau_values_transunion_indexed"
+
+
+class ListingBatch:
+    # Columnar view of a listings payload. Only the fields read while filtering are decoded into arrays,
+    # the raw records are kept and rows are handed out as ListingView objects reading them on demand.
+    def __init__(self, records: List[Dict[str, Any]], result_count: int, total_count: int):
+        self.records = records
+        self.result_count = result_count
+        self.total_count = total_count
+
+        n = len(records)
+        bureau = [r.get(CREDIT_BUREAU_KEY) for r in records]
+        self.has_credit_bureau = np.fromiter((b is not None for b in bureau), dtype=bool, count=n)
+        bureau = [b or {} for b in bureau]
+
+        self.listing_number = _int_column([r.get("listing_number") for r in records])
+        self.rating_code = np.fromiter(
+            (RATING_CODES.get(r.get("prosper_rating"), UNKNOWN_RATING) for r in records), dtype=np.int8, count=n
+        )
+        self.months_employed = _float_column([r.get("months_employed") for r in records])
+        self.stated_monthly_income = _float_column([r.get("stated_monthly_income") for r in records])
+        self.listing_monthly_payment = _float_column([r.get("listing_monthly_payment") for r in records])
+        self.inquiries = _float_column([b.get("g980s_inquiries_in_the_last_6_months") for b in bureau])
+        self.delinquencies = _float_column([b.get("g218b_number_of_delinquent_accounts") for b in bureau])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ListingBatch":
+        return cls(data.get("result") or [], data.get("result_count") or 0, data.get("total_count") or 0)
+
+    def __len__(self):
+        return len(self.records)
+
+    def prosper_rating(self, row: int) -> Optional[str]:
+        code = self.rating_code[row]
+        return PROSPER_RATINGS[code] if code != UNKNOWN_RATING else None
+
+    def listing(self, row: int) -> ListingView:
+        return ListingView(self.records[row])
+
+    def listings(self, rows: Optional[List[int]] = None) -> List[ListingView]:
+        if rows is None:
+            rows = range(len(self))
+        return [self.listing(int(row)) for row in rows]
+
+
+def _float_column(values: List[Any]) -> np.ndarray:
+    # None becomes NaN, which fails every threshold comparison
+    return np.array(values, dtype=np.float64)
+
+
+def _int_column(values: List[Any]) -> np.ndarray:
+    return np.array([-1 if v is None else v for v in values], dtype=np.int64)
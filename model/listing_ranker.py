@@ -0,0 +1,87 @@
+# model/listing_ranker.py
+import ast
+import heapq
+import math
+from dataclasses import fields
+from typing import List, Optional
+
+from model.filterset import FilterSet
+from model.listings import Listing, RecordView
+
+_FUNCTIONS = {"min": min, "max": max, "abs": abs}
+_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+_LISTING_FIELDS = {f.name for f in fields(Listing)}
+
+
+class ListingRanker:
+    # Scores candidates with an arithmetic expression over Listing fields and "priority", the matched filter
+    # set's priority (FilterSet.priority, or earlier filter sets higher), and keeps the best k with a heap.
+    # Ties go to the higher priority filter set, then to the earlier listing. Without an expression the
+    # candidates keep their match order: by filter set, then API order.
+    def __init__(self, score_expression: Optional[str], filter_set_list: List[FilterSet]):
+        self.score_expression = score_expression.strip() if score_expression else None
+        count = len(filter_set_list)
+        self.priorities = [
+            count - index if fs.priority is None else fs.priority for index, fs in enumerate(filter_set_list)
+        ]
+        self.function = None
+        self.field_names = list()
+        if self.score_expression:
+            tree = ast.parse(self.score_expression, mode="eval")
+            self.field_names = sorted(_validate(tree) - {"priority"})
+            # Compiled once into lambda <fields>, priority: <expression>
+            arguments = ast.arguments(
+                posonlyargs=[], args=[ast.arg(name) for name in self.field_names + ["priority"]],
+                kwonlyargs=[], kw_defaults=[], defaults=[],
+            )
+            function_tree = ast.fix_missing_locations(ast.Expression(ast.Lambda(arguments, tree.body)))
+            self.function = eval(compile(function_tree, "<ranking score>", "eval"), {"__builtins__": {}, **_FUNCTIONS})
+
+    def score(self, listing, filter_set_index) -> float:
+        if isinstance(listing, RecordView):
+            # Read straight from the raw record rather than through the view's __getattr__
+            record = listing.record
+            values = [record.get(name) for name in self.field_names]
+        else:
+            values = [getattr(listing, name) for name in self.field_names]
+        try:
+            value = float(self.function(*values, self.priorities[filter_set_index]))
+        except (TypeError, ZeroDivisionError, OverflowError, ValueError):
+            # A missing field (None) or an undefined value ranks the listing last
+            return -math.inf
+        return -math.inf if math.isnan(value) else value
+
+    def top_k(self, listings, filter_sets, k):
+        listings = list(listings)
+        if self.function is None:
+            return listings[:k]
+        keys = self.keys(listings, filter_sets)
+        best = heapq.nlargest(k, range(len(listings)), key=keys.__getitem__)
+        return [listings[position] for position in best]
+
+    def keys(self, listings, filter_sets):
+        # (score, priority, -position) per candidate, larger is better
+        return [
+            (self.score(listing, filter_set_index), self.priorities[filter_set_index], -position)
+            for position, (listing, filter_set_index) in enumerate(zip(listings, [int(i) for i in filter_sets]))
+        ]
+
+
+def _validate(tree) -> set:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if node.id in _FUNCTIONS:
+                continue
+            if node.id != "priority" and node.id not in _LISTING_FIELDS:
+                raise Exception(f"Unknown field in ranking score: {node.id}")
+            names.add(node.id)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+                raise Exception(f"Unsupported function in ranking score: {ast.unparse(node)}")
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+                raise Exception(f"Unsupported constant in ranking score: {node.value!r}")
+        elif not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Load) + _OPERATORS):
+            raise Exception(f"Unsupported syntax in ranking score: {type(node).__name__}")
+    return names
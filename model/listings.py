@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import List
 from typing import Optional
 
@@ -96,3 +96,46 @@ class CreditBureauValues:
     at01s_credit_lines: Optional[float] = None
     g102s_months_since_most_recent_inquiry: Optional[float] = None
     fico_score: Optional[str] = None
+
+
+class RecordView:
+    # Read-only attribute view over a raw API record with the same attributes as data_class; missing fields
+    # read as None and values are taken from the record when accessed, nothing is copied up front
+    __slots__ = ("record",)
+    data_class = None
+    field_names = frozenset()
+    nested_views = {}
+
+    def __init__(self, record):
+        self.record = record
+
+    def __getattr__(self, name):
+        if name not in self.field_names:
+            raise AttributeError(f"{self.data_class.__name__} has no attribute {name!r}")
+        value = self.record.get(name)
+        view_class = self.nested_views.get(name)
+        if view_class is not None and value is not None:
+            return view_class(value)
+        return value
+
+    def __eq__(self, other):
+        return isinstance(other, RecordView) and self.data_class is other.data_class and self.record == other.record
+
+    def __repr__(self):
+        return f"{self.data_class.__name__}View({self.record!r})"
+
+    def to_dict(self):
+        return self.record
+
+
+class CreditBureauValuesView(RecordView):
+    __slots__ = ()
+    data_class = CreditBureauValues
+    field_names = frozenset(f.name for f in fields(CreditBureauValues))
+
+
+class ListingView(RecordView):
+    __slots__ = ()
+    data_class = Listing
+    field_names = frozenset(f.name for f in fields(Listing))
+    nested_views = {"credit_bureau_values_transunion_indexed": CreditBureauValuesView}
@@ -0,0 +1,39 @@
+# model/note_batch.py
+from typing import Any, Dict, List
+
+import numpy as np
+
+from model.listing_batch import RATING_CODES, UNKNOWN_RATING
+
+# Notes in these states carry no outstanding exposure
+TERMINAL_NOTE_STATUSES = frozenset({"COMPLETED", "CHARGEOFF", "DEFAULTED", "CANCELLED", "SOLD"})
+
+
+class NoteBatch:
+    # Columnar view of note records for the portfolio group-bys
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+        n = len(records)
+        self.rating_code = np.fromiter(
+            (RATING_CODES.get(r.get("prosper_rating"), UNKNOWN_RATING) for r in records), dtype=np.int8, count=n
+        )
+        self.term = np.array([r.get("term") or 0 for r in records], dtype=np.int64)
+        self.outstanding_principal = _float_column([r.get("principal_balance_pro_rata_share") for r in records])
+        self.principal_paid = _float_column([r.get("principal_paid_pro_rata_share") for r in records])
+        self.interest_paid = _float_column([r.get("interest_paid_pro_rata_share") for r in records])
+        self.days_past_due = _float_column([r.get("days_past_due") for r in records])
+        self.lender_yield = np.array([r.get("lender_yield") for r in records], dtype=np.float64)
+        terminal = np.fromiter(
+            (bool(r.get("is_sold")) or (r.get("note_status_description") or "").upper() in TERMINAL_NOTE_STATUSES
+             for r in records),
+            dtype=bool, count=n,
+        )
+        self.active = ~terminal & (self.outstanding_principal > 0)
+
+    def __len__(self):
+        return len(self.records)
+
+
+def _float_column(values: List[Any]) -> np.ndarray:
+    # Missing amounts and days count as zero
+    return np.nan_to_num(np.array(values, dtype=np.float64))
@@ -0,0 +1,25 @@
+# model/portfolio.py
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class ExposureGroup:
+    key: str
+    note_count: int
+    outstanding_principal: float
+    share: float
+    lender_yield: Optional[float] = None  # weighted by outstanding principal
+
+
+@dataclass
+class PortfolioSummary:
+    note_count: int = 0
+    active_note_count: int = 0
+    outstanding_principal: float = 0.0
+    principal_paid: float = 0.0
+    interest_paid: float = 0.0
+    changed_notes: int = 0
+    by_grade: List[ExposureGroup] = field(default_factory=list)
+    by_term: List[ExposureGroup] = field(default_factory=list)
+    by_aging: List[ExposureGroup] = field(default_factory=list)
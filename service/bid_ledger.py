@@ -0,0 +1,99 @@
+# service/bid_ledger.py
+
+import os
+import threading
+import time
+
+from service.sqlite_store import create_with_fallback, sqlite_connect
+
+
+class MemoryBidLedger:
+    def __init__(self):
+        self.bids = {}  # listing_id -> (order_id, recorded_at)
+        self.reconciled_at = None
+        self.lock = threading.Lock()
+
+    def record_order(self, orders_response):
+        now = time.time()
+        with self.lock:
+            for bid_request in orders_response.bid_requests or []:
+                self.bids[bid_request.listing_id] = (orders_response.order_id, now)
+
+    def record_unconfirmed(self, listing_ids):
+        # Bids of a submission that failed may still have been placed: they stay in flight and the ledger is
+        # stale, so the next run reconciles and keeps them only if the orders list shows them in progress
+        now = time.time()
+        with self.lock:
+            for listing_id in listing_ids:
+                self.bids[listing_id] = (None, now)
+            self.reconciled_at = None
+
+    def in_flight_listing_ids(self):
+        with self.lock:
+            return set(self.bids)
+
+    def reconcile(self, in_progress_bids, started_at):
+        # Entries recorded after the reconcile started may not be visible remotely yet, so they are kept
+        with self.lock:
+            self.bids = {listing_id: entry for listing_id, entry in self.bids.items() if entry[1] >= started_at}
+            for listing_id, order_id in in_progress_bids.items():
+                self.bids.setdefault(listing_id, (order_id, started_at))
+            self.reconciled_at = started_at
+
+    def is_stale(self, max_age):
+        return self.reconciled_at is None or time.time() - self.reconciled_at >= max_age
+
+
+class SqliteBidLedger:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with sqlite_connect(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bids (listing_id INTEGER PRIMARY KEY, order_id TEXT, recorded_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS ledger_state (key TEXT PRIMARY KEY, value REAL)")
+
+    def record_order(self, orders_response):
+        now = time.time()
+        rows = [(bid_request.listing_id, orders_response.order_id, now) for bid_request in orders_response.bid_requests or []]
+        with sqlite_connect(self.path) as connection:
+            connection.executemany("INSERT OR REPLACE INTO bids VALUES (?, ?, ?)", rows)
+
+    def record_unconfirmed(self, listing_ids):
+        now = time.time()
+        with sqlite_connect(self.path) as connection:
+            connection.executemany("INSERT OR REPLACE INTO bids VALUES (?, NULL, ?)", [(listing_id, now) for listing_id in listing_ids])
+            connection.execute("DELETE FROM ledger_state WHERE key = 'reconciled_at'")
+
+    def in_flight_listing_ids(self):
+        with sqlite_connect(self.path) as connection:
+            return {row[0] for row in connection.execute("SELECT listing_id FROM bids")}
+
+    def reconcile(self, in_progress_bids, started_at):
+        with sqlite_connect(self.path) as connection:
+            connection.execute("DELETE FROM bids WHERE recorded_at < ?", (started_at,))
+            connection.executemany(
+                "INSERT OR IGNORE INTO bids VALUES (?, ?, ?)",
+                [(listing_id, order_id, started_at) for listing_id, order_id in in_progress_bids.items()],
+            )
+            connection.execute("INSERT OR REPLACE INTO ledger_state VALUES ('reconciled_at', ?)", (started_at,))
+
+    def is_stale(self, max_age):
+        with sqlite_connect(self.path) as connection:
+            row = connection.execute("SELECT value FROM ledger_state WHERE key = 'reconciled_at'").fetchone()
+        return row is None or time.time() - row[0] >= max_age
+
+
+_memory_bid_ledgers = {}
+
+
+def create_bid_ledger(prosper_config):
+    def create_memory_ledger():
+        return _memory_bid_ledgers.setdefault(prosper_config.state_dir, MemoryBidLedger())
+
+    if prosper_config.bid_ledger == "sqlite":
+        return create_with_fallback(
+            "SQLite bid ledger", lambda: SqliteBidLedger(os.path.join(prosper_config.state_dir, "bid_ledger.sqlite3")), create_memory_ledger
+        )
+    return create_memory_ledger()
@@ -0,0 +1,58 @@
+# service/diagnostics.py
+
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import asdict, is_dataclass
+
+import numpy as np
+
+from model.listings import RecordView
+
+
+def to_jsonable(value):
+    if isinstance(value, RecordView):
+        return value.to_dict()
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class LazyJson:
+    # Serializes the payload only when a log handler formats the record
+    def __init__(self, payload, indent=4):
+        self.payload = payload
+        self.indent = indent
+
+    def __str__(self):
+        payload = self.payload() if callable(self.payload) else self.payload
+        return json.dumps(payload, indent=self.indent, default=to_jsonable)
+
+
+class Diagnostics:
+    def __init__(self, logger, snapshot_dir=None):
+        self.logger = logger
+        self.snapshot_dir = snapshot_dir
+
+    def dump(self, label, payload):
+        # payload is a callable returning the object to dump, so nothing is built unless it is emitted
+        if self.snapshot_dir:
+            self.write_snapshot(label, payload)
+        elif self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("%s: %s", label, LazyJson(payload))
+
+    def write_snapshot(self, label, payload):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        slug = re.sub(r"[^a-z0-9]+", "-", label.lower()).strip("-")
+        path = os.path.join(self.snapshot_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 1000000:06d}-{slug}.json")
+        with open(path, "w") as f:
+            json.dump(payload(), f, separators=(",", ":"), default=to_jsonable)
+        self.logger.debug("%s written to %s", label, path)
+        return path
+
@@ -0,0 +1,154 @@
+# service/http_transport.py
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from service.rate_limiter import CircuitOpenError, EndpointGovernor, backoff_seconds, parse_rate_limits, retry_after_seconds
+
+
+@dataclass(frozen=True)
+class EndpointPolicy:
+    path: str
+    timeout: Tuple[float, float]  # (connect, read) seconds
+    retries: int
+    retry_methods: frozenset = frozenset({"GET"})
+    rate: float = 10.0  # requests per second, before adapting to 429s
+    burst: float = 10.0
+
+
+# urllib3 retries failed connects for any method and reads for retry_methods. Responses are retried by
+# HttpTransport.request: 429 for any method, since a throttled request was not processed, and 5xx only for
+# retry_methods, so an order POST is never resent once it may have reached the server.
+ENDPOINT_POLICIES = {
+    "token": EndpointPolicy("/v1/security/oauth/token", (3.05, 10), 2, frozenset({"POST"}), 2.0, 2.0),
+    "accounts": EndpointPolicy("/v1/accounts/", (3.05, 10), 2),
+    "listings": EndpointPolicy("/listingsvc/v2/listings", (3.05, 30), 2, rate=5.0, burst=5.0),
+    "orders": EndpointPolicy("/v1/orders/", (3.05, 15), 2),
+    "notes": EndpointPolicy("/v1/notes/", (3.05, 15), 2, rate=20.0, burst=20.0),
+}
+
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+
+class HttpTransport:
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, base_url, pool_size=10, session=None, rate_limits=None, max_retries=3, backoff_base=0.25,
+                 backoff_max=10.0, failure_threshold=5, reset_timeout=30.0):
+        self.base_url = base_url
+        self.logger = logging.getLogger(__name__)
+        self.session = session if session is not None else requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.governors = dict()
+        for endpoint, policy in ENDPOINT_POLICIES.items():
+            self.session.mount(f"{base_url}{policy.path}", self.create_adapter(policy, pool_size))
+            rate, burst = (rate_limits or {}).get(endpoint, (policy.rate, policy.burst))
+            self.governors[endpoint] = EndpointGovernor(endpoint, rate, burst or rate, failure_threshold, reset_timeout)
+
+    @classmethod
+    def from_config(cls, prosper_config):
+        return cls(
+            prosper_config.base_url,
+            prosper_config.http_pool_size,
+            rate_limits=parse_rate_limits(prosper_config.http_rate_limits),
+            max_retries=prosper_config.http_max_retries,
+            backoff_base=prosper_config.http_backoff_base,
+            backoff_max=prosper_config.http_backoff_max,
+            failure_threshold=prosper_config.circuit_failure_threshold,
+            reset_timeout=prosper_config.circuit_reset_timeout,
+        )
+
+    @classmethod
+    def shared(cls, prosper_config):
+        # One transport per base URL and process, so warm function instances keep their pooled connections
+        # and every request to an endpoint shares its rate limit and circuit breaker
+        key = (prosper_config.base_url, prosper_config.http_pool_size)
+        with cls._shared_lock:
+            transport = cls._shared.get(key)
+            if transport is None:
+                transport = cls.from_config(prosper_config)
+                cls._shared[key] = transport
+            return transport
+
+    def create_adapter(self, policy, pool_size):
+        retry = Retry(
+            total=policy.retries,
+            backoff_factor=0.2,
+            status=0,
+            allowed_methods=policy.retry_methods,
+            raise_on_status=False,
+        )
+        return HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+    def request(self, method, url, endpoint, metrics=None, **kwargs):
+        policy = ENDPOINT_POLICIES[endpoint]
+        kwargs.setdefault("timeout", policy.timeout)
+        governor = self.governors[endpoint]
+        attempt = 0
+        while True:
+            if not governor.breaker.allow():
+                governor.count("rejected")
+                raise CircuitOpenError(f"Circuit open for {endpoint}, not sending {method} {url}")
+            waited = governor.bucket.acquire()
+            governor.count("requests")
+            governor.count("wait_seconds", waited)
+            if metrics is not None and waited:
+                metrics.increment(f"rate_limit_wait_ms.{endpoint}", round(waited * 1000, 3))
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                governor.count("failures")
+                governor.breaker.record_failure()
+                raise
+
+            if response.status_code == 429:
+                # Throttled, but the API is up, so it does not count against the circuit
+                governor.breaker.record_success()
+                governor.count("throttled")
+                governor.bucket.throttled()
+                if metrics is not None:
+                    metrics.increment(f"http_throttled.{endpoint}")
+                retryable = True
+            elif response.status_code in RETRY_STATUSES:
+                governor.count("failures")
+                governor.breaker.record_failure()
+                retryable = method in policy.retry_methods
+            else:
+                governor.breaker.record_success()
+                governor.bucket.succeeded()
+                return response
+
+            if not retryable or attempt >= self.max_retries:
+                return response
+            delay = retry_after_seconds(response.headers.get("Retry-After"))
+            delay = min(self.backoff_max, delay) if delay is not None else backoff_seconds(attempt, self.backoff_base, self.backoff_max)
+            self.logger.info(f"{endpoint} returned {response.status_code}, retrying in {delay:.2f} seconds")
+            response.close()
+            governor.count("retries")
+            if metrics is not None:
+                metrics.increment(f"http_retries.{endpoint}")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, endpoint, **kwargs):
+        return self.request("GET", url, endpoint, **kwargs)
+
+    def post(self, url, endpoint, **kwargs):
+        return self.request("POST", url, endpoint, **kwargs)
+
+    def stats(self):
+        return {endpoint: governor.stats() for endpoint, governor in self.governors.items()}
+
+    def close(self):
+        self.session.close()
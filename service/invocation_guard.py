@@ -0,0 +1,98 @@
+# service/invocation_guard.py
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future
+
+
+class InvocationGuard:
+    # Bounds duplicate pipeline runs. Message IDs are claimed in the lock store so a redelivered Pub/Sub message
+    # is acknowledged without running again. A claim first lasts as long as a lease, so a run killed part way
+    # does not swallow the redelivery, and is kept for message_dedup_seconds once the run succeeded. Concurrent
+    # runs of a key on this instance join the one in progress and share its result, and across instances the
+    # run only starts if it takes the lease for the key.
+    # Its decisions are logged rather than counted, since they happen outside the invocation metrics.
+    def __init__(self, prosper_config, lock_store):
+        self.prosper_config = prosper_config
+        self.lock_store = lock_store
+        self.logger = logging.getLogger(__name__)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.in_flight = dict()  # key -> Future of the run in progress
+        self.lock = threading.Lock()
+
+    def key(self, event_type):
+        # One lease per event type and set of accounts
+        accounts = ",".join(self.prosper_config.accounts) or self.prosper_config.username or "default"
+        return f"{event_type}|{self.prosper_config.base_url}|{accounts}"
+
+    def claim_message(self, message_id):
+        # Returns False for a message already claimed; a lock store error lets the message through
+        if not message_id:
+            return True
+        try:
+            claimed = self.lock_store.claim_message(message_id, self.prosper_config.lease_seconds)
+        except Exception as e:
+            self.logger.warning(f"Error claiming message {message_id}, processing it anyway: {e}")
+            return True
+        return claimed
+
+    def confirm_message(self, message_id):
+        if not message_id:
+            return
+        try:
+            self.lock_store.extend_message(message_id, self.prosper_config.message_dedup_seconds)
+        except Exception as e:
+            self.logger.warning(f"Error confirming message {message_id}: {e}")
+
+    def release_message(self, message_id):
+        # A failed run gives up its claim so the redelivery is processed
+        if not message_id:
+            return
+        try:
+            self.lock_store.release_message(message_id)
+        except Exception as e:
+            self.logger.warning(f"Error releasing message {message_id}: {e}")
+
+    def run(self, key, fn):
+        if not self.prosper_config.single_flight:
+            return self.run_with_lease(key, fn)
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+        if not leader:
+            self.logger.info(f"{key} already running on this instance, joining it")
+            return future.result()
+        try:
+            result = self.run_with_lease(key, fn)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def run_with_lease(self, key, fn):
+        try:
+            acquired = self.lock_store.acquire(key, self.owner, self.prosper_config.lease_seconds)
+        except Exception as e:
+            # The bid ledger still guards against double bids, so a broken lock store does not stop buying
+            self.logger.warning(f"Error acquiring lease {key}, running without it: {e}")
+            return fn()
+        if not acquired:
+            self.logger.info(f"Lease {key} is held by another instance, skipping")
+            return None
+        try:
+            return fn()
+        finally:
+            try:
+                self.lock_store.release(key, self.owner)
+            except Exception as e:
+                self.logger.warning(f"Error releasing lease {key}: {e}")
@@ -0,0 +1,166 @@
+# service/listing_archive.py
+#
+# Append-only columnar archive of fetched listings on local disk. Each column is a raw array file with a narrow
+# dtype and meta.json holds the committed row count, so a write interrupted part way is truncated on the next
+# open and the columns can be memory-mapped as-is for replay. A listing is stored once, the first time it is
+# seen, since the same listings come back on every poll.
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+COLUMNS = {
+    "listing_number": np.int64,
+    "recorded_at": np.int64,
+    "rating_code": np.int8,
+    "has_credit_bureau": np.bool_,
+    "months_employed": np.float32,
+    # The payment/income ratio inputs keep full precision so replayed matches agree with live ones
+    "stated_monthly_income": np.float64,
+    "listing_monthly_payment": np.float64,
+    "inquiries": np.float32,
+    "delinquencies": np.float32,
+    "lender_yield": np.float32,
+    "borrower_rate": np.float32,
+    "historical_return": np.float32,
+    "prosper_score": np.float32,
+    "listing_amount": np.float32,
+}
+
+# Archive columns read from the raw records, the others come from the ListingBatch arrays
+RECORD_FIELDS = ("lender_yield", "borrower_rate", "historical_return", "prosper_score", "listing_amount")
+
+
+class ArchiveBatch:
+    # The archived columns with the attributes FilterMatcher reads from a ListingBatch
+    def __init__(self, columns):
+        self.columns = columns
+        for name, values in columns.items():
+            setattr(self, name, values)
+
+    def __len__(self):
+        return len(self.listing_number)
+
+    def slice(self, start, stop):
+        return ArchiveBatch({name: values[start:stop] for name, values in self.columns.items()})
+
+    def select(self, mask):
+        return ArchiveBatch({name: values[mask] for name, values in self.columns.items()})
+
+
+class ListingArchive:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self.row_count = self.read_row_count()
+        self.truncate()
+        self.archived_ids = None  # sorted archived listing numbers, loaded by the first append
+
+    def archived_listing_numbers(self):
+        if self.archived_ids is None:
+            self.archived_ids = np.sort(np.array(self.read_column("listing_number")))
+        return self.archived_ids
+
+    def is_archived(self, listing_numbers):
+        archived = self.archived_listing_numbers()
+        if len(archived) == 0:
+            return np.zeros(len(listing_numbers), dtype=bool)
+        positions = np.minimum(np.searchsorted(archived, listing_numbers), len(archived) - 1)
+        return archived[positions] == listing_numbers
+
+    def column_path(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    def read_row_count(self):
+        try:
+            with open(self.meta_path(), "r") as f:
+                return int(json.load(f).get("row_count", 0))
+        except FileNotFoundError:
+            return 0
+
+    def write_row_count(self, row_count):
+        temp_path = self.meta_path() + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"row_count": row_count, "columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()}}, f)
+        os.replace(temp_path, self.meta_path())
+
+    def truncate(self):
+        # Drops rows a failed append wrote past the committed row count
+        for name, dtype in COLUMNS.items():
+            path = self.column_path(name)
+            size = self.row_count * np.dtype(dtype).itemsize
+            if not os.path.exists(path):
+                if self.row_count:
+                    raise Exception(f"Listing archive column {name} is missing in {self.path}")
+                open(path, "wb").close()
+            elif os.path.getsize(path) != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def read_column(self, name):
+        if self.row_count == 0:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(self.column_path(name), dtype=COLUMNS[name], mode="r", shape=(self.row_count,))
+
+    def open(self):
+        # Memory-mapped columns of the committed rows
+        return ArchiveBatch({name: self.read_column(name) for name in COLUMNS})
+
+    def append(self, listings, recorded_at=None):
+        # Archives the listings of a ListingBatch that are not archived yet, returns the number added
+        if len(listings) == 0:
+            return 0
+        with self.lock:
+            new_rows = np.flatnonzero(~self.is_archived(listings.listing_number))
+            _, first = np.unique(listings.listing_number[new_rows], return_index=True)
+            new_rows = new_rows[np.sort(first)]
+            if len(new_rows) == 0:
+                return 0
+            records = [listings.records[row] for row in new_rows]
+            columns = {
+                "listing_number": listings.listing_number[new_rows],
+                "recorded_at": np.full(len(new_rows), int(recorded_at if recorded_at is not None else time.time())),
+                "rating_code": listings.rating_code[new_rows],
+                "has_credit_bureau": listings.has_credit_bureau[new_rows],
+                "months_employed": listings.months_employed[new_rows],
+                "stated_monthly_income": listings.stated_monthly_income[new_rows],
+                "listing_monthly_payment": listings.listing_monthly_payment[new_rows],
+                "inquiries": listings.inquiries[new_rows],
+                "delinquencies": listings.delinquencies[new_rows],
+            }
+            for name in RECORD_FIELDS:
+                columns[name] = np.array([r.get(name) for r in records], dtype=np.float64)
+            return self.append_columns(columns)
+
+    def append_columns(self, columns):
+        # Appends every column, then commits the new row count
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1 or set(columns) != set(COLUMNS):
+            raise Exception(f"Listing archive append needs all columns with the same length: {sorted(columns)}")
+        count = lengths.pop()
+        with self.lock:
+            try:
+                for name, dtype in COLUMNS.items():
+                    with open(self.column_path(name), "ab") as f:
+                        f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                self.write_row_count(self.row_count + count)
+            except Exception:
+                self.truncate()
+                raise
+            self.row_count += count
+            if self.archived_ids is not None:
+                added_ids = np.sort(np.asarray(columns["listing_number"], dtype=np.int64))
+                self.archived_ids = np.insert(self.archived_ids, np.searchsorted(self.archived_ids, added_ids), added_ids)
+        return count
+
+
+def create_listing_archive(prosper_config):
+    if not prosper_config.listing_archive:
+        return None
+    return ListingArchive(prosper_config.listing_archive_dir)
@@ -0,0 +1,78 @@
+# service/listing_query_planner.py
+#
+# Turns the filter sets into server-side listing queries. Only the checks the listings endpoint can filter on
+# are pushed down: the grades as prosper_rating and the employment length as months_employed_min. Everything
+# else, and the pushed down checks again, is applied locally by FilterMatcher on the merged result.
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from model.filterset import FilterSet
+from model.listing_batch import PROSPER_RATINGS
+
+# FilterSet check -> listings query parameter
+PUSHDOWN_PARAMETERS = {
+    "grades": "prosper_rating",
+    "employment_length_over": "months_employed_min",
+}
+
+
+@dataclass
+class ListingQuery:
+    grades: frozenset
+    months_employed_min: float
+    filter_sets: List[int] = field(default_factory=list)
+
+    def params(self) -> Dict[str, str]:
+        params = {PUSHDOWN_PARAMETERS["grades"]: ",".join(g for g in PROSPER_RATINGS if g in self.grades)}
+        if self.months_employed_min > 0:
+            params[PUSHDOWN_PARAMETERS["employment_length_over"]] = f"{self.months_employed_min:g}"
+        return params
+
+    def is_unfiltered(self) -> bool:
+        return self.grades >= frozenset(PROSPER_RATINGS) and self.months_employed_min <= 0
+
+    def query_string(self) -> str:
+        return "".join(f"&{key}={value}" for key, value in self.params().items())
+
+
+def can_match(filter_set: FilterSet) -> bool:
+    # Mirrors FilterMatcher: a check that is not configured never matches
+    return (
+            bool(parse_grades(filter_set.grades))
+            and filter_set.employment_length_over is not None
+            and filter_set.inquiries_under is not None
+            and filter_set.delinquencies_under is not None
+            and filter_set.payment_income_ratio_under is not None
+    )
+
+
+def parse_grades(grades) -> frozenset:
+    if grades is None:
+        return frozenset()
+    return frozenset(g.strip() for g in grades.split(",") if g.strip() in PROSPER_RATINGS)
+
+
+def plan_listing_queries(filter_set_list: List[FilterSet], max_queries: int) -> List[ListingQuery]:
+    # Each grade is fetched by exactly one query, with the loosest employment bound of the filter sets that
+    # accept it, so the queries never overlap. Grades with the same bound share a query. Past max_queries the
+    # queries with the lowest bounds are merged, loosening the bound of the grades that move.
+    months_by_grade = dict()
+    filter_sets_by_grade = dict()
+    for index, filter_set in enumerate(filter_set_list):
+        if not can_match(filter_set):
+            continue
+        months = filter_set.employment_length_over * 12
+        for grade in parse_grades(filter_set.grades):
+            months_by_grade[grade] = min(months_by_grade.get(grade, months), months)
+            filter_sets_by_grade.setdefault(grade, set()).add(index)
+
+    grades_by_months = dict()
+    for grade, months in months_by_grade.items():
+        grades_by_months.setdefault(months, set()).add(grade)
+    queries = [ListingQuery(frozenset(grades), months) for months, grades in sorted(grades_by_months.items())]
+    while len(queries) > max(max_queries, 1):
+        first, second = queries[0], queries[1]
+        queries[:2] = [ListingQuery(first.grades | second.grades, first.months_employed_min)]
+    for query in queries:
+        query.filter_sets = sorted(set().union(*(filter_sets_by_grade[grade] for grade in query.grades)))
+    return queries
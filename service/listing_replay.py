@@ -0,0 +1,153 @@
+# service/listing_replay.py
+#
+# Evaluates candidate filter sets against the listing archive in one vectorized pass over the memory-mapped
+# columns, a chunk of rows at a time. Each filter set is evaluated on its own, ignoring loan_count_over.
+#   python -m service.listing_replay candidates.yml [--archive DIR] [--since 2025-01-01] [--output report.json]
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from model.filter_matcher import FilterMatcher
+from model.listing_batch import PROSPER_RATINGS
+from service.listing_archive import ListingArchive
+
+YIELD_COLUMNS = ("lender_yield", "borrower_rate", "historical_return")
+
+
+def chunk_size(filter_set_count):
+    # Bounds the filter sets x rows match matrix to about 16M cells, and float32 sums to exact counts
+    return max(1024, min(1 << 20, (1 << 24) // max(filter_set_count, 1)))
+
+
+def replay(archive_batch, filter_set_list, since=None, until=None):
+    started = time.perf_counter()
+    matcher = FilterMatcher(filter_set_list)
+    count = len(matcher)
+    matches = np.zeros(count, dtype=np.int64)
+    exclusive = np.zeros(count, dtype=np.int64)
+    first_match = np.zeros(count, dtype=np.int64)
+    overlap = np.zeros((count, count), dtype=np.int64)
+    by_grade = np.zeros((count, len(PROSPER_RATINGS)), dtype=np.int64)
+    yield_sums = {name: np.zeros(count) for name in YIELD_COLUMNS}
+    yield_counts = {name: np.zeros(count) for name in YIELD_COLUMNS}
+    listing_count = 0
+    matched_count = 0
+    first_recorded = None
+    last_recorded = None
+
+    step = chunk_size(count)
+    for start in range(0, len(archive_batch), step):
+        batch = archive_batch.slice(start, start + step)
+        if since is not None or until is not None:
+            recorded_at = np.asarray(batch.recorded_at)
+            in_range = np.ones(len(batch), dtype=bool)
+            if since is not None:
+                in_range &= recorded_at >= since
+            if until is not None:
+                in_range &= recorded_at < until
+            batch = batch.select(in_range)
+        if len(batch) == 0:
+            continue
+        listing_count += len(batch)
+        first_recorded = int(batch.recorded_at.min()) if first_recorded is None else min(first_recorded, int(batch.recorded_at.min()))
+        last_recorded = int(batch.recorded_at.max()) if last_recorded is None else max(last_recorded, int(batch.recorded_at.max()))
+        if count == 0:
+            continue
+
+        matrix = matcher.match_matrix(batch, float("inf"))
+        weights = matrix.astype(np.float32)
+        per_listing = matrix.sum(axis=0)
+        matched = per_listing > 0
+        matched_count += int(matched.sum())
+        matches += matrix.sum(axis=1)
+        exclusive += (matrix & (per_listing == 1)).sum(axis=1)
+        first_match += np.bincount(matrix.argmax(axis=0)[matched], minlength=count)
+        overlap += np.rint(weights @ weights.T).astype(np.int64)
+
+        codes = np.asarray(batch.rating_code)
+        known = codes >= 0
+        grades = np.zeros((len(batch), len(PROSPER_RATINGS)), dtype=np.float32)
+        grades[np.flatnonzero(known), codes[known]] = 1
+        by_grade += np.rint(weights @ grades).astype(np.int64)
+
+        for name in YIELD_COLUMNS:
+            values = np.asarray(getattr(batch, name), dtype=np.float32)
+            valid = ~np.isnan(values)
+            yield_sums[name] += weights @ np.where(valid, values, 0)
+            yield_counts[name] += weights @ valid.astype(np.float32)
+
+    filter_sets = list()
+    for index, filter_set in enumerate(filter_set_list):
+        filter_sets.append({
+            "index": index,
+            "filter_set": asdict(filter_set),
+            "matches": int(matches[index]),
+            "match_rate": matches[index] / listing_count if listing_count else 0.0,
+            "exclusive_matches": int(exclusive[index]),
+            "first_matches": int(first_match[index]),
+            "grades": {grade: int(by_grade[index, code]) for code, grade in enumerate(PROSPER_RATINGS)},
+            **{
+                f"{name}_mean": float(yield_sums[name][index] / yield_counts[name][index]) if yield_counts[name][index] else None
+                for name in YIELD_COLUMNS
+            },
+        })
+    return {
+        "listings": listing_count,
+        "matched_listings": matched_count,
+        "first_recorded": _isoformat(first_recorded),
+        "last_recorded": _isoformat(last_recorded),
+        "seconds": round(time.perf_counter() - started, 3),
+        "filter_sets": filter_sets,
+        "overlap": overlap.tolist(),
+    }
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp is not None else None
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return (parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def main():
+    from config.filterset_loader import load_filterset_properties
+    from config.prosper_config import ProsperConfig
+
+    parser = argparse.ArgumentParser(description="Replay candidate filter sets against the listing archive")
+    parser.add_argument("filterset", help="filter set YAML in the config/filterset.yml format")
+    parser.add_argument("--archive", help="listing archive directory, PROSPER_LISTING_ARCHIVE_DIR by default")
+    parser.add_argument("--since", help="only listings recorded at or after this ISO date")
+    parser.add_argument("--until", help="only listings recorded before this ISO date")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    archive = ListingArchive(args.archive or ProsperConfig().listing_archive_dir)
+    filter_set_list = load_filterset_properties(args.filterset).filter_set_list
+    report = replay(archive.open(), filter_set_list, _timestamp(args.since), _timestamp(args.until))
+
+    print(f"{report['listings']} listings, {report['matched_listings']} matched, in {report['seconds']} s", file=sys.stderr)
+    for entry in report["filter_sets"]:
+        print(
+            f"FilterSet {entry['index']:3}: {entry['matches']:10} matches {entry['match_rate']:8.2%}"
+            f" {entry['exclusive_matches']:10} exclusive  lender_yield {entry['lender_yield_mean'] or 0:.4f}",
+            file=sys.stderr,
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# service/listing_stream.py
+
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _Buffer:
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+
+    def append(self, text):
+        if self.pos > 65536:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        self.text += text
+
+    def skip_whitespace(self):
+        while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+            self.pos += 1
+        return self.pos < len(self.text)
+
+    def peek(self):
+        return self.text[self.pos]
+
+    def decode_value(self, final):
+        # A value is only complete when something follows it, "12" may still be the start of "123"
+        try:
+            value, end = _decoder.raw_decode(self.text, self.pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return False, None
+        if end == len(self.text) and not final:
+            return False, None
+        self.pos = end
+        return True, value
+
+
+def iter_json_array_items(chunks, array_key, fields):
+    # Incrementally parses a top-level JSON object from byte chunks and yields the items of its array_key array
+    # one by one; the other top-level fields are stored in the fields dict as they are parsed
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = _Buffer()
+    state = "start"
+    key = None
+    # What the current object or array last had: "open", "value" or "comma", so separators are checked
+    last = None
+    chunks = iter(chunks)
+    final = False
+    while True:
+        progressed = True
+        while progressed:
+            progressed = False
+            if not buffer.skip_whitespace():
+                break
+            char = buffer.peek()
+            if state == "start":
+                if char != "{":
+                    raise ValueError(f"Expected a JSON object, found {char!r}")
+                buffer.pos += 1
+                state = "key"
+                last = "open"
+                progressed = True
+            elif state == "key":
+                if char == "}":
+                    if last == "comma":
+                        raise ValueError("Expected a key after ','")
+                    buffer.pos += 1
+                    state = "done"
+                    progressed = True
+                elif char == ",":
+                    if last != "value":
+                        raise ValueError("Unexpected ',' in the JSON object")
+                    buffer.pos += 1
+                    last = "comma"
+                    progressed = True
+                elif last == "value":
+                    raise ValueError(f"Expected ',' or '}}' in the JSON object, found {char!r}")
+                else:
+                    complete, key = buffer.decode_value(final)
+                    if complete:
+                        state = "colon"
+                        progressed = True
+            elif state == "colon":
+                if char != ":":
+                    raise ValueError(f"Expected ':' after key {key!r}, found {char!r}")
+                buffer.pos += 1
+                state = "value"
+                progressed = True
+            elif state == "value":
+                if key == array_key and char == "[":
+                    buffer.pos += 1
+                    state = "array"
+                    last = "open"
+                    progressed = True
+                else:
+                    complete, value = buffer.decode_value(final)
+                    if complete:
+                        fields[key] = value
+                        state = "key"
+                        last = "value"
+                        progressed = True
+            elif state == "array":
+                if char == "]":
+                    if last == "comma":
+                        raise ValueError(f"Expected an item after ',' in {array_key!r}")
+                    buffer.pos += 1
+                    state = "key"
+                    last = "value"
+                    progressed = True
+                elif char == ",":
+                    if last != "value":
+                        raise ValueError(f"Unexpected ',' in {array_key!r}")
+                    buffer.pos += 1
+                    last = "comma"
+                    progressed = True
+                elif last == "value":
+                    raise ValueError(f"Expected ',' or ']' in {array_key!r}, found {char!r}")
+                else:
+                    complete, item = buffer.decode_value(final)
+                    if complete:
+                        last = "value"
+                        yield item
+                        progressed = True
+            elif state == "done":
+                raise ValueError(f"Unexpected data after the JSON object: {char!r}")
+        if final:
+            break
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+            buffer.append(utf8.decode(b"", final=True))
+        else:
+            buffer.append(utf8.decode(chunk) if isinstance(chunk, bytes) else chunk)
+    if state != "done":
+        raise ValueError("Truncated JSON object")
@@ -0,0 +1,187 @@
+# service/lock_store.py
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from service.sqlite_store import create_with_fallback, sqlite_connect
+
+
+# Leases are held by an owner until released or expired; an owner re-acquiring its own lease renews it.
+# Message claims record a delivery ID for ttl seconds, so a redelivered message can be recognised; extend_message
+# keeps a claim for longer once its message was processed.
+
+
+class MemoryLockStore:
+    def __init__(self):
+        self.leases = {}  # name -> (owner, expires_at)
+        self.messages = {}  # message_id -> expires_at
+        self.lock = threading.Lock()
+
+    def acquire(self, name, owner, ttl):
+        now = time.time()
+        with self.lock:
+            lease = self.leases.get(name)
+            if lease is not None and lease[0] != owner and lease[1] > now:
+                return False
+            self.leases[name] = (owner, now + ttl)
+            return True
+
+    def release(self, name, owner):
+        with self.lock:
+            if self.leases.get(name, (None,))[0] == owner:
+                del self.leases[name]
+
+    def claim_message(self, message_id, ttl):
+        now = time.time()
+        with self.lock:
+            self.messages = {key: expires_at for key, expires_at in self.messages.items() if expires_at > now}
+            if message_id in self.messages:
+                return False
+            self.messages[message_id] = now + ttl
+            return True
+
+    def extend_message(self, message_id, ttl):
+        with self.lock:
+            self.messages[message_id] = time.time() + ttl
+
+    def release_message(self, message_id):
+        with self.lock:
+            self.messages.pop(message_id, None)
+
+
+class FileLockStore:
+    # Leases and message claims in one JSON file, updated under an exclusive flock on a sidecar lock file so
+    # processes sharing the state dir see each other's leases; writes are atomic renames
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def read_state(self):
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable lock store {self.path}: {e}")
+            state = {}
+        state.setdefault("leases", {})
+        state.setdefault("messages", {})
+        return state
+
+    def write_state(self, state):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".locks-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def locked_state(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    state = self.read_state()
+                    now = time.time()
+                    state["messages"] = {key: expires_at for key, expires_at in state["messages"].items() if expires_at > now}
+                    yield state
+                    self.write_state(state)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def acquire(self, name, owner, ttl):
+        with self.locked_state() as state:
+            now = time.time()
+            lease = state["leases"].get(name)
+            if lease is not None and lease["owner"] != owner and lease["expires_at"] > now:
+                return False
+            state["leases"][name] = {"owner": owner, "expires_at": now + ttl}
+            return True
+
+    def release(self, name, owner):
+        with self.locked_state() as state:
+            if state["leases"].get(name, {}).get("owner") == owner:
+                del state["leases"][name]
+
+    def claim_message(self, message_id, ttl):
+        with self.locked_state() as state:
+            if message_id in state["messages"]:
+                return False
+            state["messages"][message_id] = time.time() + ttl
+            return True
+
+    def extend_message(self, message_id, ttl):
+        with self.locked_state() as state:
+            state["messages"][message_id] = time.time() + ttl
+
+    def release_message(self, message_id):
+        with self.locked_state() as state:
+            state["messages"].pop(message_id, None)
+
+
+class SqliteLockStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with sqlite_connect(self.path) as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS messages (message_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+
+    def acquire(self, name, owner, ttl):
+        # A single upsert, so two processes racing for an expired lease cannot both take it
+        now = time.time()
+        with sqlite_connect(self.path) as connection:
+            cursor = connection.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, "
+                "expires_at = excluded.expires_at WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+                (name, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, name, owner):
+        with sqlite_connect(self.path) as connection:
+            connection.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def claim_message(self, message_id, ttl):
+        now = time.time()
+        with sqlite_connect(self.path) as connection:
+            connection.execute("DELETE FROM messages WHERE expires_at <= ?", (now,))
+            cursor = connection.execute("INSERT OR IGNORE INTO messages VALUES (?, ?)", (message_id, now + ttl))
+            return cursor.rowcount == 1
+
+    def extend_message(self, message_id, ttl):
+        with sqlite_connect(self.path) as connection:
+            connection.execute("INSERT OR REPLACE INTO messages VALUES (?, ?)", (message_id, time.time() + ttl))
+
+    def release_message(self, message_id):
+        with sqlite_connect(self.path) as connection:
+            connection.execute("DELETE FROM messages WHERE message_id = ?", (message_id,))
+
+
+_memory_lock_store = MemoryLockStore()
+
+
+def create_lock_store(prosper_config):
+    if prosper_config.lock_store == "sqlite":
+        return create_with_fallback(
+            "SQLite lock store", lambda: SqliteLockStore(os.path.join(prosper_config.state_dir, "locks.sqlite3")), lambda: _memory_lock_store
+        )
+    if prosper_config.lock_store == "file":
+        return create_with_fallback(
+            "File lock store", lambda: FileLockStore(os.path.join(prosper_config.state_dir, "locks.json")), lambda: _memory_lock_store
+        )
+    return _memory_lock_store
@@ -0,0 +1,152 @@
+# service/metrics.py
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LoggingExporter:
+    # One structured log record per invocation; json_fields is picked up by the Cloud Logging handler
+    def __init__(self, logger_name=__name__):
+        self.logger = logging.getLogger(logger_name)
+
+    def export(self, summary):
+        self.logger.info("Invocation metrics: %s", json.dumps(summary), extra={"json_fields": summary})
+
+
+class InMemoryExporter:
+    def __init__(self):
+        self.summaries = list()
+        self.lock = threading.Lock()
+
+    def export(self, summary):
+        with self.lock:
+            self.summaries.append(summary)
+
+    def stage_durations(self, stage):
+        with self.lock:
+            return [s["spans"][stage]["total_ms"] for s in self.summaries if stage in s["spans"]]
+
+    def percentile(self, stage, q):
+        durations = sorted(self.stage_durations(stage))
+        if not durations:
+            return None
+        return durations[min(len(durations) - 1, int(round(q / 100.0 * (len(durations) - 1))))]
+
+
+class Metrics:
+    # Timing spans and counters for the current invocation, summarized and exported when it finishes
+    def __init__(self, exporters=None):
+        self.exporters = list(exporters or [])
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.gauges = dict()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.spans = dict()
+            self.counters = dict()
+            self.started_at = time.perf_counter()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(name, time.perf_counter() - start)
+
+    def record_span(self, name, seconds):
+        with self.lock:
+            span = self.spans.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            span["count"] += 1
+            span["total_ms"] += seconds * 1000
+            span["max_ms"] = max(span["max_ms"], seconds * 1000)
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def register_gauge(self, name, read):
+        # read() is called for every summary and reports state that outlives the invocation
+        with self.lock:
+            self.gauges[name] = read
+
+    def read_gauges(self):
+        with self.lock:
+            gauges = dict(self.gauges)
+        values = dict()
+        for name, read in gauges.items():
+            try:
+                values[name] = read()
+            except Exception as e:
+                self.logger.warning(f"Metrics gauge {name} failed: {e}")
+        return values
+
+    def summary(self, invocation, status):
+        gauges = self.read_gauges()
+        with self.lock:
+            return {
+                "invocation": invocation,
+                "status": status,
+                "duration_ms": round((time.perf_counter() - self.started_at) * 1000, 3),
+                "spans": {name: {k: round(v, 3) for k, v in span.items()} for name, span in self.spans.items()},
+                "counters": dict(self.counters),
+                "gauges": gauges,
+            }
+
+    @contextmanager
+    def invocation(self, name):
+        self.reset()
+        status = "ok"
+        try:
+            yield self
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.export(self.summary(name, status))
+
+    def scoped(self, prefix):
+        return ScopedMetrics(self, prefix)
+
+    def export(self, summary):
+        for exporter in self.exporters:
+            try:
+                exporter.export(summary)
+            except Exception as e:
+                self.logger.warning(f"Metrics exporter {type(exporter).__name__} failed: {e}")
+
+
+class ScopedMetrics:
+    # Records into a parent Metrics with prefixed names, so several accounts share one invocation summary
+    def __init__(self, metrics, prefix):
+        self.metrics = metrics
+        self.prefix = prefix
+
+    def span(self, name):
+        return self.metrics.span(f"{self.prefix}{name}")
+
+    def record_span(self, name, seconds):
+        self.metrics.record_span(f"{self.prefix}{name}", seconds)
+
+    def increment(self, name, value=1):
+        self.metrics.increment(f"{self.prefix}{name}", value)
+
+    def register_gauge(self, name, read):
+        self.metrics.register_gauge(f"{self.prefix}{name}", read)
+
+    def scoped(self, prefix):
+        return ScopedMetrics(self.metrics, f"{self.prefix}{prefix}")
+
+    def invocation(self, name):
+        return self.metrics.invocation(name)
+
+
+def create_metrics(prosper_config):
+    if prosper_config.metrics_exporter == "log":
+        return Metrics([LoggingExporter()])
+    return Metrics()
@@ -0,0 +1,96 @@
+# service/multi_account_notes_service.py
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config.filterset_loader import load_filterset_properties
+from config.prosper_config import ProsperConfig
+from model.filter_matcher import FilterMatcher
+from model.filterset import FilterSetProperties
+from service.listing_archive import create_listing_archive
+from service.metrics import create_metrics
+from service.prosper_notes_service import ProsperNotesService, archive_listings, remember_rejected_listings
+from service.seen_listing_cache import create_seen_listing_cache
+
+
+class MultiAccountNotesService:
+    # Fetches and decodes the listings once per invocation with the first account's token and hands the same batch
+    # to every account's ProsperNotesService. Each account evaluates its own filter sets, cash balance and in-flight
+    # orders in parallel with its own token, bid ledger and state dir, and a failing account does not stop the others.
+    def __init__(self, prosper_config, account_configs, metrics=None):
+        if not account_configs:
+            raise Exception("Multi-account mode needs at least one account in PROSPER_ACCOUNTS")
+        self.prosper_config = prosper_config
+        self.logger = logging.getLogger(__name__)
+        self.metrics = metrics if metrics is not None else create_metrics(prosper_config)
+        self.account_services = {
+            account_config.account: ProsperNotesService(
+                account_config, metrics=self.metrics.scoped(f"{account_config.account}."), shared_listings=True
+            )
+            for account_config in account_configs
+        }
+        self.listings_rest_service = next(iter(self.account_services.values())).prosper_rest_service
+        # The listings are pre-filtered and cached as rejected against the filter sets of every account
+        prosper_config.filter_set_properties = FilterSetProperties(
+            [filter_set for account_config in account_configs for filter_set in account_config.filter_set_properties.filter_set_list]
+        )
+        self.filter_matcher = FilterMatcher(prosper_config.filter_set_properties.filter_set_list)
+        self.seen_listing_cache = create_seen_listing_cache(prosper_config) if prosper_config.incremental_listings else None
+        self.listing_archive = create_listing_archive(prosper_config)
+        self.last_listings_signature = None
+
+    def get_listings(self):
+        listings = self.listings_rest_service.get_listings(self.seen_listing_cache, self.filter_matcher)
+        self.last_listings_signature = (listings.total_count, hash(listings.listing_number.tobytes()))
+        self.logger.info(f"Retrieved {len(listings)} listings for {len(self.account_services)} accounts")
+        return listings
+
+    def buy_notes(self):
+        with ThreadPoolExecutor(max_workers=len(self.account_services) + 1) as executor:
+            listings_future = executor.submit(self.get_listings)
+            futures = {account: executor.submit(service.buy_notes, listings_future) for account, service in self.account_services.items()}
+            try:
+                self.raise_failures("buy_notes", futures)
+            finally:
+                # Recorded once every account's order is out, so caching and archiving never delay a bid
+                if self.seen_listing_cache is not None:
+                    remember_rejected_listings(self.seen_listing_cache, self.filter_matcher, listings_future)
+                if self.listing_archive is not None:
+                    archive_listings(self.listing_archive, listings_future, self.metrics)
+
+    def account_summary(self):
+        with ThreadPoolExecutor(max_workers=len(self.account_services)) as executor:
+            futures = {account: executor.submit(service.account_summary) for account, service in self.account_services.items()}
+            self.raise_failures("account_summary", futures)
+
+    def raise_failures(self, action, futures):
+        failed_accounts = list()
+        for account, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                self.logger.error(f"Error in {action} for account {account}: {e}")
+                failed_accounts.append(account)
+        if failed_accounts:
+            raise Exception(f"{action} failed for {len(failed_accounts)} of {len(futures)} accounts: {', '.join(failed_accounts)}")
+
+    def flush_notifications(self, timeout=None):
+        for service in self.account_services.values():
+            service.flush_notifications(timeout)
+
+    def close(self):
+        for service in self.account_services.values():
+            service.close()
+
+
+def create_notes_service(prosper_config):
+    # One ProsperNotesService for the default account, or a fan-out over PROSPER_ACCOUNTS
+    if not prosper_config.accounts:
+        prosper_config.filter_set_properties = load_filterset_properties(prosper_config.filterset_file)
+        return ProsperNotesService(prosper_config)
+    account_configs = list()
+    for account in prosper_config.accounts:
+        account_config = ProsperConfig(account)
+        account_config.filter_set_properties = load_filterset_properties(account_config.filterset_file)
+        account_configs.append(account_config)
+    return MultiAccountNotesService(prosper_config, account_configs)
@@ -0,0 +1,83 @@
+# service/note_cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from service.sqlite_store import create_with_fallback, sqlite_connect
+
+
+def note_digest(record):
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class MemoryNoteCache:
+    # Note records from the last notes crawl keyed by loan_note_id, with a digest to tell which ones changed
+    def __init__(self):
+        self.notes = dict()  # loan_note_id -> (digest, record)
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+
+    def update(self, records, refreshed_at=None):
+        # Replaces the cached notes with a complete crawl, returns how many are new or changed
+        notes = {str(record.get("loan_note_id")): (note_digest(record), record) for record in records}
+        with self.lock:
+            changed = sum(1 for key, (digest, _) in notes.items() if self.notes.get(key, (None,))[0] != digest)
+            self.notes = notes
+            self.refreshed_at = refreshed_at if refreshed_at is not None else time.time()
+        return changed
+
+    def records(self):
+        with self.lock:
+            return [record for _, record in self.notes.values()]
+
+    def is_stale(self, max_age):
+        return self.refreshed_at is None or time.time() - self.refreshed_at > max_age
+
+
+class SqliteNoteCache:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with sqlite_connect(self.path) as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS notes (loan_note_id TEXT PRIMARY KEY, digest TEXT, record TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS note_cache_state (key TEXT PRIMARY KEY, value REAL)")
+
+    def update(self, records, refreshed_at=None):
+        # Only new and changed notes are written, notes missing from the crawl are removed
+        notes = {str(record.get("loan_note_id")): (note_digest(record), record) for record in records}
+        with sqlite_connect(self.path) as connection:
+            digests = dict(connection.execute("SELECT loan_note_id, digest FROM notes"))
+            changed = [(key, digest, json.dumps(record)) for key, (digest, record) in notes.items() if digests.get(key) != digest]
+            connection.executemany("INSERT OR REPLACE INTO notes VALUES (?, ?, ?)", changed)
+            connection.executemany("DELETE FROM notes WHERE loan_note_id = ?", [(key,) for key in digests if key not in notes])
+            connection.execute(
+                "INSERT OR REPLACE INTO note_cache_state VALUES ('refreshed_at', ?)",
+                (refreshed_at if refreshed_at is not None else time.time(),),
+            )
+        return len(changed)
+
+    def records(self):
+        with sqlite_connect(self.path) as connection:
+            return [json.loads(row[0]) for row in connection.execute("SELECT record FROM notes")]
+
+    def is_stale(self, max_age):
+        with sqlite_connect(self.path) as connection:
+            row = connection.execute("SELECT value FROM note_cache_state WHERE key = 'refreshed_at'").fetchone()
+        return row is None or time.time() - row[0] > max_age
+
+
+_memory_note_caches = dict()
+
+
+def create_note_cache(prosper_config):
+    def create_memory_cache():
+        return _memory_note_caches.setdefault(prosper_config.state_dir, MemoryNoteCache())
+
+    if prosper_config.note_cache == "sqlite":
+        return create_with_fallback(
+            "SQLite note cache", lambda: SqliteNoteCache(os.path.join(prosper_config.state_dir, "notes.sqlite3")), create_memory_cache
+        )
+    return create_memory_cache()
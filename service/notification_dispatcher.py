@@ -0,0 +1,183 @@
+# service/notification_dispatcher.py
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from service.metrics import Metrics
+
+
+@dataclass
+class Notification:
+    subject: str
+    body: str
+    description: str = "email"
+
+
+class SendGridSink:
+    # The SendGrid client is created once and reused for every email
+    def __init__(self, prosper_config, metrics=None):
+        self.prosper_config = prosper_config
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.logger = logging.getLogger(__name__)
+        self.client = None
+
+    def send(self, notification):
+        # SendGrid is only imported when an email is sent, keeping it off the cold start path
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Content, From, Mail, To
+        from python_http_client.exceptions import HTTPError
+
+        if self.client is None:
+            self.client = SendGridAPIClient(self.prosper_config.sendgrid_api_key)
+        mail = Mail(
+            From(self.prosper_config.email_from),
+            To(self.prosper_config.email_to),
+            notification.subject,
+            Content("text/plain", notification.body),
+        )
+        try:
+            with self.metrics.span("notification.sendgrid"):
+                response = self.client.send(mail)
+            self.logger.info(f"Sent {notification.description} to SendGrid with response status {response.status_code}")
+        except HTTPError as e:
+            self.logger.error(f"Error sending {notification.description}: {e}")
+
+
+class FileSink:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, notification):
+        line = json.dumps({"time": time.time(), "subject": notification.subject, "body": notification.body})
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class MemorySink:
+    def __init__(self):
+        self.notifications = list()
+
+    def send(self, notification):
+        self.notifications.append(notification)
+
+
+_STOP = object()
+
+
+class NotificationDispatcher:
+    # Delivers notifications from a background worker through a bounded queue. Notifications with the same
+    # subject that are queued together, or arrive within digest_seconds of the first, go out as one digest.
+    def __init__(self, sink, queue_size=100, digest_seconds=0.0, asynchronous=True, metrics=None):
+        self.sink = sink
+        self.digest_seconds = digest_seconds
+        self.asynchronous = asynchronous
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def submit(self, notification):
+        if not self.asynchronous:
+            self.deliver([notification])
+            return True
+        self.start()
+        try:
+            self.queue.put_nowait(notification)
+        except queue.Full:
+            self.logger.warning(f"Notification queue full, dropping {notification.description}: {notification.subject}")
+            self.metrics.increment("notifications_dropped")
+            return False
+        self.metrics.increment("notifications_queued")
+        return True
+
+    def start(self):
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name="notification-dispatcher", daemon=True)
+                self.worker.start()
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                self.queue.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.digest_seconds
+            while True:
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self.queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self.deliver(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def deliver(self, batch):
+        by_subject = dict()
+        for notification in batch:
+            by_subject.setdefault(notification.subject, []).append(notification)
+        for subject, notifications in by_subject.items():
+            if len(notifications) == 1:
+                notification = notifications[0]
+            else:
+                separator = "\n\n" + "-" * 40 + "\n\n"
+                notification = Notification(
+                    f"{subject} ({len(notifications)} notifications)",
+                    separator.join(n.body for n in notifications),
+                    f"{notifications[0].description} digest",
+                )
+                self.metrics.increment("notification_digests")
+            try:
+                self.sink.send(notification)
+            except Exception as e:
+                self.logger.error(f"Error delivering {notification.description}: {e}")
+
+    def flush(self, timeout):
+        # Waits for the queued notifications to be delivered, returns False if they were not within the timeout
+        end = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout):
+        delivered = self.flush(timeout)
+        if self.worker is not None and self.worker.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=timeout)
+                self.worker.join(timeout)
+            except queue.Full:
+                pass
+        return delivered
+
+
+def create_notification_sink(prosper_config, metrics=None):
+    sink = prosper_config.notification_sink
+    if sink == "sendgrid" or (sink is None and prosper_config.sendgrid_api_key):
+        return SendGridSink(prosper_config, metrics)
+    if sink == "file":
+        return FileSink(prosper_config.notification_file)
+    if sink == "memory":
+        return MemorySink()
+    return None
@@ -1,32 +1,48 @@
 # File: service/notification_service.py
 
 import logging
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import *
-from python_http_client.exceptions import HTTPError
+
+from service.metrics import Metrics
+from service.notification_dispatcher import Notification, NotificationDispatcher, create_notification_sink
 
 
 class NotificationService:
-    def __init__(self, prosper_config):
+    def __init__(self, prosper_config, metrics=None, dispatcher=None):
         self.prosper_config = prosper_config
         self.logger = logging.getLogger(__name__)
+        self.metrics = metrics if metrics is not None else Metrics()
+        if dispatcher is None:
+            sink = create_notification_sink(prosper_config, self.metrics)
+            if sink is not None:
+                dispatcher = NotificationDispatcher(
+                    sink,
+                    prosper_config.notification_queue_size,
+                    prosper_config.notification_digest_seconds,
+                    prosper_config.notification_async,
+                    self.metrics,
+                )
+        self.dispatcher = dispatcher
 
-    def send_order_notification(self, account, listing_set, orders_response):
-        api_key = self.prosper_config.sendgrid_api_key
-        if api_key:
-            from_email = From(self.prosper_config.email_from)
-            to_email = To(self.prosper_config.email_to)
-            subject = "Investpeer Prosper Py Order Submitted"
-            content = Content("text/plain", self.get_email_body(account, listing_set, orders_response))
-            mail = Mail(from_email, to_email, subject, content)
-            try:
-                sg = SendGridAPIClient(api_key)
-                response = sg.send(mail)
-                self.logger.info(f"Sent email to SendGrid with response status {response.status_code}")
-            except HTTPError as e:
-                self.logger.error(f"Error sending email: {e}")
+    def dispatch(self, subject, body_fn, description):
+        if self.prosper_config.account:
+            subject = f"{subject} ({self.prosper_config.account})"
+        if self.dispatcher is not None:
+            self.dispatcher.submit(Notification(subject, body_fn(), description))
         else:
-            self.logger.info("No SendGrid API key configured, skipping email notification.")
+            self.logger.info(f"No SendGrid API key configured, skipping {description}.")
+
+    def flush(self, timeout=None):
+        if self.dispatcher is not None:
+            timeout = self.prosper_config.notification_flush_timeout if timeout is None else timeout
+            if not self.dispatcher.flush(timeout):
+                self.logger.warning(f"Notifications still pending after {timeout} seconds")
+
+    def send_order_notification(self, account, listing_set, orders_response):
+        self.dispatch(
+            "Investpeer Prosper Py Order Submitted",
+            lambda: self.get_email_body(account, listing_set, orders_response),
+            "email notification",
+        )
 
     def get_email_body(self, account, listing_set, orders_response):
         sb = []
@@ -46,40 +62,16 @@ class NotificationService:
         return "\n".join(sb)
 
     def send_error_notification(self, error_message):
-        api_key = self.prosper_config.sendgrid_api_key
-        if api_key:
-            from_email = From(self.prosper_config.email_from)
-            to_email = To(self.prosper_config.email_to)
-            subject = "Investpeer Prosper Py Error Notification"
-            content = Content("text/plain", error_message)
-            mail = Mail(from_email, to_email, subject, content)
-            try:
-                sg = SendGridAPIClient(api_key)
-                response = sg.send(mail)
-                self.logger.info(f"Sent error email to SendGrid with response status {response.status_code}")
-            except HTTPError as e:
-                self.logger.error(f"Error sending error email: {e}")
-        else:
-            self.logger.info("No SendGrid API key configured, skipping error notification.")
+        self.dispatch("Investpeer Prosper Py Error Notification", lambda: error_message, "error notification")
 
-    def send_account_summary_notification(self, account):
-        api_key = self.prosper_config.sendgrid_api_key
-        if api_key:
-            from_email = From(self.prosper_config.email_from)
-            to_email = To(self.prosper_config.email_to)
-            subject = "Investpeer Prosper Py Account Summary"
-            content = Content("text/plain", self.get_account_summary_body(account))
-            mail = Mail(from_email, to_email, subject, content)
-            try:
-                sg = SendGridAPIClient(api_key)
-                response = sg.send(mail)
-                self.logger.info(f"Sent account summary email to SendGrid with response status {response.status_code}")
-            except HTTPError as e:
-                self.logger.error(f"Error sending account summary email: {e}")
-        else:
-            self.logger.info("No SendGrid API key configured, skipping account summary notification.")
+    def send_account_summary_notification(self, account, portfolio_summary=None):
+        self.dispatch(
+            "Investpeer Prosper Py Account Summary",
+            lambda: self.get_account_summary_body(account, portfolio_summary),
+            "account summary notification",
+        )
 
-    def get_account_summary_body(self, account):
+    def get_account_summary_body(self, account, portfolio_summary=None):
         sb = []
         sb.append("Account Summary")
         sb.append("=" * 40)
@@ -93,4 +85,26 @@ class NotificationService:
         sb.append("-" * 40)
         for note_grade, amount in account.invested_notes.items():
             sb.append(f"{note_grade}:{'':12} ${amount:>12,.2f}")
+        if portfolio_summary is not None:
+            sb.append(self.get_portfolio_summary_body(portfolio_summary))
+        return "\n".join(sb)
+
+    def get_portfolio_summary_body(self, portfolio_summary):
+        sb = []
+        sb.append("\nPortfolio")
+        sb.append("=" * 40)
+        sb.append(f"{'Active Notes:':30} {portfolio_summary.active_note_count:>13,}")
+        sb.append(f"{'Total Notes:':30} {portfolio_summary.note_count:>13,}")
+        sb.append(f"{'Changed Since Last Summary:':30} {portfolio_summary.changed_notes:>13,}")
+        sb.append(f"{'Outstanding Principal:':30} ${portfolio_summary.outstanding_principal:>12,.2f}")
+        sb.append(f"{'Principal Paid:':30} ${portfolio_summary.principal_paid:>12,.2f}")
+        sb.append(f"{'Interest Paid:':30} ${portfolio_summary.interest_paid:>12,.2f}")
+        for title, groups in (("Exposure by Grade", portfolio_summary.by_grade),
+                              ("Exposure by Term", portfolio_summary.by_term),
+                              ("Outstanding Principal by Days Past Due", portfolio_summary.by_aging)):
+            sb.append(f"\n{title}:")
+            sb.append("-" * 40)
+            for group in groups:
+                lender_yield = f"{group.lender_yield:6.2%}" if group.lender_yield is not None else "     -"
+                sb.append(f"{group.key + ':':13} {group.note_count:>6,} ${group.outstanding_principal:>12,.2f} {group.share:>7.1%} {lender_yield}")
         return "\n".join(sb)
@@ -0,0 +1,85 @@
+# service/order_submitter.py
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List
+
+from model.orders import BidRequest, OrdersResponse
+from service.metrics import Metrics
+
+# Largest number of bids the orders endpoint accepts in one request
+MAX_BIDS_PER_ORDER = 100
+
+
+@dataclass
+class ChunkFailure:
+    orders_request: dict
+    error: str
+
+
+@dataclass
+class OrderSubmission:
+    responses: List[OrdersResponse] = field(default_factory=list)
+    failures: List[ChunkFailure] = field(default_factory=list)
+
+    def submitted_listing_ids(self):
+        return {bid.listing_id for response in self.responses for bid in response.bid_requests or []}
+
+    def summary(self):
+        # One OrdersResponse covering every submitted chunk, for the order notification
+        if not self.responses:
+            return None
+        return OrdersResponse(
+            order_id=", ".join(response.order_id for response in self.responses),
+            order_date=self.responses[0].order_date,
+            bid_requests=[bid for response in self.responses for bid in response.bid_requests or []],
+            order_status=", ".join(sorted({response.order_status for response in self.responses if response.order_status})),
+            source=self.responses[0].source,
+        )
+
+
+def chunk_bid_requests(bid_requests, chunk_size):
+    chunk_size = max(1, min(chunk_size, MAX_BIDS_PER_ORDER))
+    return [{"bid_requests": bid_requests[i:i + chunk_size]} for i in range(0, len(bid_requests), chunk_size)]
+
+
+class OrderSubmitter:
+    # Submits the order requests concurrently. Each chunk is posted once: a 401 is refreshed and retried by
+    # submit_order, but a chunk that fails otherwise is not resubmitted, since the order may still have been
+    # placed. Successful chunks are recorded in the bid ledger as they complete, failed ones as unconfirmed.
+    def __init__(self, prosper_config, prosper_rest_service, bid_ledger, metrics=None):
+        self.prosper_config = prosper_config
+        self.prosper_rest_service = prosper_rest_service
+        self.bid_ledger = bid_ledger
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.logger = logging.getLogger(__name__)
+
+    def submit_chunk(self, orders_request):
+        response = self.prosper_rest_service.submit_order(orders_request)
+        self.logger.info(f"Order submitted: {response.order_id} ({len(orders_request['bid_requests'])} bids)")
+        if not response.bid_requests:
+            response.bid_requests = [BidRequest(**bid) for bid in orders_request["bid_requests"]]
+        self.bid_ledger.record_order(response)
+        return response
+
+    def submit(self, orders_requests):
+        submission = OrderSubmission()
+        if not orders_requests:
+            return submission
+        workers = max(1, min(self.prosper_config.order_submit_workers, len(orders_requests)))
+        with self.metrics.span("orders.submit"), ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.submit_chunk, orders_request) for orders_request in orders_requests]
+            for orders_request, future in zip(orders_requests, futures):
+                try:
+                    submission.responses.append(future.result())
+                except Exception as e:
+                    self.logger.error(f"Error submitting order chunk of {len(orders_request['bid_requests'])} bids: {e}")
+                    submission.failures.append(ChunkFailure(orders_request, str(e)))
+        self.metrics.increment("order_chunks_submitted", len(submission.responses))
+        if submission.failures:
+            self.metrics.increment("order_chunks_failed", len(submission.failures))
+            self.bid_ledger.record_unconfirmed(
+                [bid["listing_id"] for failure in submission.failures for bid in failure.orders_request["bid_requests"]]
+            )
+        return submission
@@ -0,0 +1,74 @@
+# service/polling_daemon.py
+
+import logging
+import signal
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+
+class PollingDaemon:
+    # Runs buy_notes in a loop on the same notes service as the Pub/Sub entry point, so the token, the
+    # connection pool and the compiled filters stay warm. Polls every min_interval around the listing release
+    # times and doubles the interval up to max_interval while the listings do not change.
+    def __init__(self, prosper_config, prosper_notes_service, invocation_guard=None):
+        self.prosper_config = prosper_config
+        self.prosper_notes_service = prosper_notes_service
+        self.invocation_guard = invocation_guard
+        self.logger = logging.getLogger(__name__)
+        self.stop_event = threading.Event()
+        self.time_zone = ZoneInfo(prosper_config.daemon_time_zone)
+        self.release_times = [
+            datetime.strptime(t.strip(), "%H:%M").time() for t in prosper_config.daemon_release_times.split(",") if t.strip()
+        ]
+        self.window = timedelta(minutes=prosper_config.daemon_release_window_minutes)
+        self.interval = prosper_config.daemon_min_interval
+
+    def stop(self, signum=None, frame=None):
+        self.logger.info(f"Stopping polling daemon (signal {signum})")
+        self.stop_event.set()
+
+    def in_release_window(self, now):
+        local_now = now.astimezone(self.time_zone)
+        for release_time in self.release_times:
+            for day in (-1, 0, 1):
+                release = datetime.combine(local_now.date() + timedelta(days=day), release_time, self.time_zone)
+                if abs(local_now - release) <= self.window:
+                    return True
+        return False
+
+    def next_interval(self, now, changed):
+        if changed or self.in_release_window(now):
+            self.interval = self.prosper_config.daemon_min_interval
+        else:
+            self.interval = min(self.interval * 2, self.prosper_config.daemon_max_interval)
+        return self.interval
+
+    def poll(self):
+        previous_signature = self.prosper_notes_service.last_listings_signature
+        try:
+            if self.invocation_guard is not None:
+                # Skips the poll while a Pub/Sub triggered run holds the buy_notes lease
+                self.invocation_guard.run(self.invocation_guard.key("buy_notes"), self.buy_notes)
+            else:
+                self.buy_notes()
+        except Exception as e:
+            self.logger.error(f"Error in polling daemon buy_notes: {e}")
+            return False
+        return self.prosper_notes_service.last_listings_signature != previous_signature
+
+    def buy_notes(self):
+        with self.prosper_notes_service.metrics.invocation("buy_notes"):
+            self.prosper_notes_service.buy_notes()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.logger.info("Polling daemon started")
+        while not self.stop_event.is_set():
+            changed = self.poll()
+            interval = self.next_interval(datetime.now(self.time_zone), changed)
+            self.logger.debug(f"Next poll in {interval} seconds")
+            self.stop_event.wait(interval)
+        self.prosper_notes_service.close()
+        self.logger.info("Polling daemon stopped")
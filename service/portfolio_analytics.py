@@ -0,0 +1,91 @@
+# service/portfolio_analytics.py
+
+import logging
+
+import numpy as np
+
+from model.listing_batch import PROSPER_RATINGS, UNKNOWN_RATING
+from model.note_batch import NoteBatch
+from model.portfolio import ExposureGroup, PortfolioSummary
+from service.metrics import Metrics
+
+# Days past due bucket lower bounds and labels for the aging of outstanding principal
+AGING_BUCKETS = ((0, "Current"), (1, "1-15 days"), (16, "16-30 days"), (31, "31-60 days"), (61, "61-90 days"),
+                 (91, "91-120 days"), (121, "120+ days"))
+
+
+class PortfolioAnalytics:
+    # Crawls the notes with the concurrent pager, keeps them in the note cache and summarizes the active notes
+    # by grade, term and days past due. A crawl younger than note_cache_max_age is reused as is.
+    def __init__(self, prosper_config, prosper_rest_service, note_cache, metrics=None):
+        self.prosper_config = prosper_config
+        self.prosper_rest_service = prosper_rest_service
+        self.note_cache = note_cache
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.logger = logging.getLogger(__name__)
+
+    def refresh(self):
+        if not self.note_cache.is_stale(self.prosper_config.note_cache_max_age):
+            self.logger.info("Note cache is fresh, skipping the notes crawl")
+            return self.note_cache.records(), 0
+        with self.metrics.span("notes.crawl"):
+            records = [record for page in self.prosper_rest_service.iter_notes_pages() for record in page.get("result") or []]
+        changed = self.note_cache.update(records)
+        self.metrics.increment("notes_changed", changed)
+        self.logger.info(f"Retrieved {len(records)} notes, {changed} new or changed since the last crawl")
+        return records, changed
+
+    def summary(self):
+        records, changed = self.refresh()
+        with self.metrics.span("notes.summarize"):
+            return summarize(NoteBatch(records), changed)
+
+
+def summarize(notes, changed_notes=0):
+    active = notes.active
+    outstanding = notes.outstanding_principal[active]
+    total = float(outstanding.sum())
+    lender_yield = notes.lender_yield[active]
+
+    codes = notes.rating_code[active].astype(np.int64)
+    grade_index = np.where(codes == UNKNOWN_RATING, len(PROSPER_RATINGS), codes)
+    by_grade = group_by(grade_index, list(PROSPER_RATINGS) + ["Unknown"], outstanding, lender_yield, total)
+
+    terms, term_index = np.unique(notes.term[active], return_inverse=True)
+    by_term = group_by(term_index, [f"{term} months" if term else "Unknown" for term in terms], outstanding, lender_yield, total)
+
+    bounds = np.array([bound for bound, _ in AGING_BUCKETS])
+    aging_index = np.searchsorted(bounds, notes.days_past_due[active], side="right") - 1
+    by_aging = group_by(np.maximum(aging_index, 0), [label for _, label in AGING_BUCKETS], outstanding, lender_yield, total)
+
+    return PortfolioSummary(
+        note_count=len(notes),
+        active_note_count=int(active.sum()),
+        outstanding_principal=total,
+        principal_paid=float(notes.principal_paid.sum()),
+        interest_paid=float(notes.interest_paid.sum()),
+        changed_notes=changed_notes,
+        by_grade=by_grade,
+        by_term=by_term,
+        by_aging=by_aging,
+    )
+
+
+def group_by(keys, labels, outstanding, lender_yield, total):
+    # One ExposureGroup per non-empty key, in label order; keys index into labels
+    size = len(labels)
+    counts = np.bincount(keys, minlength=size)
+    sums = np.bincount(keys, weights=outstanding, minlength=size)
+    has_yield = ~np.isnan(lender_yield)
+    yield_weights = np.bincount(keys[has_yield], weights=outstanding[has_yield], minlength=size)
+    yield_sums = np.bincount(keys[has_yield], weights=(outstanding * lender_yield)[has_yield], minlength=size)
+    return [
+        ExposureGroup(
+            key=labels[i],
+            note_count=int(counts[i]),
+            outstanding_principal=float(sums[i]),
+            share=float(sums[i] / total) if total else 0.0,
+            lender_yield=float(yield_sums[i] / yield_weights[i]) if yield_weights[i] else None,
+        )
+        for i in range(size) if counts[i]
+    ]
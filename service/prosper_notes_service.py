@@ -1,138 +1,265 @@
-import json
 import logging
-import traceback
-from dataclasses import asdict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
-from model.filterset import *
+import numpy as np
+
+from model.filter_matcher import FilterMatcher
+from model.listing_ranker import ListingRanker
+from service.bid_ledger import create_bid_ledger
+from service.diagnostics import Diagnostics
+from service.listing_archive import create_listing_archive
+from service.metrics import create_metrics
+from service.note_cache import create_note_cache
 from service.notification_service import NotificationService
+from service.order_submitter import OrderSubmitter, chunk_bid_requests
+from service.portfolio_analytics import PortfolioAnalytics
 from service.prosper_rest_service import ProsperRestService
+from service.seen_listing_cache import create_seen_listing_cache
+
+
+def remember_rejected_listings(seen_listing_cache, filter_matcher, listings_future, filter_match=None):
+    # Only listings no filter set could match at any cash level are cached as rejected. Caching is best
+    # effort, a failure is logged and never stops the order
+    try:
+        listings = listings_future.result()
+        if filter_match is None:
+            filter_match = filter_matcher.match(listings, float("inf"))
+        seen_listing_cache.record_rejected([listings.records[row] for row in np.flatnonzero(~filter_match.candidates)])
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Error caching rejected listings: {e}")
+
+
+def archive_listings(listing_archive, listings_future, metrics):
+    # Recording is best effort, a failure to fetch or archive the listings is logged and never stops the order
+    try:
+        listings = listings_future.result()
+        with metrics.span("archive.append"):
+            added = listing_archive.append(listings)
+        metrics.increment("listings_archived", added)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Error archiving listings: {e}")
 
 
 class ProsperNotesService:
 
-    def __init__(self, prosper_config):
+    def __init__(self, prosper_config, metrics=None, shared_listings=False):
+        # With shared_listings the listings are fetched, archived and cached by the caller and passed to buy_notes
         self.prosper_config = prosper_config
         self.logger = logging.getLogger(__name__)
-        self.prosper_rest_service = ProsperRestService(prosper_config)
-        self.notification_service = NotificationService(self.prosper_config)
+        self.metrics = metrics if metrics is not None else create_metrics(prosper_config)
+        self.diagnostics = Diagnostics(self.logger, prosper_config.diagnostics_snapshot_dir)
+        self.prosper_rest_service = ProsperRestService(prosper_config, metrics=self.metrics)
+        self.notification_service = NotificationService(self.prosper_config, metrics=self.metrics)
+        self.bid_ledger = create_bid_ledger(prosper_config)
+        self.order_submitter = OrderSubmitter(prosper_config, self.prosper_rest_service, self.bid_ledger, self.metrics)
+        self.last_listings_signature = None
+        self.cash_short = False  # whether the last run could not invest
+        self.filter_matcher = FilterMatcher(prosper_config.filter_set_properties.filter_set_list)
+        self.listing_ranker = ListingRanker(prosper_config.ranking_score, prosper_config.filter_set_properties.filter_set_list)
+        self.seen_listing_cache = None
+        self.listing_archive = None
+        if not shared_listings:
+            self.seen_listing_cache = create_seen_listing_cache(prosper_config) if prosper_config.incremental_listings else None
+            self.listing_archive = create_listing_archive(prosper_config)
+        self.portfolio_analytics = None
+        if prosper_config.portfolio_analytics:
+            self.portfolio_analytics = PortfolioAnalytics(
+                prosper_config, self.prosper_rest_service, create_note_cache(prosper_config), self.metrics
+            )
 
     def filter_listings(self, listings, max_loan_count):
-        filtered_listings = list()
-        if listings.result is not None:
-            for filter_set in self.prosper_config.filter_set_properties.filter_set_list:
-                self.logger.info(f"FilterSet in effect if Loan Count Over: {filter_set.loan_count_over}")
-                if filter_set.loan_count_over <= max_loan_count:
-                    self.logger.info(f"FilterSet in effect: {filter_set}")
-                    for listing in listings.result:
-                        if (
-                                check_grade(filter_set, listing.prosper_rating)
-                                and check_employment_length(filter_set, listing.months_employed)
-                                and listing.credit_bureau_values_transunion_indexed is not None
-                                and check_inquiries(filter_set, listing.credit_bureau_values_transunion_indexed.g980s_inquiries_in_the_last_6_months)
-                                and check_delinquencies(filter_set, listing.credit_bureau_values_transunion_indexed.g218b_number_of_delinquent_accounts)
-                                and listing.stated_monthly_income > 0
-                                and check_payment_income_ratio(filter_set, listing.listing_monthly_payment, listing.stated_monthly_income)
-                        ):
-                            filtered_listings.append(listing)
-                            self.logger.info(f"Adding Listing: {listing.listing_number}")
-                else:
-                    self.logger.info(f"FilterSet skipped: {filter_set}")
-        return filtered_listings
-
-    def trim_filtered_listing(self, filtered_listings, max_loan_count):
-        orders_list = self.prosper_rest_service.get_orders_list()
-        trimmed_listings = list(filtered_listings)
-        if orders_list is not None and orders_list.result is not None:
-            for orders_response in orders_list.result:
-                if (
-                        orders_response.order_status == "IN_PROGRESS"
-                        and orders_response.bid_requests is not None
-                ):
-                    for bid_request in orders_response.bid_requests:
-                        for listing in list(trimmed_listings):
-                            if bid_request.listing_id == listing.listing_number:
-                                self.logger.info(f"Removing Listing already ordered: {listing.listing_number}")
-                                trimmed_listings.remove(listing)
-            # Truncate if more than max_loan_count
-            if len(trimmed_listings) > max_loan_count:
-                self.logger.info(f"Truncating order to max listing count of {max_loan_count}")
-                trimmed_listings = list(list(trimmed_listings)[:max_loan_count])
+        active = self.filter_matcher.active(max_loan_count)
+        for filter_set, in_effect in zip(self.filter_matcher.filter_set_list, active):
+            if in_effect:
+                self.logger.info(f"FilterSet in effect: {filter_set}")
+            else:
+                self.logger.info(f"FilterSet skipped: {filter_set}")
+        with self.metrics.span("filter"):
+            filter_match = self.filter_matcher.match(listings, max_loan_count)
+        for filter_set_index, count in enumerate(np.bincount(filter_match.filter_sets, minlength=len(self.filter_matcher))):
+            self.metrics.increment(f"matches.filter_set_{filter_set_index}", int(count))
+        for row, filter_set_index in zip(filter_match.rows, filter_match.filter_sets):
+            self.logger.info(f"Adding Listing: {listings.listing_number[row]} (FilterSet {filter_set_index})")
+        return filter_match
+
+    def get_in_flight_listing_ids(self):
+        if self.bid_ledger.is_stale(self.prosper_config.bid_ledger_max_age):
+            self.logger.info("Bid ledger is stale, reconciling with orders list...")
+            self.metrics.increment("bid_ledger_reconciles")
+            started_at = time.time()
+            oldest_order_date = None
+            if self.prosper_config.order_in_progress_max_age_hours is not None:
+                oldest_order_date = datetime.now(timezone.utc) - timedelta(hours=self.prosper_config.order_in_progress_max_age_hours)
+            in_progress_bids = dict()
+            with self.metrics.span("orders.reconcile"):
+                for orders_list in self.prosper_rest_service.iter_orders_pages(oldest_order_date):
+                    for orders_response in orders_list.result or []:
+                        if orders_response.order_status == "IN_PROGRESS":
+                            for bid_request in orders_response.bid_requests or []:
+                                in_progress_bids[bid_request.listing_id] = orders_response.order_id
+            self.bid_ledger.reconcile(in_progress_bids, started_at)
+        return self.bid_ledger.in_flight_listing_ids()
+
+    def trim_filtered_listing(self, filtered_listings, max_loan_count, in_flight_listing_ids=None, filter_sets=None):
+        if in_flight_listing_ids is None:
+            in_flight_listing_ids = self.get_in_flight_listing_ids()
+        if filter_sets is None:
+            filter_sets = [0] * len(filtered_listings)
+        trimmed_listings = list()
+        trimmed_filter_sets = list()
+        for listing, filter_set_index in zip(filtered_listings, filter_sets):
+            if listing.listing_number in in_flight_listing_ids:
+                self.logger.info(f"Removing Listing already ordered: {listing.listing_number}")
+            else:
+                trimmed_listings.append(listing)
+                trimmed_filter_sets.append(filter_set_index)
+        # Keep the best max_loan_count listings if there are more
+        if len(trimmed_listings) > max_loan_count:
+            self.logger.info(f"Truncating order to the {max_loan_count} best ranked listings")
+            with self.metrics.span("rank"):
+                trimmed_listings = self.listing_ranker.top_k(trimmed_listings, trimmed_filter_sets, max_loan_count)
         return trimmed_listings
 
-    def create_order_request(self, listings, max_loan_count):
-        orders_request = dict()
+    def create_bid_requests(self, listings, max_loan_count):
         bid_requests = list()
-        order_ids = list()
-        for i, listing in enumerate(list(listings)[:min(max_loan_count, 100)]):
+        order_ids = set()
+        for listing in listings:
+            if len(bid_requests) >= max_loan_count:
+                break
             if listing.listing_number not in order_ids:
-                order_ids.append(listing.listing_number)
-                bid_request = {"listing_id": listing.listing_number, "bid_amount": self.prosper_config.minimum_investment_amount}
-                bid_requests.append(bid_request)
-        orders_request.update({"bid_requests": bid_requests})
-        self.logger.info(f"Created OrdersRequest: {orders_request}")
-        return orders_request
-
-    def buy_notes(self):
+                order_ids.add(listing.listing_number)
+                bid_requests.append({"listing_id": listing.listing_number, "bid_amount": self.prosper_config.minimum_investment_amount})
+        return bid_requests
+
+    def create_order_requests(self, listings, max_loan_count):
+        # The orders endpoint takes at most 100 bids, so larger orders are split into chunks submitted together
+        orders_requests = chunk_bid_requests(self.create_bid_requests(listings, max_loan_count), self.prosper_config.order_chunk_size)
+        self.logger.info(f"Created {len(orders_requests)} OrdersRequest chunks: {orders_requests}")
+        return orders_requests
+
+    def buy_notes(self, listings_future=None):
+        # Account, listings and in-flight orders do not depend on each other, so they are fetched at once
+        executor = ThreadPoolExecutor(max_workers=3)
+        wait = True
         try:
-            # Determine how much cash is available to invest
-            self.logger.info("Retrieving account information...")
-            account = self.prosper_rest_service.get_account()
-            self.logger.debug(f"Account information: {json.dumps(asdict(account), indent=4)}")
-            available_cash = account.available_cash_balance
-            self.logger.info(f"Available cash balance: {available_cash}")
-            if self.prosper_config.run_mode == "test" or available_cash >= self.prosper_config.minimum_investment_amount:
-                self.logger.info("Getting listings...")
-                listings = self.prosper_rest_service.get_listings()
-                self.logger.info(f"Total listings retrieved: {len(listings.result)}")
-                if listings.result_count > 0:
-                    self.logger.debug(f"Listings: {json.dumps([asdict(listing) for listing in listings.result], indent=4)}")
-
-                    # Find the maximum load count we can invest in by dividing the available cash by the minimum investment amount, rounding down
-                    max_loan_count = int(available_cash / self.prosper_config.minimum_investment_amount)
-                    self.logger.info(f"Maximum loan count based on available cash: {max_loan_count}")
-
-                    # Filter the listings based on the filter sets
-                    self.logger.info("Processing listings...")
-                    filtered_listings = self.filter_listings(listings, max_loan_count)
-                    if filtered_listings and len(filtered_listings) > 0:
-                        self.logger.info(f"Filtered listings count: {len(filtered_listings)}")
-
-                        # Trim the filtered listings based on existing orders
-                        trimmed_listings = self.trim_filtered_listing(filtered_listings, max_loan_count)
-                        self.logger.info(f"Trimmed listings count: {len(trimmed_listings)}")
-
-                        # If RUN_MODE is prod, create the order request and submit it
-                        if trimmed_listings and len(trimmed_listings) > 0 and self.prosper_config.run_mode == "prod":
-                            self.logger.info("Proceeding to buy notes...")
-                            self.logger.debug(f"Trimmed listings: {json.dumps([asdict(listing) for listing in trimmed_listings], indent=4)}")
-                            orders_request = self.create_order_request(trimmed_listings, max_loan_count)
-                            self.logger.info(f"Submitting order request: {orders_request}")
-                            response = self.prosper_rest_service.submit_order(orders_request)
-                            self.logger.info(f"Order submitted: {response.order_id}")
-                            self.notification_service.send_order_notification(account, trimmed_listings, response)
-
-                        elif trimmed_listings and len(trimmed_listings) > 0 and self.prosper_config.run_mode == "test":
-                            self.logger.info("Test mode, not submitting order. Trimmed listings:")
-                            self.logger.debug(f"Trimmed listings: {json.dumps([asdict(listing) for listing in trimmed_listings], indent=4)}")
-                            self.notification_service.send_order_notification(account, trimmed_listings, None)
-
-                        else:
-                            self.logger.info("No listings available after trimming, skipping buy_notes.")
-                    else:
-                        self.logger.info("No listings matched the filter criteria.")
-                        return
-                else:
-                    self.logger.info("No listings available to process.")
-                    return
-            else:
-                self.logger.info("Insufficient cash available to invest, skipping buy_notes.")
+            self.logger.info("Retrieving account information, listings and in-flight orders...")
+            account_future = executor.submit(self.prosper_rest_service.get_account)
+            if self.cash_short and self.listing_archive is None and not self.can_invest(account_future.result()):
+                # Still fully invested, so no listings download or orders reconcile is started for nothing
+                self.process_listings(account_future.result(), None, None)
                 return
+            if listings_future is None:
+                listings_future = executor.submit(self.prosper_rest_service.get_listings, self.seen_listing_cache, self.filter_matcher)
+            in_flight_future = executor.submit(self.get_in_flight_listing_ids)
+            account = account_future.result()
+            self.cash_short = not self.can_invest(account)
+            if self.cash_short and self.listing_archive is None:
+                # Nothing else is needed, so the run returns without waiting for the listings and orders
+                wait = False
+            filter_match = self.process_listings(account, listings_future, in_flight_future)
+            # Recorded once the order is out, so caching and archiving never delay a bid
+            if self.seen_listing_cache is not None and filter_match is not None:
+                remember_rejected_listings(self.seen_listing_cache, self.filter_matcher, listings_future, filter_match)
+            if self.listing_archive is not None:
+                archive_listings(self.listing_archive, listings_future, self.metrics)
 
         except Exception as e:
             self.logger.error(f"Error retrieving listings: {e}")
             raise e
-        return
+        finally:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def can_invest(self, account):
+        return self.prosper_config.run_mode == "test" or account.available_cash_balance >= self.prosper_config.minimum_investment_amount
+
+    def process_listings(self, account, listings_future, in_flight_future):
+        # Returns the FilterMatch of the listings, or None when they were not filtered
+        self.diagnostics.dump("Account information", lambda: account)
+        # Determine how much cash is available to invest
+        available_cash = account.available_cash_balance
+        self.logger.info(f"Available cash balance: {available_cash}")
+        if self.can_invest(account):
+            listings = listings_future.result()
+            self.last_listings_signature = (listings.total_count, hash(listings.listing_number.tobytes()))
+            self.logger.info(f"Total listings retrieved: {len(listings)}")
+            if listings.result_count > 0:
+                self.diagnostics.dump("Listings", lambda: listings.records)
+
+                # Find the maximum load count we can invest in by dividing the available cash by the minimum investment amount, rounding down
+                max_loan_count = int(available_cash / self.prosper_config.minimum_investment_amount)
+                self.logger.info(f"Maximum loan count based on available cash: {max_loan_count}")
+
+                # Filter the listings based on the filter sets
+                self.logger.info("Processing listings...")
+                filter_match = self.filter_listings(listings, max_loan_count)
+                if len(filter_match) > 0:
+                    self.logger.info(f"Filtered listings count: {len(filter_match)}")
+                    filtered_listings = listings.listings(filter_match.rows)
+
+                    # Trim the filtered listings based on existing orders
+                    with self.metrics.span("orders.wait"):
+                        in_flight_listing_ids = in_flight_future.result()
+                    trimmed_listings = self.trim_filtered_listing(
+                        filtered_listings, max_loan_count, in_flight_listing_ids, filter_match.filter_sets
+                    )
+                    self.metrics.increment("listings_trimmed", len(trimmed_listings))
+                    self.logger.info(f"Trimmed listings count: {len(trimmed_listings)}")
+
+                    # If RUN_MODE is prod, create the order request and submit it
+                    if trimmed_listings and len(trimmed_listings) > 0 and self.prosper_config.run_mode == "prod":
+                        self.logger.info("Proceeding to buy notes...")
+                        self.diagnostics.dump("Trimmed listings", lambda: trimmed_listings)
+                        orders_requests = self.create_order_requests(trimmed_listings, max_loan_count)
+                        submission = self.order_submitter.submit(orders_requests)
+                        if not submission.responses:
+                            raise Exception(f"Error submitting order: all {len(orders_requests)} chunks failed")
+                        if submission.failures:
+                            self.logger.error(f"{len(submission.failures)} of {len(orders_requests)} order chunks failed, not resubmitted")
+                        submitted_listing_ids = submission.submitted_listing_ids()
+                        submitted_listings = [listing for listing in trimmed_listings if listing.listing_number in submitted_listing_ids]
+                        self.notification_service.send_order_notification(account, submitted_listings, submission.summary())
+
+                    elif trimmed_listings and len(trimmed_listings) > 0 and self.prosper_config.run_mode == "test":
+                        self.logger.info("Test mode, not submitting order. Trimmed listings:")
+                        self.diagnostics.dump("Trimmed listings", lambda: trimmed_listings)
+                        self.notification_service.send_order_notification(account, trimmed_listings, None)
+
+                    else:
+                        self.logger.info("No listings available after trimming, skipping buy_notes.")
+                else:
+                    self.logger.info("No listings matched the filter criteria.")
+                return filter_match
+            else:
+                self.logger.info("No listings available to process.")
+                return
+        else:
+            self.logger.info("Insufficient cash available to invest, skipping buy_notes.")
+            return
 
     def account_summary(self):
-        account = self.prosper_rest_service.get_account()
-        self.notification_service.send_account_summary_notification(account)
+        if self.portfolio_analytics is None:
+            account = self.prosper_rest_service.get_account()
+            self.notification_service.send_account_summary_notification(account)
+            return
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            account_future = executor.submit(self.prosper_rest_service.get_account)
+            portfolio_future = executor.submit(self.portfolio_analytics.summary)
+            account = account_future.result()
+            try:
+                portfolio_summary = portfolio_future.result()
+            except Exception as e:
+                # The account summary still goes out without the portfolio analytics
+                self.logger.error(f"Error computing portfolio analytics: {e}")
+                portfolio_summary = None
+        self.notification_service.send_account_summary_notification(account, portfolio_summary)
+
+    def flush_notifications(self, timeout=None):
+        self.notification_service.flush(timeout)
+
+    def close(self):
+        dispatcher = self.notification_service.dispatcher
+        if dispatcher is not None:
+            dispatcher.close(self.prosper_config.notification_flush_timeout)
+        self.prosper_rest_service.transport.close()
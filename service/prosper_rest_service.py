@@ -1,13 +1,27 @@
 # service/prosper_rest_service.py
 
-import requests
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
 from dacite import from_dict, Config
 from dataclasses import dataclass
 
+import numpy as np
+
 from model.account import Account
-from model.listings import Listings
+from model.listing_batch import ListingBatch
 from model.orders import OrdersList, OrdersResponse
+from service.diagnostics import Diagnostics
+from service.http_transport import HttpTransport
+from service.listing_query_planner import plan_listing_queries
+from service.listing_stream import iter_json_array_items
+from service.metrics import Metrics
+from service.response_cache import ResponseCache, conditional_headers, parse_ttls
+from service.token_store import create_token_store
 
 
 @dataclass
@@ -19,36 +33,71 @@ class OAuthToken:
 
 
 class OauthTokenHolder:
-    def __init__(self):
+    # Tracks the absolute expiry of the token and persists it, so a new instance can skip the password grant
+    def __init__(self, token_store=None, token_key="default", refresh_margin=60):
         self.token = None
+        self.token_store = token_store
+        self.token_key = token_key
+        self.refresh_margin = refresh_margin
+        self.lock = threading.RLock()
 
     def set_oauth_token(self, token):
+        token = dict(token)
+        if token.get("expires_in") is not None:
+            token["expires_at"] = time.time() + float(token["expires_in"])
         self.token = token
+        if self.token_store is not None:
+            self.token_store.save(self.token_key, token)
 
     def get_oauth_token(self):
+        if self.token is None and self.token_store is not None:
+            self.token = self.token_store.load(self.token_key)
         return self.token
 
+    def clear_oauth_token(self):
+        self.token = None
+        if self.token_store is not None:
+            self.token_store.delete(self.token_key)
+
+    def get_refresh_token(self):
+        token = self.get_oauth_token()
+        return token.get("refresh_token") if token is not None else None
+
     def is_token_valid(self):
-        return self.token is not None and "expires_in" in self.token and self.token["expires_in"] > 0
+        token = self.get_oauth_token()
+        if token is None or not token.get("access_token"):
+            return False
+        expires_at = token.get("expires_at")
+        return expires_at is None or time.time() < expires_at - self.refresh_margin
 
 
 class ProsperRestService:
-    def __init__(self, prosper_config):
+    def __init__(self, prosper_config, transport=None, metrics=None):
         self.prosper_config = prosper_config
-        self.o_auth_token_holder = OauthTokenHolder()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.transport = transport if transport is not None else HttpTransport.shared(prosper_config)
+        self.o_auth_token_holder = OauthTokenHolder(
+            create_token_store(prosper_config),
+            f"{prosper_config.base_url}|{prosper_config.client_id}|{prosper_config.username}",
+            prosper_config.token_refresh_margin,
+        )
         self.logger = logging.getLogger(__name__)
+        self.diagnostics = Diagnostics(self.logger, prosper_config.diagnostics_snapshot_dir)
+        self.metrics.register_gauge("http", self.transport.stats)
+        self.response_cache = ResponseCache(
+            parse_ttls(prosper_config.response_cache_ttls) if prosper_config.response_cache else {},
+            prosper_config.response_cache_size,
+        )
 
     def get_base_url(self):
         # Implement this method to return the base URL
         return self.prosper_config.base_url
 
     def get_http_headers(self):
-        if (
-                self.o_auth_token_holder.get_oauth_token() is None or
-                not self.o_auth_token_holder.get_oauth_token().get("access_token")
-        ):
-            self.init_token()
-        token = self.o_auth_token_holder.get_oauth_token().get("access_token")
+        with self.o_auth_token_holder.lock:
+            if not self.o_auth_token_holder.is_token_valid():
+                self.refresh_token()
+            token = self.o_auth_token_holder.get_oauth_token().get("access_token")
         headers = {
             "Accept": "application/json",
             "Content-Type": "application/json",
@@ -56,25 +105,54 @@ class ProsperRestService:
         }
         return headers
 
+    def refresh_token(self):
+        # Use the refresh_token grant ahead of expiry and fall back to the password grant when it is refused
+        refresh_token = self.o_auth_token_holder.get_refresh_token()
+        if refresh_token:
+            try:
+                self.request_token({"grant_type": "refresh_token", "refresh_token": refresh_token}, "Refreshing")
+                self.metrics.increment("token_refreshes")
+                return
+            except Exception as e:
+                self.logger.info(f"Refresh token grant failed, falling back to password grant: {e}")
+        self.init_token()
+
+    def reset_token(self, rejected_headers):
+        # Called after a 401/403; another thread may already have replaced the rejected token
+        with self.o_auth_token_holder.lock:
+            token = self.o_auth_token_holder.get_oauth_token()
+            if token is None or rejected_headers["Authorization"] == f"bearer {token.get('access_token')}":
+                self.logger.info("Expired access token detected, re-initializing token...")
+                self.o_auth_token_holder.clear_oauth_token()
+                self.init_token()
+        return self.get_http_headers()
+
     def init_token(self):
+        self.request_token({
+            "grant_type": "password",
+            "username": self.prosper_config.username,
+            "password": self.prosper_config.password
+        }, "Initializing")
+
+    def request_token(self, grant, action):
         headers = {
             "Accept": "application/json",
             "Content-Type": "application/x-www-form-urlencoded"
         }
         url = f"{self.get_base_url()}/v1/security/oauth/token"
         data = {
-            "grant_type": "password",
             "client_id": self.prosper_config.client_id,
             "client_secret": self.prosper_config.client_secret,
-            "username": self.prosper_config.username,
-            "password": self.prosper_config.password
+            **grant
         }
 
-        self.logger.info("Initializing OAuth Token...")
-        response = requests.post(url, headers=headers, data=data)
+        self.logger.info(f"{action} OAuth Token...")
+        self.metrics.increment("token_requests")
+        with self.metrics.span("http.token"):
+            response = self.transport.post(url, "token", headers=headers, data=data, metrics=self.metrics)
         if not response.ok or not response.json().get("access_token"):
             raise Exception(
-                f"Exception initializing Prosper OAuth Token {response.status_code}"
+                f"Exception {action.lower()} Prosper OAuth Token {response.status_code}"
             )
 
         self.o_auth_token_holder.set_oauth_token(response.json())
@@ -83,59 +161,288 @@ class ProsperRestService:
             self.o_auth_token_holder.get_oauth_token().get("expires_in")
         )
 
-    def get_entity(self, url, data_class):
+    def get_response(self, url, entity_name, endpoint, stream=False, extra_headers=None):
         headers = self.get_http_headers()
-        response = requests.get(url, headers=headers)
-        if response.status_code in (401, 403):
-            self.logger.info("Expired access token detected, re-initializing token...")
-            self.init_token()
-            headers = self.get_http_headers()
-            response = requests.get(url, headers=headers)
+        with self.metrics.span(f"http.{endpoint}"):
+            response = self.transport.get(url, endpoint, headers={**headers, **(extra_headers or {})}, stream=stream,
+                                          metrics=self.metrics)
+            if response.status_code in (401, 403):
+                response.close()
+                headers = self.reset_token(headers)
+                response = self.transport.get(url, endpoint, headers={**headers, **(extra_headers or {})}, stream=stream,
+                                              metrics=self.metrics)
         if not response.ok:
-            raise Exception(f"Error retrieving {data_class.__name__}: {response.status_code}")
-        return from_dict(data_class=data_class, data=response.json(), config=Config(strict=False))
+            response.close()
+            raise Exception(f"Error retrieving {entity_name}: {response.status_code}")
+        if not stream:
+            self.metrics.increment("bytes_downloaded", response_bytes(response))
+        return response
+
+    def get_json(self, url, entity_name, endpoint):
+        response = self.get_response(url, entity_name, endpoint)
+        with self.metrics.span("decode.json"):
+            return response.json()
+
+    def get_entity(self, url, data_class, endpoint):
+        # Cached entities are returned while fresh and revalidated with their ETag/Last-Modified once stale,
+        # a 304 reusing the decoded entity. Callers share cached entities and must not mutate them.
+        if not self.response_cache.enabled(endpoint):
+            data = self.get_json(url, data_class.__name__, endpoint)
+            return from_dict(data_class=data_class, data=data, config=Config(strict=False))
+        cached = self.response_cache.get(url)
+        if cached is not None and self.response_cache.is_fresh(cached):
+            self.metrics.increment(f"response_cache_hits.{endpoint}")
+            return cached.value
+        response = self.get_response(url, data_class.__name__, endpoint, extra_headers=conditional_headers(cached))
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            self.response_cache.touch(url)
+            self.metrics.increment(f"response_cache_revalidated.{endpoint}")
+            return cached.value
+        self.metrics.increment(f"response_cache_misses.{endpoint}")
+        with self.metrics.span("decode.json"):
+            data = response.json()
+        entity = from_dict(data_class=data_class, data=data, config=Config(strict=False))
+        self.response_cache.put(url, endpoint, entity, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return entity
 
     def get_account(self):
         url = f"{self.get_base_url()}/v1/accounts/prosper"
         self.logger.info("Invoking Account service with URL: %s", url)
-        return self.get_entity(url, Account)
+        return self.get_entity(url, Account, "accounts")
 
-    def get_listings(self):
+    def get_listings(self, seen_listing_cache=None, filter_matcher=None):
         url = f"{self.get_base_url()}/listingsvc/v2/listings?limit=5000&biddable=true&invested=false"
         global_filters = self.prosper_config.global_filters
         if global_filters:
             for key, value in global_filters.items():
                 url += f"&{key}={value}"
+        if self.prosper_config.listing_pushdown and filter_matcher is not None:
+            queries = plan_listing_queries(filter_matcher.filter_set_list, self.prosper_config.listing_pushdown_max_queries)
+            if len(queries) == 1 and queries[0].is_unfiltered():
+                self.logger.info("Filter sets accept every listing, pushdown skipped")
+            else:
+                return self.get_listings_pushdown(url, queries, seen_listing_cache, filter_matcher)
         self.logger.info("Invoking Listings service with URL: %s", url)
-        return self.get_entity(url, Listings)
+        if self.prosper_config.stream_listings and filter_matcher is not None:
+            return self.stream_listings(url, seen_listing_cache, filter_matcher)
+        # Listings are decoded into a columnar batch, Listing objects are only built for the rows that are used
+        data = self.get_json(url, "Listings", "listings")
+        with self.metrics.span("decode.listings"):
+            records = data.get("result") or []
+            if seen_listing_cache is not None:
+                unseen_records = seen_listing_cache.unseen(records)
+                self.logger.info(f"Skipping {len(records) - len(unseen_records)} unchanged listings rejected in earlier runs")
+                records = unseen_records
+            listings = ListingBatch(records, data.get("result_count") or 0, data.get("total_count") or 0)
+        self.metrics.increment("listings_decoded", len(listings))
+        return listings
 
-    def get_orders_list(self):
-        limit = self.prosper_config.order_list_limit
-        url = f"{self.get_base_url()}/v1/orders/?limit={limit}"
-        orders_list = self.get_entity(url, OrdersList)
-        if orders_list.result is not None and orders_list.total_count is not None:
-            i = len(orders_list.result)
-            while i < orders_list.total_count:
-                offset_url = f"{self.get_base_url()}/v1/orders/?limit={limit}&offset={i}"
-                next_orders = self.get_entity(offset_url, OrdersList)
-                if next_orders.result:
-                    orders_list.result.extend(next_orders.result)
-                    i += len(next_orders.result)
+    def get_listings_pushdown(self, url, queries, seen_listing_cache, filter_matcher=None):
+        # Fetches the planned queries in parallel and merges them by listing_number in query order.
+        # filter_listings still checks every listing, the queries only narrow what is downloaded.
+        # With stream_listings each query is streamed and keeps only its candidates.
+        stream = self.prosper_config.stream_listings and filter_matcher is not None
+        if not queries:
+            self.logger.info("No filter set can match, skipping the listings request")
+            return ListingBatch([], 0, 0)
+        report = self.prosper_config.listing_pushdown_report
+        with ThreadPoolExecutor(max_workers=len(queries) + int(report)) as executor:
+            futures = list()
+            for query in queries:
+                query_url = url + query.query_string()
+                self.logger.info(f"Invoking Listings service for filter sets {query.filter_sets} with URL: {query_url}")
+                if stream:
+                    futures.append(executor.submit(self.stream_listings_page, query_url, seen_listing_cache, filter_matcher))
                 else:
+                    futures.append(executor.submit(self.get_listings_page, query_url))
+            # total_count of the unfiltered query, to estimate what the full fetch would have downloaded
+            full_count_future = executor.submit(self.get_listings_page, url.replace("limit=5000", "limit=1")) if report else None
+            pages = [future.result() for future in futures]
+
+        records_by_number = dict()
+        downloaded_bytes = 0
+        downloaded_count = 0
+        for data, size in pages:
+            downloaded_bytes += size
+            result = data.get("result") or []
+            downloaded_count += data["result_count"] if stream else len(result)
+            for record in result:
+                records_by_number.setdefault(record.get("listing_number"), record)
+        records = list(records_by_number.values())
+        self.metrics.increment("pushdown_queries", len(queries))
+        self.logger.info(f"Pushdown fetched {downloaded_count} listings ({len(records)} unique) in {downloaded_bytes} bytes")
+        if full_count_future is not None and downloaded_count:
+            full_count = full_count_future.result()[0].get("total_count") or 0
+            saved = int(full_count * downloaded_bytes / downloaded_count) - downloaded_bytes
+            self.metrics.increment("pushdown_bytes_saved_estimate", saved)
+            self.logger.info(f"Pushdown saved an estimated {saved} bytes against the full fetch of {full_count} listings")
+
+        if stream:
+            return ListingBatch(records, len(records), len(records))
+        with self.metrics.span("decode.listings"):
+            if seen_listing_cache is not None:
+                unseen_records = seen_listing_cache.unseen(records)
+                self.logger.info(f"Skipping {len(records) - len(unseen_records)} unchanged listings rejected in earlier runs")
+                records = unseen_records
+            listings = ListingBatch(records, len(records), len(records))
+        self.metrics.increment("listings_decoded", len(listings))
+        return listings
+
+    def get_listings_page(self, url):
+        response = self.get_response(url, "Listings", "listings")
+        with self.metrics.span("decode.json"):
+            return response.json(), response_bytes(response)
+
+    def stream_listings(self, url, seen_listing_cache, filter_matcher):
+        data, _ = self.stream_listings_page(url, seen_listing_cache, filter_matcher)
+        return ListingBatch(data["result"], data.get("result_count") or 0, data.get("total_count") or 0)
+
+    def stream_listings_page(self, url, seen_listing_cache, filter_matcher):
+        # Parses the result array incrementally and keeps only the listings some filter set could match at any
+        # cash level, so peak memory is bounded by the matches and one batch rather than the whole payload.
+        # filter_listings then applies the cash-dependent filter sets to the returned candidates.
+        fields = dict()
+        candidates = list()
+        streamed_count = 0
+        with self.get_response(url, "Listings", "listings", stream=True) as response, self.metrics.span("decode.listings"):
+            items = iter_json_array_items(response.iter_content(chunk_size=65536), "result", fields)
+            while True:
+                records = list(islice(items, self.prosper_config.stream_batch_size))
+                if not records:
                     break
+                streamed_count += len(records)
+                if seen_listing_cache is not None:
+                    records = seen_listing_cache.unseen(records)
+                batch = ListingBatch(records, len(records), len(records))
+                matched = np.zeros(len(records), dtype=bool)
+                matched[filter_matcher.match(batch, float("inf")).rows] = True
+                candidates.extend(record for record, keep in zip(records, matched) if keep)
+                if seen_listing_cache is not None:
+                    seen_listing_cache.record_rejected([record for record, keep in zip(records, matched) if not keep])
+            size = response_bytes(response)
+            self.metrics.increment("bytes_downloaded", size)
+        self.metrics.increment("listings_decoded", streamed_count)
+        self.logger.info(f"Streamed {streamed_count} listings, kept {len(candidates)} candidates")
+        return dict(fields, result=candidates, result_count=fields.get("result_count") or streamed_count), size
+
+    def get_orders_list(self):
+        # Merged into a new OrdersList, the pages may be shared response cache entries
+        orders_list = None
+        for page in self.iter_orders_pages():
+            if orders_list is None:
+                orders_list = OrdersList(list(page.result or []), page.result_count, page.total_count)
+            elif page.result:
+                orders_list.result.extend(page.result)
+        return orders_list
+
+    def iter_orders_pages(self, oldest_order_date=None):
+        # Yields OrdersList pages in offset order. With oldest_order_date, paging stops after the first page
+        # whose orders are all older than it, since orders are returned newest first.
+        return self.iter_pages(
+            self.get_orders_page,
+            self.prosper_config.order_list_limit,
+            self.prosper_config.order_list_workers,
+            lambda page: is_older_page(page, oldest_order_date),
+        )
+
+    def iter_pages(self, get_page, limit, workers, is_last_page=None):
+        # Yields pages in offset order. The first page gives total_count, the remaining offsets are fetched
+        # concurrently in a bounded window. Paging stops at an empty page or one is_last_page accepts.
+        first_page = get_page(limit, 0)
+        yield first_page
+        result, total_count = page_result(first_page)
+        if not result or total_count is None or (is_last_page is not None and is_last_page(first_page)):
+            return
+        # Step by what the API actually returned in case it caps the page size below the requested limit
+        step = len(result)
+        offsets = iter(range(step, total_count, step))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque(executor.submit(get_page, limit, offset) for offset in islice(offsets, workers))
+            while pending:
+                page = pending.popleft().result()
+                yield page
+                if not page_result(page)[0] or (is_last_page is not None and is_last_page(page)):
+                    for future in pending:
+                        future.cancel()
+                    return
+                for offset in islice(offsets, 1):
+                    pending.append(executor.submit(get_page, limit, offset))
+
+    def get_orders_page(self, limit, offset):
+        url = f"{self.get_base_url()}/v1/orders/?limit={limit}"
+        if offset:
+            url += f"&offset={offset}"
+        orders_list = self.get_entity(url, OrdersList, "orders")
+        self.metrics.increment("orders_pages_fetched")
         return orders_list
 
+    def iter_notes_pages(self):
+        return self.iter_pages(self.get_notes_page, self.prosper_config.notes_page_limit, self.prosper_config.notes_workers)
+
+    def get_notes_page(self, limit, offset):
+        # Notes stay raw records, the portfolio analytics decode them into columns
+        url = f"{self.get_base_url()}/v1/notes/?limit={limit}"
+        if offset:
+            url += f"&offset={offset}"
+        notes_page = self.get_json(url, "Notes", "notes")
+        self.metrics.increment("notes_pages_fetched")
+        return notes_page
+
     def submit_order(self, orders_request):
         url = f"{self.get_base_url()}/v1/orders/"
         headers = self.get_http_headers()
-        response = requests.post(url, headers=headers, json=orders_request)
-        if response.status_code in (401, 403):
-            self.logger.info("Expired access token detected, re-initializing token...")
-            self.init_token()
-            headers = self.get_http_headers()
-            response = requests.post(url, headers=headers, json=orders_request)
+        try:
+            with self.metrics.span("http.submit_order"):
+                response = self.transport.post(url, "orders", headers=headers, json=orders_request, metrics=self.metrics)
+                if response.status_code in (401, 403):
+                    headers = self.reset_token(headers)
+                    response = self.transport.post(url, "orders", headers=headers, json=orders_request, metrics=self.metrics)
+        finally:
+            # Even a failed submission may have moved cash, so a cached balance must not size the next bids
+            self.response_cache.invalidate("accounts", "orders")
         if not response.ok:
             self.logger.error(f"Error submitting order: {response.status_code}, Response: {response.text}")
-            self.logger.debug(f"Request data: {orders_request}")
+            self.diagnostics.dump("Request data", lambda: orders_request)
             raise Exception(f"Error submitting order: {response.status_code}")
         return from_dict(data_class=OrdersResponse, data=response.json(), config=Config(strict=False))
+
+
+def response_bytes(response):
+    # Bytes read off the wire, before gzip decoding, when the underlying urllib3 response is available
+    try:
+        return response.raw.tell()
+    except (AttributeError, TypeError):
+        return len(response.content or b"")
+
+
+def page_result(page):
+    # (result, total_count) of an entity page or a raw JSON page
+    if isinstance(page, dict):
+        return page.get("result"), page.get("total_count")
+    return page.result, page.total_count
+
+
+def parse_order_date(order_date):
+    if not order_date:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S %z", "%Y-%m-%dT%H:%M:%S%z"):
+        try:
+            return datetime.strptime(order_date, fmt)
+        except ValueError:
+            pass
+    try:
+        parsed = datetime.fromisoformat(order_date)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def is_older_page(orders_list, oldest_order_date):
+    if oldest_order_date is None or not orders_list.result:
+        return False
+    for orders_response in orders_list.result:
+        order_date = parse_order_date(orders_response.order_date)
+        if order_date is None or order_date >= oldest_order_date:
+            return False
+    return True
@@ -0,0 +1,142 @@
+# service/rate_limiter.py
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class TokenBucket:
+    # Requests reserve a token and wait for it outside the lock, so concurrent callers are spaced out fairly.
+    # The rate adapts: halved on a 429, then raised back towards max_rate by a step per successful response.
+    def __init__(self, max_rate, burst, min_rate=0.1, recovery=0.05):
+        self.max_rate = float(max_rate)
+        self.rate = float(max_rate)
+        self.burst = float(burst)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.recovery = recovery
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        # Returns the seconds waited
+        with self.lock:
+            self.refill(time.monotonic())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self):
+        with self.lock:
+            self.refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive failures and fails fast until reset_timeout has passed, then
+    # lets a single trial request through: success closes the circuit, failure opens it again.
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.trial_in_flight = False
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+
+
+class EndpointGovernor:
+    # Token bucket, circuit breaker and counters for one endpoint family
+    def __init__(self, endpoint, rate, burst, failure_threshold, reset_timeout):
+        self.endpoint = endpoint
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.counters = {"requests": 0, "throttled": 0, "retries": 0, "failures": 0, "rejected": 0, "wait_seconds": 0.0}
+        self.lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["rate"] = round(self.bucket.rate, 3)
+        stats["max_rate"] = self.bucket.max_rate
+        stats["circuit"] = self.breaker.state
+        return stats
+
+
+def backoff_seconds(attempt, base, cap):
+    # Full jitter: uniform between zero and the capped exponential backoff
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after_seconds(value):
+    # Retry-After is either delay seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limits(value):
+    # "listings=2:4,orders=5" -> {"listings": (2.0, 4.0), "orders": (5.0, None)}
+    rate_limits = dict()
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        endpoint, limit = item.split("=", 1)
+        rate, _, burst = limit.partition(":")
+        rate_limits[endpoint.strip()] = (float(rate), float(burst) if burst else None)
+    return rate_limits
@@ -0,0 +1,79 @@
+# service/response_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass
+class CachedResponse:
+    endpoint: str
+    value: Any  # the decoded entity, shared by every hit and never mutated
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+class ResponseCache:
+    # Decoded entities by URL with a TTL per endpoint and LRU eviction past max_entries. Entries past their TTL
+    # are kept for conditional revalidation with ETag/Last-Modified. Endpoints without a TTL are not cached.
+    def __init__(self, ttls, max_entries=256):
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def enabled(self, endpoint):
+        return endpoint in self.ttls and self.max_entries > 0
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+            return entry
+
+    def is_fresh(self, entry):
+        return time.monotonic() - entry.stored_at < self.ttls.get(entry.endpoint, 0)
+
+    def put(self, url, endpoint, value, etag=None, last_modified=None):
+        with self.lock:
+            self.entries[url] = CachedResponse(endpoint, value, etag, last_modified, time.monotonic())
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def touch(self, url):
+        # A 304 revalidated the entry, its TTL starts over
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                entry.stored_at = time.monotonic()
+
+    def invalidate(self, *endpoints):
+        with self.lock:
+            for url in [url for url, entry in self.entries.items() if entry.endpoint in endpoints]:
+                del self.entries[url]
+
+
+def conditional_headers(entry):
+    headers = dict()
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+def parse_ttls(value):
+    # "accounts=0,orders=30" -> {"accounts": 0.0, "orders": 30.0}
+    ttls = dict()
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        endpoint, ttl = item.split("=", 1)
+        ttls[endpoint.strip()] = float(ttl)
+    return ttls
@@ -0,0 +1,105 @@
+# service/seen_listing_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict
+
+from service.sqlite_store import create_with_fallback, sqlite_connect
+
+
+def filter_sets_hash(filter_set_list):
+    payload = json.dumps([asdict(filter_set) for filter_set in filter_set_list], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SeenListingCache:
+    # Listings that matched none of the filter sets, keyed by listing_number with the last_updated_date they
+    # were rejected at. A listing is skipped before decoding while it is unchanged, the entry is younger than
+    # the TTL and the filter sets hash is unchanged. The watermark is the newest last_updated_date seen;
+    # anything newer is known to be new or changed without a cache lookup.
+    def __init__(self, filter_hash, ttl, path=None):
+        self.filter_hash = filter_hash
+        self.ttl = ttl
+        self.path = path
+        self.entries = {}  # listing_number -> (last_updated_date, seen_at)
+        self.watermark = None
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        if path is not None:
+            self.load()
+
+    def load(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with sqlite_connect(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS seen_listings (listing_number INTEGER PRIMARY KEY, last_updated_date TEXT, seen_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS cache_state (key TEXT PRIMARY KEY, value TEXT)")
+            state = dict(connection.execute("SELECT key, value FROM cache_state"))
+            if state.get("filter_hash") != self.filter_hash:
+                if state.get("filter_hash") is not None:
+                    self.logger.info("Filter sets changed, clearing seen listing cache")
+                connection.execute("DELETE FROM seen_listings")
+                connection.execute("DELETE FROM cache_state")
+                connection.execute("INSERT INTO cache_state VALUES ('filter_hash', ?)", (self.filter_hash,))
+                return
+            connection.execute("DELETE FROM seen_listings WHERE seen_at < ?", (time.time() - self.ttl,))
+            self.entries = {
+                row[0]: (row[1], row[2])
+                for row in connection.execute("SELECT listing_number, last_updated_date, seen_at FROM seen_listings")
+            }
+            self.watermark = state.get("watermark")
+
+    def unseen(self, records):
+        expired_before = time.time() - self.ttl
+        kept = list()
+        with self.lock:
+            for record in records:
+                last_updated_date = record.get("last_updated_date")
+                if self.watermark is None or last_updated_date is None or last_updated_date > self.watermark:
+                    kept.append(record)
+                    continue
+                entry = self.entries.get(record.get("listing_number"))
+                if entry is None or entry[0] != last_updated_date or entry[1] < expired_before:
+                    kept.append(record)
+        return kept
+
+    def record_rejected(self, records):
+        now = time.time()
+        rows = [(r.get("listing_number"), r.get("last_updated_date"), now) for r in records if r.get("listing_number") is not None]
+        dates = [r.get("last_updated_date") for r in records if r.get("last_updated_date")]
+        with self.lock:
+            for listing_number, last_updated_date, seen_at in rows:
+                self.entries[listing_number] = (last_updated_date, seen_at)
+            if dates:
+                self.watermark = max([self.watermark] + dates) if self.watermark else max(dates)
+            self.entries = {k: v for k, v in self.entries.items() if v[1] >= now - self.ttl}
+        if self.path is not None:
+            with sqlite_connect(self.path) as connection:
+                connection.executemany("INSERT OR REPLACE INTO seen_listings VALUES (?, ?, ?)", rows)
+                connection.execute("DELETE FROM seen_listings WHERE seen_at < ?", (now - self.ttl,))
+                if self.watermark is not None:
+                    connection.execute("INSERT OR REPLACE INTO cache_state VALUES ('watermark', ?)", (self.watermark,))
+
+
+_memory_seen_listing_caches = {}
+
+
+def create_seen_listing_cache(prosper_config):
+    filter_hash = filter_sets_hash(prosper_config.filter_set_properties.filter_set_list)
+    ttl = prosper_config.seen_listing_ttl
+
+    def create_memory_cache():
+        return _memory_seen_listing_caches.setdefault((prosper_config.state_dir, filter_hash), SeenListingCache(filter_hash, ttl))
+
+    if prosper_config.seen_listing_cache == "sqlite":
+        return create_with_fallback(
+            "SQLite seen listing cache",
+            lambda: SeenListingCache(filter_hash, ttl, os.path.join(prosper_config.state_dir, "seen_listings.sqlite3")),
+            create_memory_cache,
+        )
+    return create_memory_cache()
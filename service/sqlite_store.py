@@ -0,0 +1,26 @@
+# service/sqlite_store.py
+#
+# Shared by the SQLite state stores under the state dir: the bid ledger, seen listing cache, note cache and lock store.
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+
+@contextmanager
+def sqlite_connect(path):
+    # One transaction per connection, committed when the block succeeds and rolled back when it raises
+    connection = sqlite3.connect(path, timeout=5)
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def create_with_fallback(description, create_store, create_fallback):
+    # The store, or the in-memory fallback when the state dir cannot hold it, so a broken state dir never stops buying
+    try:
+        return create_store()
+    except (sqlite3.Error, OSError) as e:
+        logging.getLogger(__name__).warning(f"{description} unavailable, using the in-memory one: {e}")
+    return create_fallback()
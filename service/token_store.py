@@ -0,0 +1,83 @@
+# service/token_store.py
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+
+class MemoryTokenStore:
+    def __init__(self):
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def load(self, key):
+        with self.lock:
+            token = self.tokens.get(key)
+            return dict(token) if token is not None else None
+
+    def save(self, key, token):
+        with self.lock:
+            self.tokens[key] = dict(token)
+
+    def delete(self, key):
+        with self.lock:
+            self.tokens.pop(key, None)
+
+
+class FileTokenStore:
+    # Tokens are kept in a single JSON file readable only by the owner; writes are atomic renames so
+    # concurrent instances sharing the file never read a partial token
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def read_all(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable token store {self.path}: {e}")
+            return {}
+
+    def write_all(self, tokens):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".token-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(tokens, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, key):
+        with self.lock:
+            return self.read_all().get(key)
+
+    def save(self, key, token):
+        with self.lock:
+            tokens = self.read_all()
+            tokens[key] = token
+            self.write_all(tokens)
+
+    def delete(self, key):
+        with self.lock:
+            tokens = self.read_all()
+            if tokens.pop(key, None) is not None:
+                self.write_all(tokens)
+
+
+_memory_token_store = MemoryTokenStore()
+
+
+def create_token_store(prosper_config):
+    if prosper_config.token_store == "file":
+        return FileTokenStore(os.path.join(prosper_config.state_dir, "oauth_tokens.json"))
+    return _memory_token_store
@@ -0,0 +1,25 @@
+# tests/conftest.py
+
+import pytest
+
+from benchmark.stub_server import ProsperStandIn
+from benchmark.synthetic import make_listings_payload
+
+
+@pytest.fixture
+def stand_in():
+    with ProsperStandIn(make_listings_payload(500)) as stand_in:
+        yield stand_in
+
+
+@pytest.fixture
+def prosper_env(monkeypatch, tmp_path, stand_in):
+    # ProsperConfig reads the environment when it is created, so every test gets its own state dir and stand-in
+    monkeypatch.setenv("PROSPER_BASE_URL", stand_in.base_url)
+    monkeypatch.setenv("PROSPER_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setenv("RUN_MODE", "test")
+    monkeypatch.setenv("PROSPER_TOKEN_STORE", "memory")
+    monkeypatch.setenv("PROSPER_NOTIFICATION_SINK", "memory")
+    monkeypatch.setenv("PROSPER_PORTFOLIO_ANALYTICS", "false")
+    monkeypatch.setenv("PROSPER_METRICS_EXPORTER", "none")
+    return monkeypatch
@@ -0,0 +1,78 @@
+# tests/test_diagnostics.py
+
+import json
+import logging
+import os
+import tracemalloc
+from dataclasses import dataclass
+
+import numpy as np
+
+import service.diagnostics
+from service.diagnostics import Diagnostics, LazyJson
+
+
+@dataclass
+class Payload:
+    listing_number: int
+    amount: float
+
+
+class CountingPayload:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_dump_at_info_never_builds_the_payload():
+    logger = logging.getLogger("tests.diagnostics.info")
+    logger.setLevel(logging.INFO)
+    diagnostics = Diagnostics(logger)
+    payload = CountingPayload([Payload(i, 25.0) for i in range(1000)])
+
+    diagnostics.dump("Listings", payload)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for _ in range(1000):
+            diagnostics.dump("Listings", payload)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    assert payload.calls == 0
+    dump_filter = [tracemalloc.Filter(True, service.diagnostics.__file__)]
+    allocated = sum(stat.size_diff for stat in after.filter_traces(dump_filter).compare_to(before.filter_traces(dump_filter), "lineno"))
+    assert allocated <= 0
+
+
+def test_dump_at_debug_logs_the_payload_as_json(caplog):
+    logger = logging.getLogger("tests.diagnostics.debug")
+    caplog.set_level(logging.DEBUG, logger=logger.name)
+    diagnostics = Diagnostics(logger)
+
+    diagnostics.dump("Account information", lambda: {"account": Payload(1, 25.0), "scores": np.array([1, 2])})
+
+    assert len(caplog.records) == 1
+    label, lazy_json = caplog.records[0].args
+    assert label == "Account information"
+    assert isinstance(lazy_json, LazyJson)
+    expected = {"account": {"listing_number": 1, "amount": 25.0}, "scores": [1, 2]}
+    assert caplog.records[0].getMessage() == f"Account information: {json.dumps(expected, indent=4)}"
+
+
+def test_dump_with_snapshot_dir_writes_compact_json(tmp_path):
+    logger = logging.getLogger("tests.diagnostics.snapshot")
+    logger.setLevel(logging.INFO)
+    diagnostics = Diagnostics(logger, str(tmp_path))
+
+    diagnostics.dump("Trimmed listings", lambda: [Payload(7, 25.0)])
+
+    [name] = os.listdir(tmp_path)
+    assert name.endswith("-trimmed-listings.json")
+    with open(tmp_path / name) as f:
+        assert f.read() == '[{"listing_number":7,"amount":25.0}]'
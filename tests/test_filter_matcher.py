@@ -0,0 +1,139 @@
+# tests/test_filter_matcher.py
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from model.filter_matcher import FilterMatcher
+from model.filterset import (
+    FilterSet,
+    check_delinquencies,
+    check_employment_length,
+    check_grade,
+    check_inquiries,
+    check_payment_income_ratio,
+)
+from model.listing_batch import PROSPER_RATINGS, ListingBatch
+
+MISSING = (None, math.nan)
+
+
+def baseline_match(filter_set, record):
+    # The per-listing filter_listings condition the matcher replaced. A None field raised a TypeError there,
+    # the matcher treats it as not matching.
+    bureau = record.get("credit_bureau_values_transunion_indexed")
+    try:
+        return bool(
+            check_grade(filter_set, record.get("prosper_rating"))
+            and check_employment_length(filter_set, record.get("months_employed"))
+            and bureau is not None
+            and check_inquiries(filter_set, bureau.get("g980s_inquiries_in_the_last_6_months"))
+            and check_delinquencies(filter_set, bureau.get("g218b_number_of_delinquent_accounts"))
+            and record.get("stated_monthly_income") > 0
+            and check_payment_income_ratio(filter_set, record.get("listing_monthly_payment"), record.get("stated_monthly_income"))
+        )
+    except TypeError:
+        return False
+
+
+def baseline_filter(filter_sets, records, max_loan_count):
+    # Rows in the order the per-filter-set loop added them, each with the first filter set that matched it
+    matched = dict()
+    for filter_set_index, filter_set in enumerate(filter_sets):
+        if filter_set.loan_count_over <= max_loan_count:
+            for row, record in enumerate(records):
+                if row not in matched and baseline_match(filter_set, record):
+                    matched[row] = filter_set_index
+    return list(matched), list(matched.values())
+
+
+def maybe_missing(rng, value):
+    return rng.choice(MISSING) if rng.random() < 0.1 else value
+
+
+def make_record(rng, listing_number):
+    record = {
+        "listing_number": listing_number,
+        "prosper_rating": rng.choice(PROSPER_RATINGS + (None, "N/A")),
+        "months_employed": maybe_missing(rng, rng.choice([0, 11, 12, 24, 25, 60, 120.5])),
+        "stated_monthly_income": maybe_missing(rng, rng.choice([-100, 0, 1500, 4000, 4000.25, 12000])),
+        "listing_monthly_payment": maybe_missing(rng, rng.choice([0, 100, 250.75, 400, 1200])),
+    }
+    if rng.random() < 0.9:
+        bureau = {
+            "g980s_inquiries_in_the_last_6_months": maybe_missing(rng, rng.randint(0, 6)),
+            "g218b_number_of_delinquent_accounts": maybe_missing(rng, rng.randint(0, 4)),
+        }
+        if rng.random() < 0.05:
+            del bureau["g218b_number_of_delinquent_accounts"]
+        record["credit_bureau_values_transunion_indexed"] = bureau
+    elif rng.random() < 0.5:
+        record["credit_bureau_values_transunion_indexed"] = None
+    return record
+
+
+def maybe_none(rng, value):
+    return None if rng.random() < 0.03 else value
+
+
+def make_filter_set(rng):
+    grades = rng.sample(PROSPER_RATINGS + ("X",), rng.randint(2, 7))
+    return FilterSet(
+        grades=maybe_none(rng, rng.choice([",", ", "]).join(grades)),
+        employment_length_over=maybe_none(rng, rng.randint(0, 2)),
+        inquiries_under=maybe_none(rng, rng.randint(2, 6)),
+        delinquencies_under=maybe_none(rng, rng.randint(1, 4)),
+        payment_income_ratio_under=maybe_none(rng, rng.choice([0.0625, 0.1, 0.25, 0.5])),
+        loan_count_over=rng.choice([0, 1, 5, 10, 40]),
+    )
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("max_loan_count", [0, 5, 40])
+def test_matcher_agrees_with_the_per_listing_filter(seed, max_loan_count):
+    rng = random.Random(seed)
+    records = [make_record(rng, listing_number) for listing_number in range(400)]
+    filter_sets = [make_filter_set(rng) for _ in range(rng.randint(1, 6))]
+
+    filter_match = FilterMatcher(filter_sets).match(ListingBatch(records, len(records), len(records)), max_loan_count)
+
+    rows, filter_set_indexes = baseline_filter(filter_sets, records, max_loan_count)
+    assert filter_match.rows.tolist() == rows
+    assert filter_match.filter_sets.tolist() == filter_set_indexes
+    assert np.flatnonzero(filter_match.candidates).tolist() == sorted(baseline_filter(filter_sets, records, math.inf)[0])
+
+
+def test_loan_count_over_gates_filter_sets():
+    record = {
+        "listing_number": 1,
+        "prosper_rating": "A",
+        "months_employed": 60,
+        "stated_monthly_income": 5000,
+        "listing_monthly_payment": 100,
+        "credit_bureau_values_transunion_indexed": {
+            "g980s_inquiries_in_the_last_6_months": 0,
+            "g218b_number_of_delinquent_accounts": 0,
+        },
+    }
+    batch = ListingBatch([record], 1, 1)
+    filter_set = FilterSet(grades="A", employment_length_over=1, inquiries_under=1, delinquencies_under=1,
+                           payment_income_ratio_under=0.1, loan_count_over=5)
+    matcher = FilterMatcher([filter_set])
+
+    assert len(matcher.match(batch, 4)) == 0
+    assert matcher.match(batch, 5).rows.tolist() == [0]
+    assert matcher.match(batch, 4).candidates.tolist() == [True]
+
+
+def test_rating_bitmask_covers_every_grade():
+    records = [{"listing_number": i, "prosper_rating": rating, "months_employed": 60, "stated_monthly_income": 5000,
+                "listing_monthly_payment": 100, "credit_bureau_values_transunion_indexed": {
+                    "g980s_inquiries_in_the_last_6_months": 0, "g218b_number_of_delinquent_accounts": 0}}
+               for i, rating in enumerate(PROSPER_RATINGS + (None, "Z"))]
+    batch = ListingBatch(records, len(records), len(records))
+    for rating in PROSPER_RATINGS:
+        filter_set = FilterSet(grades=f"Z, {rating}", employment_length_over=1, inquiries_under=1,
+                               delinquencies_under=1, payment_income_ratio_under=0.1, loan_count_over=0)
+        assert FilterMatcher([filter_set]).match(batch, 0).rows.tolist() == [PROSPER_RATINGS.index(rating)]
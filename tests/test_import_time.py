@@ -0,0 +1,30 @@
+# tests/test_import_time.py
+#
+# Import time budget of the Cloud Function entry point. PROSPER_IMPORT_BUDGET_MS overrides the budget, and
+# pytest -s prints the slowest direct imports.
+
+import json
+import os
+
+from benchmark.import_time import measure_imports
+
+IMPORT_BUDGET_MS = float(os.environ.get("PROSPER_IMPORT_BUDGET_MS", 1500))
+
+# Imported on first use only, never on the cold start path
+LAZY_MODULES = ("google.cloud.logging", "sendgrid", "yaml")
+
+
+def test_main_import_stays_within_budget(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROSPER_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setenv("PROSPER_TOKEN_STORE", "memory")
+    monkeypatch.delenv("K_SERVICE", raising=False)
+
+    imports = measure_imports("main")
+
+    total = next(i for i in reversed(imports) if i["module"] == "main")
+    direct = sorted((i for i in imports if i["depth"] == 1), key=lambda i: i["cumulative_ms"], reverse=True)
+    report = {"total_ms": total["cumulative_ms"], "budget_ms": IMPORT_BUDGET_MS, "top": direct[:10]}
+    print(json.dumps(report, indent=2))
+    imported = {i["module"] for i in imports}
+    assert not [module for module in LAZY_MODULES if module in imported]
+    assert total["cumulative_ms"] <= IMPORT_BUDGET_MS, json.dumps(report, indent=2)
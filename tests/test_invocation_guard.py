@@ -0,0 +1,114 @@
+# tests/test_invocation_guard.py
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from config.prosper_config import ProsperConfig
+from service.invocation_guard import InvocationGuard
+from service.lock_store import FileLockStore, MemoryLockStore, SqliteLockStore
+
+
+@pytest.fixture(params=["memory", "file", "sqlite"])
+def lock_store(request, tmp_path):
+    if request.param == "file":
+        return FileLockStore(str(tmp_path / "locks.json"))
+    if request.param == "sqlite":
+        return SqliteLockStore(str(tmp_path / "locks.sqlite3"))
+    return MemoryLockStore()
+
+
+def create_guard(lock_store, **settings):
+    prosper_config = ProsperConfig()
+    prosper_config.lease_seconds = 0.2
+    prosper_config.message_dedup_seconds = 60
+    for name, value in settings.items():
+        setattr(prosper_config, name, value)
+    return InvocationGuard(prosper_config, lock_store)
+
+
+def test_lease_is_exclusive_until_released_or_expired(lock_store):
+    assert lock_store.acquire("buy_notes", "a", 0.2)
+    assert not lock_store.acquire("buy_notes", "b", 0.2)
+    assert lock_store.acquire("buy_notes", "a", 0.2)
+    lock_store.release("buy_notes", "b")
+    assert not lock_store.acquire("buy_notes", "b", 0.2)
+    time.sleep(0.25)
+    assert lock_store.acquire("buy_notes", "b", 0.2)
+
+
+def test_claim_of_an_unfinished_run_expires_with_the_lease(lock_store):
+    guard = create_guard(lock_store)
+    assert guard.claim_message("message-1")
+    assert not guard.claim_message("message-1")
+    # The instance died before confirming, so the redelivery runs once the lease time has passed
+    time.sleep(0.25)
+    assert guard.claim_message("message-1")
+
+
+def test_confirmed_message_stays_claimed_for_the_dedup_time(lock_store):
+    guard = create_guard(lock_store)
+    assert guard.claim_message("message-1")
+    guard.confirm_message("message-1")
+    time.sleep(0.25)
+    assert not guard.claim_message("message-1")
+    guard.release_message("message-1")
+    assert guard.claim_message("message-1")
+
+
+def test_concurrent_runs_join_the_one_in_progress():
+    guard = create_guard(MemoryLockStore(), lease_seconds=30)
+    started = threading.Event()
+    release = threading.Event()
+    calls = list()
+
+    def run():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "done"
+
+    results = list()
+    leader = threading.Thread(target=lambda: results.append(guard.run("buy_notes", run)))
+    leader.start()
+    started.wait(5)
+    joiner = threading.Thread(target=lambda: results.append(guard.run("buy_notes", run)))
+    joiner.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    joiner.join(5)
+
+    assert calls == [1]
+    assert results == ["done", "done"]
+
+
+@pytest.mark.parametrize("single_flight", [True, False])
+def test_run_is_skipped_while_another_instance_holds_the_lease(lock_store, single_flight):
+    guard = create_guard(lock_store, lease_seconds=30, single_flight=single_flight)
+    assert lock_store.acquire(guard.key("buy_notes"), "other-instance", 30)
+
+    assert guard.run(guard.key("buy_notes"), lambda: "ran") is None
+
+    lock_store.release(guard.key("buy_notes"), "other-instance")
+    assert guard.run(guard.key("buy_notes"), lambda: "ran") == "ran"
+
+
+def test_main_imports_with_an_unwritable_state_dir(tmp_path):
+    # A state dir below a regular file cannot be created, every store falls back to memory
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    env = dict(os.environ, PROSPER_STATE_DIR=str(blocker / "state"), PROSPER_LOCK_STORE="sqlite")
+    env.pop("K_SERVICE", None)
+    result = subprocess.run(
+        [sys.executable, "-c", "import main; print(type(main.invocation_guard.lock_store).__name__)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env, capture_output=True, text=True, timeout=60,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "MemoryLockStore"
+    assert "lock store unavailable" in result.stderr
@@ -0,0 +1,35 @@
+# tests/test_listing_archive.py
+
+import numpy as np
+
+from benchmark.synthetic import make_listings_payload
+from model.listing_batch import ListingBatch
+from service.listing_archive import ListingArchive
+
+
+def make_batch(start, stop):
+    payload = make_listings_payload(stop)
+    records = payload["result"][start:stop]
+    return ListingBatch(records, len(records), len(records))
+
+
+def test_append_stores_each_listing_once(tmp_path):
+    archive = ListingArchive(str(tmp_path))
+    assert archive.append(make_batch(0, 100)) == 100
+    # Overlapping and out of order listings, only the unseen ones are added
+    assert archive.append(make_batch(50, 150)) == 50
+    assert archive.append(make_batch(20, 60)) == 0
+
+    reopened = ListingArchive(str(tmp_path))
+    assert reopened.append(make_batch(140, 160)) == 10
+    listing_numbers = np.array(ListingArchive(str(tmp_path)).read_column("listing_number"))
+    assert len(listing_numbers) == 160
+    assert len(np.unique(listing_numbers)) == 160
+
+
+def test_is_archived_tracks_appends_in_memory(tmp_path):
+    archive = ListingArchive(str(tmp_path))
+    batch = make_batch(0, 10)
+    assert not archive.is_archived(batch.listing_number).any()
+    archive.append(make_batch(0, 5))
+    assert archive.is_archived(batch.listing_number).tolist() == [True] * 5 + [False] * 5
@@ -0,0 +1,102 @@
+# tests/test_listing_stream.py
+
+import json
+
+import pytest
+
+from service.listing_stream import iter_json_array_items
+
+PAYLOAD = {
+    "result_count": 3,
+    "meta": {"note": "a } in a string, a ] too", "nested": [{"x": [1, {"y": None}]}]},
+    "result": [
+        {"listing_number": 123456, "title": "Quote \" and backslash \\ and \\\" together", "rate": 0.1875},
+        {"listing_number": -7, "title": "Unicode éè ☃ \U0001f600 and \\u escapes", "tags": [], "empty": {}},
+        {"listing_number": 9, "bureau": {"inquiries": [0, 1e-3, 12E+2], "flags": [True, False, None]}, "text": "[{,:}]"},
+    ],
+    "total_count": 1234567890,
+}
+
+
+def encode(payload, separators=(",", ":")):
+    return json.dumps(payload, ensure_ascii=False, separators=separators).encode("utf-8")
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def parse(chunks, array_key="result"):
+    fields = dict()
+    items = list(iter_json_array_items(chunks, array_key, fields))
+    return items, fields
+
+
+@pytest.mark.parametrize("separators", [(",", ":"), (", ", ": ")])
+def test_every_chunk_size_parses_like_json_loads(separators):
+    data = encode(PAYLOAD, separators)
+    expected_fields = {key: value for key, value in PAYLOAD.items() if key != "result"}
+    # Chunk size 1 splits every string, escape sequence and multi-byte UTF-8 character
+    for size in range(1, len(data) + 1):
+        items, fields = parse(chunked(data, size))
+        assert items == PAYLOAD["result"], size
+        assert fields == expected_fields, size
+
+
+def test_items_are_yielded_before_the_array_ends():
+    data = encode(PAYLOAD)
+    second_item_end = data.index(b'"tags":[],"empty":{}}') + len(b'"tags":[],"empty":{}}')
+    fields = dict()
+    items = iter_json_array_items(iter([data[:second_item_end + 1], data[second_item_end + 1:]]), "result", fields)
+
+    assert [next(items), next(items)] == PAYLOAD["result"][:2]
+    assert "total_count" not in fields
+    assert list(items) == PAYLOAD["result"][2:]
+    assert fields["total_count"] == 1234567890
+
+
+def test_str_chunks_and_whitespace_are_accepted():
+    text = ' \n{ "result" : [ 1 , 2.5 , "three" ] ,\t"result_count" : 3 }\r\n'
+    items, fields = parse([text[i:i + 3] for i in range(0, len(text), 3)])
+
+    assert items == [1, 2.5, "three"]
+    assert fields == {"result_count": 3}
+
+
+def test_missing_or_null_array_yields_nothing():
+    assert parse([b'{"result_count": 0}']) == ([], {"result_count": 0})
+    assert parse([b'{"result": null, "result_count": 0}']) == ([], {"result": None, "result_count": 0})
+    assert parse([b'{"result": []}']) == ([], {})
+
+
+def test_other_arrays_are_kept_as_fields():
+    items, fields = parse([b'{"other": [1, 2], "result": [3]}'])
+
+    assert items == [3]
+    assert fields == {"other": [1, 2]}
+
+
+@pytest.mark.parametrize("cut", range(1, len(encode(PAYLOAD))))
+def test_truncated_input_raises(cut):
+    data = encode(PAYLOAD)[:cut]
+    with pytest.raises(ValueError):
+        parse(chunked(data, 7))
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"[1, 2]",
+    b'{"result": [1]} {}',
+    b'{"result" 1}',
+    b'{"result": [1 2]}',
+    b'{"result": [1,, 2]}',
+    b'{"result": [, 1]}',
+    b'{"result": [1,]}',
+    b'{"a": 1 "result": []}',
+    b'{, "a": 1}',
+    b'{"a": 1,}',
+    b'{"a": 1,, "b": 2}',
+])
+def test_malformed_input_raises(data):
+    with pytest.raises(ValueError):
+        parse([data])
@@ -0,0 +1,57 @@
+# tests/test_metrics.py
+
+import pytest
+
+from service.metrics import InMemoryExporter, Metrics
+
+
+def test_invocation_exports_one_summary_with_spans_and_counters():
+    exporter = InMemoryExporter()
+    metrics = Metrics([exporter])
+
+    for duration_ms in (10.0, 20.0, 30.0):
+        with metrics.invocation("buy_notes"):
+            metrics.record_span("http.listings", duration_ms / 1000)
+            metrics.increment("listings_decoded", 500)
+            metrics.increment("listings_decoded", 250)
+
+    assert len(exporter.summaries) == 3
+    summary = exporter.summaries[-1]
+    assert summary["invocation"] == "buy_notes"
+    assert summary["status"] == "ok"
+    assert summary["counters"] == {"listings_decoded": 750}
+    assert summary["spans"]["http.listings"]["count"] == 1
+    assert exporter.stage_durations("http.listings") == pytest.approx([10.0, 20.0, 30.0])
+    assert exporter.percentile("http.listings", 50) == pytest.approx(20.0)
+    assert exporter.percentile("filter", 50) is None
+
+
+def test_failed_invocation_is_exported_with_error_status():
+    exporter = InMemoryExporter()
+    metrics = Metrics([exporter])
+
+    with pytest.raises(ValueError):
+        with metrics.invocation("account_summary"):
+            with metrics.span("http.accounts"):
+                raise ValueError("boom")
+
+    assert exporter.summaries[0]["status"] == "error"
+    assert exporter.summaries[0]["spans"]["http.accounts"]["count"] == 1
+
+
+def test_gauges_and_scoped_metrics_land_in_the_summary():
+    exporter = InMemoryExporter()
+    metrics = Metrics([exporter])
+    metrics.register_gauge("http", lambda: {"requests": 3})
+    metrics.register_gauge("broken", lambda: 1 / 0)
+    scoped = metrics.scoped("alice.")
+
+    with metrics.invocation("buy_notes"):
+        scoped.increment("listings_trimmed", 2)
+        with scoped.span("filter"):
+            pass
+
+    summary = exporter.summaries[0]
+    assert summary["gauges"] == {"http": {"requests": 3}}
+    assert summary["counters"] == {"alice.listings_trimmed": 2}
+    assert "alice.filter" in summary["spans"]
@@ -0,0 +1,51 @@
+# tests/test_multi_account_notes_service.py
+
+from config.prosper_config import ProsperConfig
+from service.multi_account_notes_service import create_notes_service
+from service.seen_listing_cache import filter_sets_hash
+
+
+def test_incremental_listings_use_the_filter_sets_of_every_account(prosper_env, stand_in):
+    prosper_env.setenv("PROSPER_ACCOUNTS", "alice,bob")
+    prosper_env.setenv("PROSPER_INCREMENTAL_LISTINGS", "true")
+    prosper_env.setenv("PROSPER_SEEN_LISTING_CACHE", "memory")
+    prosper_config = ProsperConfig()
+
+    notes_service = create_notes_service(prosper_config)
+
+    account_filter_sets = [
+        filter_set
+        for account_service in notes_service.account_services.values()
+        for filter_set in account_service.prosper_config.filter_set_properties.filter_set_list
+    ]
+    assert prosper_config.filter_set_properties.filter_set_list == account_filter_sets
+    assert notes_service.seen_listing_cache.filter_hash == filter_sets_hash(account_filter_sets)
+
+    notes_service.buy_notes()
+    listings_requests = [path for method, path in stand_in.requests if path.startswith("/listingsvc")]
+    assert len(listings_requests) == 1
+
+
+def test_listings_are_archived_and_cached_after_every_account_ordered(prosper_env, stand_in):
+    prosper_env.setenv("RUN_MODE", "prod")
+    prosper_env.setenv("PROSPER_ACCOUNTS", "alice,bob")
+    prosper_env.setenv("PROSPER_INCREMENTAL_LISTINGS", "true")
+    prosper_env.setenv("PROSPER_LISTING_ARCHIVE", "true")
+    notes_service = create_notes_service(ProsperConfig())
+    orders_when_recorded = list()
+    append = notes_service.listing_archive.append
+    record_rejected = notes_service.seen_listing_cache.record_rejected
+
+    def recording(record):
+        def wrapper(*args):
+            orders_when_recorded.append(len(stand_in.submitted_orders))
+            return record(*args)
+        return wrapper
+
+    notes_service.listing_archive.append = recording(append)
+    notes_service.seen_listing_cache.record_rejected = recording(record_rejected)
+    notes_service.buy_notes()
+
+    assert stand_in.submitted_orders
+    assert orders_when_recorded == [len(stand_in.submitted_orders)] * 2
+    assert notes_service.listing_archive.row_count == 500
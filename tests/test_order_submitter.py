@@ -0,0 +1,51 @@
+# tests/test_order_submitter.py
+
+import time
+
+import pytest
+
+from config.prosper_config import ProsperConfig
+from model.orders import OrdersResponse
+from service.bid_ledger import MemoryBidLedger, SqliteBidLedger
+from service.order_submitter import OrderSubmitter, chunk_bid_requests
+
+
+class FailingChunkRestService:
+    # Accepts every chunk except the ones containing failing_listing_id, which fail as a read timeout would
+    def __init__(self, failing_listing_id):
+        self.failing_listing_id = failing_listing_id
+
+    def submit_order(self, orders_request):
+        listing_ids = [bid["listing_id"] for bid in orders_request["bid_requests"]]
+        if self.failing_listing_id in listing_ids:
+            raise Exception("Error submitting order: 504")
+        return OrdersResponse(order_id=f"order-{listing_ids[0]}", order_status="IN_PROGRESS")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def bid_ledger(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteBidLedger(str(tmp_path / "bid_ledger.sqlite3"))
+    return MemoryBidLedger()
+
+
+def test_failed_chunk_stays_in_flight_until_the_next_reconcile(bid_ledger):
+    prosper_config = ProsperConfig()
+    prosper_config.order_submit_workers = 2
+    bid_ledger.reconcile({}, time.time())
+    assert not bid_ledger.is_stale(600)
+
+    bid_requests = [{"listing_id": listing_id, "bid_amount": 25.0} for listing_id in range(1, 5)]
+    submitter = OrderSubmitter(prosper_config, FailingChunkRestService(failing_listing_id=3), bid_ledger)
+    submission = submitter.submit(chunk_bid_requests(bid_requests, 2))
+
+    assert submission.submitted_listing_ids() == {1, 2}
+    assert len(submission.failures) == 1
+    assert bid_ledger.in_flight_listing_ids() == {1, 2, 3, 4}
+    assert bid_ledger.is_stale(600)
+
+    # The orders list shows the failed chunk was placed after all
+    bid_ledger.reconcile({3: "order-3", 4: "order-3"}, time.time())
+    assert {3, 4} <= bid_ledger.in_flight_listing_ids()
+    bid_ledger.reconcile({}, time.time())
+    assert bid_ledger.in_flight_listing_ids() == set()
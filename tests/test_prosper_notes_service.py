@@ -0,0 +1,94 @@
+# tests/test_prosper_notes_service.py
+
+import time
+
+from benchmark.synthetic import make_account, make_orders
+from config.prosper_config import ProsperConfig
+from service.multi_account_notes_service import create_notes_service
+
+
+def test_insufficient_cash_returns_without_waiting_for_listings_and_orders(prosper_env, stand_in):
+    prosper_env.setenv("RUN_MODE", "prod")
+    stand_in.account = make_account(available_cash_balance=10.0)
+    notes_service = create_notes_service(ProsperConfig())
+    stand_in.latency = {"listings": 1.0, "orders": 1.0}
+
+    started_at = time.perf_counter()
+    notes_service.buy_notes()
+
+    assert time.perf_counter() - started_at < 0.5
+    assert not stand_in.submitted_orders
+
+
+def test_insufficient_cash_still_archives_the_listings(prosper_env, stand_in):
+    prosper_env.setenv("RUN_MODE", "prod")
+    prosper_env.setenv("PROSPER_LISTING_ARCHIVE", "true")
+    stand_in.account = make_account(available_cash_balance=10.0)
+    notes_service = create_notes_service(ProsperConfig())
+
+    notes_service.buy_notes()
+
+    assert notes_service.listing_archive.row_count == 500
+    assert not stand_in.submitted_orders
+
+
+def test_failed_listings_fetch_does_not_fail_the_archive_only_run(prosper_env, stand_in):
+    prosper_env.setenv("RUN_MODE", "prod")
+    prosper_env.setenv("PROSPER_LISTING_ARCHIVE", "true")
+    stand_in.account = make_account(available_cash_balance=10.0)
+    notes_service = create_notes_service(ProsperConfig())
+
+    def fail(*args):
+        raise Exception("listings unavailable")
+
+    notes_service.prosper_rest_service.get_listings = fail
+    notes_service.buy_notes()
+
+    assert notes_service.listing_archive.row_count == 0
+
+
+def test_rejected_listings_are_cached_after_the_order_and_never_fail_it(prosper_env, stand_in):
+    prosper_env.setenv("RUN_MODE", "prod")
+    prosper_env.setenv("PROSPER_INCREMENTAL_LISTINGS", "true")
+    notes_service = create_notes_service(ProsperConfig())
+    orders_when_cached = list()
+
+    def record_rejected(records):
+        orders_when_cached.append(len(stand_in.submitted_orders))
+        raise Exception("seen listing cache unavailable")
+
+    notes_service.seen_listing_cache.record_rejected = record_rejected
+    notes_service.buy_notes()
+
+    assert stand_in.submitted_orders
+    assert orders_when_cached == [len(stand_in.submitted_orders)]
+
+
+def test_every_run_sees_the_bids_other_instances_placed(prosper_env, stand_in):
+    # Each instance has its own state dir, so only the orders list shows another instance's bids
+    notes_service = create_notes_service(ProsperConfig())
+    assert notes_service.get_in_flight_listing_ids() == set()
+
+    stand_in.orders = make_orders(1, 1, 500)
+
+    in_progress_ids = {bid["listing_id"] for bid in stand_in.orders[0]["bid_requests"]}
+    assert notes_service.get_in_flight_listing_ids() == in_progress_ids
+
+
+def test_fully_invested_polls_do_not_start_listings_or_orders_fetches(prosper_env, stand_in):
+    prosper_env.setenv("RUN_MODE", "prod")
+    stand_in.account = make_account(available_cash_balance=10.0)
+    notes_service = create_notes_service(ProsperConfig())
+
+    for _ in range(3):
+        notes_service.buy_notes()
+    time.sleep(0.3)
+
+    # Only the first run, which did not know the account was fully invested, started them
+    assert len([path for method, path in stand_in.requests if path.startswith("/listingsvc")]) <= 1
+    assert len([path for method, path in stand_in.requests if path.startswith("/v1/orders")]) <= 1
+    assert len([path for method, path in stand_in.requests if path.startswith("/v1/accounts")]) == 3
+
+    stand_in.account = make_account(available_cash_balance=1000.0)
+    notes_service.buy_notes()
+    assert stand_in.submitted_orders
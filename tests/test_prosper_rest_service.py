@@ -0,0 +1,29 @@
+# tests/test_prosper_rest_service.py
+
+from config.filterset_loader import load_filterset_properties
+from config.prosper_config import ProsperConfig
+from model.filter_matcher import FilterMatcher
+from service.metrics import Metrics
+from service.prosper_rest_service import ProsperRestService
+
+
+def get_pushdown_listings(prosper_env, stream):
+    prosper_env.setenv("PROSPER_LISTING_PUSHDOWN", "true")
+    prosper_env.setenv("PROSPER_STREAM_LISTINGS", "true" if stream else "false")
+    prosper_config = ProsperConfig()
+    prosper_config.filter_set_properties = load_filterset_properties(prosper_config.filterset_file)
+    filter_matcher = FilterMatcher(prosper_config.filter_set_properties.filter_set_list)
+    metrics = Metrics()
+    listings = ProsperRestService(prosper_config, metrics=metrics).get_listings(filter_matcher=filter_matcher)
+    return listings, filter_matcher, metrics
+
+
+def test_pushdown_streams_each_query_when_stream_listings_is_set(prosper_env):
+    listings, filter_matcher, metrics = get_pushdown_listings(prosper_env, stream=False)
+    streamed, _, streamed_metrics = get_pushdown_listings(prosper_env, stream=True)
+
+    assert streamed_metrics.counters["pushdown_queries"] > 0
+    # Streaming keeps only the candidates, which are exactly the pushdown listings some filter set matches
+    matched = listings.listing_number[filter_matcher.match(listings, float("inf")).rows]
+    assert sorted(streamed.listing_number) == sorted(matched)
+    assert len(streamed) <= len(listings)
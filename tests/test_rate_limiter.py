@@ -0,0 +1,173 @@
+# tests/test_rate_limiter.py
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+import service.http_transport as http_transport
+import service.rate_limiter as rate_limiter
+from service.http_transport import HttpTransport
+from service.rate_limiter import CircuitBreaker, CircuitOpenError, TokenBucket, parse_rate_limits, retry_after_seconds
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Records the sleeps instead of sleeping
+    sleeps = list()
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_token_bucket_allows_the_burst_then_spaces_requests(sleeps):
+    bucket = TokenBucket(10, 2)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.01)
+    assert waits[3] == pytest.approx(0.2, abs=0.01)
+    assert sleeps == waits[2:]
+
+
+def test_token_bucket_halves_the_rate_when_throttled_and_recovers():
+    bucket = TokenBucket(10, 10, min_rate=3, recovery=0.1)
+
+    bucket.throttled()
+    assert bucket.rate == 5
+    bucket.throttled()
+    assert bucket.rate == 3
+    for _ in range(3):
+        bucket.succeeded()
+    assert bucket.rate == pytest.approx(6)
+    for _ in range(10):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_circuit_breaker_opens_after_consecutive_failures_and_lets_one_trial_through(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] += 30
+    assert breaker.allow()
+    assert breaker.state == "half_open" and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2", 2.0),
+    ("0.5", 0.5),
+    ("-3", 0.0),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_retry_after_seconds(value, expected):
+    assert retry_after_seconds(value) == expected
+
+
+def test_retry_after_seconds_reads_http_dates():
+    assert retry_after_seconds(formatdate(time.time() + 60, usegmt=True)) == pytest.approx(60, abs=2)
+    assert retry_after_seconds(formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("listings=2:4, orders=5,bogus") == {"listings": (2.0, 4.0), "orders": (5.0, None)}
+    assert parse_rate_limits(None) == {}
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    # Answers requests from a list of responses, raising the ones that are exceptions
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.headers = dict()
+        self.requests = list()
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def transport_sleeps(monkeypatch):
+    sleeps = list()
+    monkeypatch.setattr(http_transport.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def create_transport(responses, **kwargs):
+    session = FakeSession(responses)
+    return HttpTransport("http://prosper", session=session, **kwargs), session
+
+
+def test_transport_waits_for_retry_after_on_429(transport_sleeps):
+    transport, session = create_transport([FakeResponse(429, {"Retry-After": "3"}), FakeResponse(200)])
+
+    response = transport.get("http://prosper/v1/accounts/prosper", "accounts")
+
+    assert response.status_code == 200
+    assert transport_sleeps == [3.0]
+    assert len(session.requests) == 2
+    stats = transport.stats()["accounts"]
+    assert stats["throttled"] == 1 and stats["retries"] == 1
+    assert stats["rate"] < stats["max_rate"]
+
+
+def test_transport_caps_retry_after_at_the_backoff_max(transport_sleeps):
+    transport, _ = create_transport([FakeResponse(429, {"Retry-After": "120"}), FakeResponse(200)], backoff_max=10.0)
+
+    transport.get("http://prosper/v1/accounts/prosper", "accounts")
+
+    assert transport_sleeps == [10.0]
+
+
+def test_transport_retries_a_throttled_order_post_but_not_a_failed_one(transport_sleeps):
+    transport, session = create_transport([FakeResponse(429), FakeResponse(503), FakeResponse(200)])
+
+    response = transport.post("http://prosper/v1/orders/", "orders")
+
+    # A 429 was not processed and is resent, a 503 may have placed the order and is returned as is
+    assert response.status_code == 503
+    assert len(session.requests) == 2
+
+
+def test_transport_fails_fast_while_the_circuit_is_open(transport_sleeps):
+    transport, session = create_transport([FakeResponse(503)] * 2, max_retries=0, failure_threshold=2)
+
+    for _ in range(2):
+        assert transport.get("http://prosper/v1/notes/", "notes").status_code == 503
+    with pytest.raises(CircuitOpenError):
+        transport.get("http://prosper/v1/notes/", "notes")
+
+    assert len(session.requests) == 2
+    assert transport.stats()["notes"]["rejected"] == 1
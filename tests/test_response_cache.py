@@ -0,0 +1,89 @@
+# tests/test_response_cache.py
+
+import pytest
+
+import service.prosper_rest_service as prosper_rest_service
+from benchmark.synthetic import make_account
+from config.prosper_config import ProsperConfig
+from service.metrics import Metrics
+from service.prosper_rest_service import ProsperRestService
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    # Counts the entities decoded with dacite
+    decodes = list()
+    from_dict = prosper_rest_service.from_dict
+
+    def counting_from_dict(data_class, data, config=None):
+        decodes.append(data_class.__name__)
+        return from_dict(data_class=data_class, data=data, config=config)
+
+    monkeypatch.setattr(prosper_rest_service, "from_dict", counting_from_dict)
+    return decodes
+
+
+@pytest.fixture
+def rest_service(prosper_env):
+    return ProsperRestService(ProsperConfig(), metrics=Metrics())
+
+
+def get_requests(stand_in, prefix):
+    return [path for method, path in stand_in.requests if method == "GET" and path.startswith(prefix)]
+
+
+def test_stale_entity_is_revalidated_with_its_etag_and_not_decoded_again(rest_service, stand_in, decodes):
+    # Accounts have a zero TTL, so every call revalidates
+    account = rest_service.get_account()
+    bytes_sent = stand_in.bytes_sent
+
+    assert rest_service.get_account() is account
+    assert rest_service.get_account() is account
+
+    assert decodes == ["Account"]
+    assert len(get_requests(stand_in, "/v1/accounts")) == 3
+    assert stand_in.bytes_sent == bytes_sent
+    assert rest_service.metrics.counters["response_cache_revalidated.accounts"] == 2
+
+
+def test_changed_entity_is_decoded_again(rest_service, stand_in, decodes):
+    rest_service.get_account()
+    stand_in.account = make_account(available_cash_balance=12.5)
+
+    account = rest_service.get_account()
+
+    assert account.available_cash_balance == 12.5
+    assert decodes == ["Account", "Account"]
+
+
+def test_fresh_entity_is_served_without_a_request(prosper_env, stand_in, decodes):
+    prosper_env.setenv("PROSPER_RESPONSE_CACHE_TTLS", "orders=30")
+    rest_service = ProsperRestService(ProsperConfig(), metrics=Metrics())
+    page = rest_service.get_orders_page(25, 0)
+
+    assert rest_service.get_orders_page(25, 0) is page
+    assert decodes == ["OrdersList"]
+    assert len(get_requests(stand_in, "/v1/orders")) == 1
+    assert rest_service.metrics.counters["response_cache_hits.orders"] == 1
+
+
+def test_order_submit_invalidates_account_and_orders(rest_service, stand_in, decodes):
+    account = rest_service.get_account()
+    rest_service.get_orders_page(25, 0)
+
+    rest_service.submit_order({"bid_requests": [{"listing_id": 1, "bid_amount": 25.0}]})
+
+    assert rest_service.get_account() is not account
+    rest_service.get_orders_page(25, 0)
+    assert decodes == ["Account", "OrdersList", "OrdersResponse", "Account", "OrdersList"]
+    assert rest_service.metrics.counters["response_cache_misses.orders"] == 2
+    assert rest_service.metrics.counters["response_cache_misses.accounts"] == 2
+    assert "response_cache_revalidated.accounts" not in rest_service.metrics.counters
+
+
+def test_disabled_cache_decodes_every_response(prosper_env, stand_in, decodes):
+    prosper_env.setenv("PROSPER_RESPONSE_CACHE", "false")
+    rest_service = ProsperRestService(ProsperConfig(), metrics=Metrics())
+
+    assert rest_service.get_account() is not rest_service.get_account()
+    assert decodes == ["Account", "Account"]
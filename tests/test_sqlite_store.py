@@ -0,0 +1,44 @@
+# tests/test_sqlite_store.py
+
+import pytest
+
+from config.prosper_config import ProsperConfig
+from model.filterset import FilterSetProperties
+from service.bid_ledger import MemoryBidLedger, SqliteBidLedger, create_bid_ledger
+from service.lock_store import MemoryLockStore, SqliteLockStore, create_lock_store
+from service.note_cache import MemoryNoteCache, SqliteNoteCache, create_note_cache
+from service.seen_listing_cache import create_seen_listing_cache
+
+
+def create_seen_listing_cache_type(prosper_config):
+    seen_listing_cache = create_seen_listing_cache(prosper_config)
+    return "sqlite" if seen_listing_cache.path is not None else "memory"
+
+
+@pytest.fixture
+def prosper_config(prosper_env):
+    prosper_config = ProsperConfig()
+    prosper_config.filter_set_properties = FilterSetProperties()
+    return prosper_config
+
+
+@pytest.mark.parametrize("create_store, sqlite_type, memory_type", [
+    (create_bid_ledger, SqliteBidLedger, MemoryBidLedger),
+    (create_note_cache, SqliteNoteCache, MemoryNoteCache),
+    (create_lock_store, SqliteLockStore, MemoryLockStore),
+    (create_seen_listing_cache_type, "sqlite", "memory"),
+])
+def test_sqlite_stores_fall_back_to_memory_when_the_state_dir_is_unusable(prosper_config, tmp_path, caplog,
+                                                                           create_store, sqlite_type, memory_type):
+    def store_type(store):
+        return store if isinstance(store, str) else type(store)
+
+    assert store_type(create_store(prosper_config)) == sqlite_type
+
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    prosper_config.state_dir = str(blocker / "state")
+    store = create_store(prosper_config)
+
+    assert store_type(store) == memory_type
+    assert "unavailable, using the in-memory one" in caplog.text